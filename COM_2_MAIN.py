@@ -24,6 +24,7 @@ import time
 import subprocess
 import threading #Allow multithreading functionality
 from MCP25625_api import MCP25625_api, Message #import CAN HAL
+from MCP25625_hal_base import CreateHal
 import subprocess
 import os
 #Allow time dependant interrupt controller
@@ -83,7 +84,9 @@ def get_byte_temp():
 #Set up object to output
 sender = MCP25625_api()
 sender.SetFilterIdF0(0x120801F1)
-sender.Initialize()
+sender_hal = CreateHal(config.CAN_hal_backend, verifyPolicy = config.CAN_verify_policy,
+                       verifyEvery = config.CAN_verify_every)
+sender.Initialize(sender_hal, warmStart = config.CAN_warm_start)
 sender.SetNormalMode()
 def interrupt_10s():
     #print("Interrupt 10s")
@@ -113,7 +116,9 @@ def listener():#Target of CAN control thread 1
     # initializing CAN message data object and reader
     reader = MCP25625_api()
     reader.SetFilterIdF0(0x120801F1)
-    reader.Initialize()
+    reader_hal = CreateHal(config.CAN_hal_backend, verifyPolicy = config.CAN_verify_policy,
+                           verifyEvery = config.CAN_verify_every)
+    reader.Initialize(reader_hal, warmStart = config.CAN_warm_start)
     reader.SetNormalMode()
     global mcp_lock
     while(True):
@@ -5,28 +5,68 @@
 
 import metalcore as mc
 import threading
-from time import sleep
+from time import sleep, monotonic
 from datetime import datetime
-from MCP25625_hal import MCP25625_hal
+from MCP25625_hal_base import CreateHal
 from MCP25625_registers import *
 
 class MCP25625_api(object):
     # TODO: Optimize for CAN bus frequency:
     _txPollingIntervalSeconds = 0.1
     _rxPollingIntervalSeconds = 0.1
-    _txLock = threading.Lock()
-    _rxLock = threading.Lock()
-
-    def __init__(self, reg = MCP25625_RegisterGroup(), verbosePrint = False):
+    # Oscillator of the MCP25625 boards (20 MHz quartz, see README.md)
+    _oscillatorHz = 20000000
+    # Longest frame on the bus (extended, 8 data bytes, worst-case bit 
+    # stuffing, interframe space): a warm start waits that long for 
+    # Configuration mode
+    _maxFrameBits = 160
+    # Bits of the READ STATUS and RX STATUS bytes polled for each buffer
+    _txRequestStatusBits = (READSTATUSx.TX0REQ.registerMask, 
+                            READSTATUSx.TX1REQ.registerMask, 
+                            READSTATUSx.TX2REQ.registerMask)
+    _rxStatusBits = (RXSTATUSx.RX0.registerMask, RXSTATUSx.RX1.registerMask)
+    # Indices of the RXBnIDx and RXBnDLCx fields decoded by unpackBytes
+    _rxSID = RXBnIDx.layout.FieldIndex("SID")
+    _rxIDE = RXBnIDx.layout.FieldIndex("IDE")
+    _rxEID = RXBnIDx.layout.FieldIndex("EID")
+    _rxDLC = RXBnDLCx.layout.FieldIndex("DLC")
+    # Priorities of TXB0, TXB1 and TXB2 for SendBurst: the messages are sent 
+    # in buffer order
+    _burstPriorities = (TXBnCTRLx.TXP_HighestMessagePriority, 
+                        TXBnCTRLx.TXP_HighIntermediateMessagePriority, 
+                        TXBnCTRLx.TXP_LowIntermediateMessagePriority)
+
+    def __init__(self, reg = None, verbosePrint = False):
         """
         Creates a CAN API instance.
-        At most one instance can exist. The driver is configured to use CS0 on Raspberry PI.
+        Each instance drives its own device through its own register group, so 
+        several instances can be used in parallel (see MCP25625_manager).
+        By default Initialize opens CS0 of SPI bus 0 on Raspberry PI.
 
         Args: 
+            reg: The register group of the device (a new MCP25625_RegisterGroup by default).
             verbosePrint: Enable console verbose logging.
         """
 
+        if reg == None:
+            reg = MCP25625_RegisterGroup()
         self.reg = reg
+        self.hal = None
+        # Marker() of HALs tracing the SPI traffic (see MCP25625_trace)
+        self._traceMarker = None
+        # Initialization writes, compiled by Initialize
+        self._initPlan = None
+        # Whether the last Initialize kept the controller state (warmStart)
+        self.warmStarted = False
+        # Whether the transmit buffer priorities of SendBurst are set
+        self._burstPrioritiesSet = False
+        # Whether the TXB0 priority of Send is set
+        self._sendPrioritySet = False
+        self._txLock = threading.Lock()
+        self._rxLock = threading.Lock()
+        # Field values of the received RXBnIDx and RXBnDLCx (see _DecodeRxBuffer)
+        self._rxIdVals = [0] * len(RXBnIDx.layout.properties)
+        self._rxDlcVals = [0] * len(RXBnDLCx.layout.properties)
         self.verbosePrint = verbosePrint
         self.filter0Enabled = False
         self.savedFilterId0 = 0
@@ -45,89 +85,107 @@ class MCP25625_api(object):
             self.hal = None
         return 
 
-    def Initialize(self, hal = None):
+    def Initialize(self, hal = None, warmStart = False):
         """
         Initializes the CAN controller.
+
+        Args:
+            hal: The HAL of the device (by default the HAL backend selected by CreateHal, 
+                on CS0 of SPI bus 0: spidev unless the MCP25625_HAL environment variable 
+                names another one).
+            warmStart: Keep the state of a controller that is already configured (e.g. 
+                when the application restarts) instead of resetting it: only the 
+                configuration registers that differ are written, so the received 
+                messages are not lost. The controller is still reset if it does not 
+                enter Configuration mode or if its bit timing differs.
+                self.warmStarted tells whether the reset was avoided.
         """
 
         if (self.verbosePrint):
             print (">> Initialize({0})", hal)
 
         if hal == None:
-            self.hal = MCP25625_hal()
-            self.reg.BindToHal(self.hal)
-        else:
-            self.hal = hal
+            hal = CreateHal()
+        self.hal = hal
+        self.reg.BindToHal(self.hal)
 
-        self.hal.Reset()
+        self._traceMarker = getattr(self.hal, "Marker", None)
+        if self._traceMarker != None:
+            self._traceMarker("Initialize")
 
-        with self.reg.CANCTRL as canctrl:
-            assert canctrl.REQOP == self.reg.CANCTRL.REQOP_Configuration
-            canctrl.REQOP = 0b100
-
-            # Set prescaler to 00 
-            canctrl.CLKPRE = 0b00
-            assert canctrl.REQOP == self.reg.CANCTRL.REQOP_Configuration
+        # The configuration is compiled once into burst writes (see 
+        # _InitConfig), and compiled again when the filters change
+        if self._initPlan == None:
+            self._initPlan = self.reg.CompileConfig(self._InitConfig())
 
-        if self.verbosePrint:
-            self.reg.CANCTRL.Print()
-            self.reg.CANSTAT.Print()
-
-        # init values used for the HuskySat-1 satellite CAN bus
-        # TODO - move initialization somewhere else? 
-
-        with self.reg.CNF1 as cnf1:
-
-            # 0x87 = 0b.1000.0111
+        self._burstPrioritiesSet = False
+        self._sendPrioritySet = False
+        self.warmStarted = warmStart and self._WarmStart()
+        if not self.warmStarted:
+            self.hal.Reset()
 
-            # synchronization jump width = 2 x T_Q
-            cnf1.SJW = self.reg.CNF1.SJW_Length3TQ
+            # The reset restored every register to its default value
+            self.reg.InvalidateCache()
 
-            # Baud Rate Prescaler
-            # Use 16 clock cycles 
-            # T_Q = 2x(1+BRP)/F_OSC = 2x(1+7)/F_OSC = 16 / F_OSC
-            cnf1.BRP = 0b000111
+            # The burst writes of the configuration in a single batch
+            with self.hal.Batch():
+                self._initPlan.Apply()
 
-        with self.reg.CNF2 as cnf2:
-
-            # 0x0bf = 0b.1011.1111
-
-            # Use BTL
-            cnf2.BTLMODE = self.reg.CNF2.BTLMODE_CNF3_PHSEG2
-
-            # Sample point
-            # TODO - should we increase this to three sample points? 
-            cnf2.SAM = self.reg.CNF2.SAM_OnePointSample
-
-            # PRSEG length = (7+PRSEG)xT_Q = (7+1)xT_Q = 8xT_Q 
-            cnf2.PRSEG = 0b111
-
-            # PHSEG1 length = (7+PHSEG1)xT_Q = (7+1)xT_Q = 8xT_Q 
-            cnf2.PHSEG1 = 0b111
-
-        with self.reg.CNF3 as cnf3:
-
-            # 0x02 = 0b.0000.0010
-
-            # No wake-up filter
-            cnf3.WAK = 0
-
-            # Ignored anyway since CANCTRL.CLKEN = 0
-            cnf3.SOF = 0
-
-            # PHSEG2 length = (7+PHSEG2)xT_Q = (7+1)xT_Q = 8xT_Q 
-            cnf3.PHSEG2 = 0b010
+        if self.verbosePrint:
+            self._initPlan.Print()
+            self.reg.Snapshot().Print()
+
+    # Reconfigures the controller without resetting it
+    # Returns False if a reset is needed: the controller did not enter 
+    # Configuration mode or its bit timing (CNF1-3) differs, which cannot 
+    # change without losing the frames being received anyway.
+    def _WarmStart(self):
+        reg = self.reg
+
+        # The shadow copies may predate the restart
+        reg.InvalidateCache()
+
+        # The filters and masks read as 0 outside of Configuration mode. 
+        # The controller enters it once the frame on the bus is complete, 
+        # so CANSTAT is polled for the time of the longest frame.
+        with reg.CANCTRL as canctrl:
+            canctrl.REQOP = reg.CANCTRL.REQOP_Configuration
+        deadline = monotonic() + self._maxFrameBits * self._BitSeconds()
+        while True:
+            with reg.CANSTAT as canstat:
+                configurationMode = (canstat.OPMOD == reg.CANSTAT.OPMOD_Configuration)
+            if configurationMode or (monotonic() > deadline):
+                break
+        if not configurationMode:
+            return False
 
-        self.reg.TXRTSCTRL.Zero()
+        # Read the configuration registers in one burst and write back only 
+        # the configuration that differs. CANINTF holds the state of the 
+        # received frames and is left as is.
+        changes = self._initPlan.Diff(
+            reg.Snapshot(*self._initPlan.Registers()), skip = (reg.CANINTF,))
+        changed = changes.Registers()
+        if (reg.CNF1 in changed) or (reg.CNF2 in changed) or (reg.CNF3 in changed):
+            return False
+        with self.hal.Batch():
+            changes.Apply()
 
         if self.verbosePrint:
-            self.reg.CNF1.Print()
-            self.reg.CNF2.Print()
-            self.reg.CNF3.Print()
-            self.reg.TXRTSCTRL.Print()
-        
-        # Configure receive
-        self._ConfigureReceive()
+            print("- warm start: {0} registers rewritten".format(len(changed)))
+        return True
+
+    # Returns the nominal bit time of the bit timing set by Initialize 
+    # (CNF1-3): SyncSeg, PropSeg, PS1 and PS2 in T_Q = 2x(1+BRP)/F_OSC
+    def _BitSeconds(self):
+        reg = self.reg
+        values = {}
+        for stage in self._InitConfig():
+            for register, fields in stage:
+                values[register] = fields
+        timeQuanta = 1 + (values[reg.CNF2]["PRSEG"] + 1) + \
+                     (values[reg.CNF2]["PHSEG1"] + 1) + \
+                     (values[reg.CNF3]["PHSEG2"] + 1)
+        return timeQuanta * 2 * (values[reg.CNF1]["BRP"] + 1) / self._oscillatorHz
 
     # Split a combined 29-bit ID into a pair of SID (11 bit) and EID (18 bit)
     def SplitExtendedId(self, combinedId):
@@ -136,61 +194,101 @@ class MCP25625_api(object):
     def SetFilterIdF0(self, filterId):
         self.filter0Enabled = True
         self.savedFilterId0 = filterId
+        self._initPlan = None
 
     def SetFilterIdF1(self, filterId):
         self.filter1Enabled = True
         self.savedFilterId1 = filterId
+        self._initPlan = None
+
+    # Returns the configuration written by Initialize, as stages of 
+    # (register, {field: value}) pairs (see RegisterGroup.CompileConfig)
+    # Registers are written whole: fields not listed get their initial 
+    # value. Within a stage, registers at adjacent addresses are written 
+    # in a single SPI frame, so registers left at their reset value 
+    # (BFPCTRL, CANINTE) are listed to join the filter and bit timing 
+    # registers around them.
+    def _InitConfig(self):
+        reg = self.reg
+
+        # Stage 1: stay in configuration mode, set prescaler to 00
+        modeStage = [
+            (reg.CANCTRL, { 
+                "REQOP": reg.CANCTRL.REQOP_Configuration, 
+                "CLKPRE": 0b00 })]
 
-    def _ConfigureReceive(self):
+        # init values used for the HuskySat-1 satellite CAN bus
+        # TODO - move initialization somewhere else? 
+        configStage = [
+            # 0x87 = 0b.1000.0111
+            (reg.CNF1, { 
+                # synchronization jump width = 2 x T_Q
+                "SJW": reg.CNF1.SJW_Length3TQ,
+                # Baud Rate Prescaler
+                # Use 16 clock cycles 
+                # T_Q = 2x(1+BRP)/F_OSC = 2x(1+7)/F_OSC = 16 / F_OSC
+                "BRP": 0b000111 }),
 
-        # initialize filters, control registers
-        self.reg.RXB0CTRL.Zero()
-        self.reg.RXB1CTRL.Zero()
-        self.reg.RXM0ID.Zero()
-        self.reg.RXM1ID.Zero()
-        self.reg.RXF0ID.Zero()
-        self.reg.RXF1ID.Zero()
-        self.reg.RXF2ID.Zero()
-        self.reg.RXF3ID.Zero()
-        self.reg.RXF4ID.Zero()
-        self.reg.RXF5ID.Zero()        
+            # 0x0bf = 0b.1011.1111
+            (reg.CNF2, { 
+                # Use BTL
+                "BTLMODE": reg.CNF2.BTLMODE_CNF3_PHSEG2,
+                # Sample point
+                # TODO - should we increase this to three sample points? 
+                "SAM": reg.CNF2.SAM_OnePointSample,
+                # PRSEG length = (7+PRSEG)xT_Q = (7+1)xT_Q = 8xT_Q 
+                "PRSEG": 0b111,
+                # PHSEG1 length = (7+PHSEG1)xT_Q = (7+1)xT_Q = 8xT_Q 
+                "PHSEG1": 0b111 }),
 
+            # 0x02 = 0b.0000.0010
+            (reg.CNF3, { 
+                # No wake-up filter
+                "WAKFIL": 0,
+                # Ignored anyway since CANCTRL.CLKEN = 0
+                "SOF": 0,
+                # PHSEG2 length = (7+PHSEG2)xT_Q = (7+1)xT_Q = 8xT_Q 
+                "PHSEG2": 0b010 }),
+
+            (reg.TXRTSCTRL, {}),
+            (reg.BFPCTRL, {}),
+            (reg.CANINTE, {}),
+
+            # Clear RX bits for Peek to work correctly after Initialize.
+            (reg.CANINTF, { 
+                "RX0IF": 0,
+                "RX1IF": 1 }), # Disable RX1IF
+
+            (reg.RXB0CTRL, { 
+                # "RXM": reg.RXB0CTRL.RXM_TurnsMaskFiltersOffDevModeOnly
+                "RXM": reg.RXB1CTRL.RXM_ExtendedFramesOnly }),
+                # TODO: configure rollover into RXB1
+                # "BUKT": reg.RXB0CTRL.BUKT_RolloverEnabled
+
+            (reg.RXB1CTRL, { 
+                "RXM": reg.RXB1CTRL.RXM_TurnsMaskFiltersOffDevModeOnly })]
+
+        # Filters and masks
+        mask0 = {}
         if self.filter0Enabled or self.filter1Enabled:
             # Enable mask filtering 
-            with self.reg.RXM0ID as rxm0id:
-                rxm0id.SID, rxm0id.EID = self.SplitExtendedId(0b11111111111111111111111111111)
-
-        if self.filter0Enabled:
-            with self.reg.RXF0ID as rxf0id:
-                rxf0id.EXIDE = 1
-                rxf0id.SID, rxf0id.EID = self.SplitExtendedId(self.savedFilterId0)
-
-        if self.filter1Enabled:
-            with self.reg.RXF1ID as rxf1id:
-                rxf1id.EXIDE = 1
-                rxf1id.SID, rxf1id.EID = self.SplitExtendedId(self.savedFilterId1)
-
-        if (self.verbosePrint):
-            print("- _ConfigureReceive()")
-
-        with self.reg.RXB0CTRL as rxb0ctrl:
-            # rxb0ctrl.RXM = self.reg.RXB0CTRL.RXM_TurnsMaskFiltersOffDevModeOnly
-            rxb0ctrl.RXM = self.reg.RXB1CTRL.RXM_ExtendedFramesOnly
-            # TODO: configure rollover into Rself.reg.RXB1CTRL.XB1
-            # rxb0ctrl.BUKT = self.reg.RXB0CTRL.BUKT_RolloverEnabled
-
-        with self.reg.RXB1CTRL as rxb1ctrl:
-            rxb1ctrl.RXM = self.reg.RXB1CTRL.RXM_TurnsMaskFiltersOffDevModeOnly
-
-        # Clear RX bits for Peek to work correctly after Initialize.
-        with self.reg.CANINTF as canintf:
-            canintf.RX0IF = 0
-            canintf.RX1IF = 1 # Disable RX1IF
-
-        if (self.verbosePrint):
-            self.reg.RXB0CTRL.Print()
-            self.reg.RXB1CTRL.Print()
-            self.reg.CANINTF.Print()
+            sid, eid = self.SplitExtendedId(0b11111111111111111111111111111)
+            mask0 = { "SID": sid, "EID": eid }
+        configStage += [(reg.RXM0ID, mask0), (reg.RXM1ID, {})]
+
+        filters = [reg.RXF0ID, reg.RXF1ID, reg.RXF2ID, 
+                   reg.RXF3ID, reg.RXF4ID, reg.RXF5ID]
+        enabledFilters = { 0: (self.filter0Enabled, self.savedFilterId0), 
+                           1: (self.filter1Enabled, self.savedFilterId1) }
+        for i, filterRegister in enumerate(filters):
+            enabled, filterId = enabledFilters.get(i, (False, 0))
+            filterValues = {}
+            if enabled:
+                sid, eid = self.SplitExtendedId(filterId)
+                filterValues = { "EXIDE": 1, "SID": sid, "EID": eid }
+            configStage += [(filterRegister, filterValues)]
+
+        return [modeStage, configStage]
 
     def SetLoopbackMode(self):
         """
@@ -200,14 +298,14 @@ class MCP25625_api(object):
 
         if self.verbosePrint:
             print(">> SetLoopbackMode()")
-            self.reg.CANCTRL.Print()
+            self.reg.Snapshot(self.reg.CANCTRL).Print()
 
         with self.reg.CANCTRL as canctrl:
             canctrl.REQOP = self.reg.CANCTRL.REQOP_Loopback
             assert canctrl.REQOP == self.reg.CANCTRL.REQOP_Loopback
 
         if self.verbosePrint:
-            self.reg.CANCTRL.Print()
+            self.reg.Snapshot(self.reg.CANCTRL).Print()
 
     def SetNormalMode(self):
         """
@@ -216,7 +314,7 @@ class MCP25625_api(object):
         """
         if self.verbosePrint:
             print(">> SetNormalMode()")
-            self.reg.CANCTRL.Print()
+            self.reg.Snapshot(self.reg.CANCTRL).Print()
 
         with self.reg.CANCTRL as canctrl:
             assert canctrl.REQOP == self.reg.CANCTRL.REQOP_Configuration
@@ -224,7 +322,7 @@ class MCP25625_api(object):
             assert canctrl.REQOP == self.reg.CANCTRL.REQOP_Normal
 
         if self.verbosePrint:
-            self.reg.CANCTRL.Print()
+            self.reg.Snapshot(self.reg.CANCTRL).Print()
 
     def Send(self, msg, timeoutMilliseconds=None):
         """
@@ -243,10 +341,72 @@ class MCP25625_api(object):
         # Send only with TBX0 to ensure message sequence is preserved.
         if (self.verbosePrint):
             print(">> Send({0}, {1})".format(msg, timeoutMilliseconds))
+        if self._traceMarker != None:
+            self._traceMarker("Send")
 
         timeStart = self._BeginSendTXB0(msg, timeoutMilliseconds)
         self._EndSendTXB0(timeoutMilliseconds, timeStart)
 
+    def SendBurst(self, msgs, timeoutMilliseconds=None):
+        """
+        Sends up to 3 CAN Messages in order, one per transmit buffer.
+        The buffers are loaded first and their transmission starts with a single 
+        RTS instruction, so the messages follow each other on the bus.
+
+        Args:
+            msgs: the CAN Messages (1 to 3).
+            timeoutMilliseconds: the timeout in milliseconds to wait for all the messages to be sent.
+
+        Raises:
+            TimeoutError: if the timeoutMilliseconds passed before all the messages were sent.
+        """
+
+        if (len(msgs) < 1) or (len(msgs) > len(self._burstPriorities)):
+            raise ValueError("a burst must have between 1 and {0} messages.".format(len(self._burstPriorities)))
+        if (self.verbosePrint):
+            print(">> SendBurst({0}, {1})".format([str(m) for m in msgs], timeoutMilliseconds))
+        if self._traceMarker != None:
+            self._traceMarker("SendBurst")
+
+        timeStart = datetime.now()
+        txBufferIds = range(len(msgs))
+
+        # Verify that no buffer is already trying to send.
+        status = self.hal.ReadStatus()
+        for txBufferId in txBufferIds:
+            if (status & self._txRequestStatusBits[txBufferId]):
+                raise IOError("Transmit already pending in buffer {0}.".format(txBufferId))
+
+        # TXP decreases with the buffer number (set once, TXREQ being cleared)
+        if not self._burstPrioritiesSet:
+            for txBufferId, ctrl in enumerate((self.reg.TXB0CTRL, self.reg.TXB1CTRL, self.reg.TXB2CTRL)):
+                with ctrl as r_ctrl:
+                    r_ctrl.TXP = self._burstPriorities[txBufferId]
+            self._burstPrioritiesSet = True
+            # TXB0 has the highest priority, as for Send
+            self._sendPrioritySet = True
+
+        # The flags, the buffers and the transmission request are submitted 
+        # in a single batch
+        with self.hal.Batch():
+            # Clear the interrupt flags of the buffers with a single BIT MODIFY
+            with self.reg.CANINTF as r_canintf:
+                for txBufferId in txBufferIds:
+                    setattr(r_canintf, "TX{0}IF".format(txBufferId), 0)
+
+            for txBufferId, msg in zip(txBufferIds, msgs):
+                with self._LoadTxBuffer(txBufferId) as (r_id, r_dlc, r_data):
+                    self._FillTxBuffer(msg, r_id, r_data, r_dlc)
+
+            self._RequestSend(txBufferIds)
+
+        sent = False
+        while ((not sent) and self._CheckTimeout(timeoutMilliseconds, timeStart)):
+            sent = self._PollSend(txBufferIds)
+
+        if (not sent):
+            self._AbortSendBurst(txBufferIds)
+
     def Recv(self, timeoutMilliseconds=None):
         """
         Receives a CAN Message.
@@ -263,6 +423,8 @@ class MCP25625_api(object):
 
         if (self.verbosePrint):
             print(">> Recv({0})".format(timeoutMilliseconds))
+        if self._traceMarker != None:
+            self._traceMarker("Recv")
         timeStart = self._BeginReceiveRXB0()
         return self._EndReceiveRXB0(timeoutMilliseconds, timeStart)
 
@@ -276,19 +438,38 @@ class MCP25625_api(object):
         Remarks:
             If Peek returns True, it is guaranteed that Recv will not block.
         """
+        if self._traceMarker != None:
+            self._traceMarker("Peek")
         return self._PeekRXB0()
 
     def _BeginSendTXB0(self, msg, timeoutMilliseconds):
         txBufferId = 0
-        with self.reg.TXB0CTRL as r_ctrl, self.reg.TXB0ID as r_id, self.reg.TXB0DATA as r_data, self.reg.TXB0DLC as r_dlc:
-            return self._StartSend(msg, timeoutMilliseconds, r_ctrl, r_id, r_data, r_dlc, txBufferId)
+
+        # TXB0ID, TXB0DLC and TXB0DATA are composed in memory and written with 
+        # a single LOAD TX BUFFER instruction. The flag, the priority (once per 
+        # Initialize), the buffer and the transmission request are submitted 
+        # in a single batch.
+        with self.hal.Batch():
+            with self.reg.TXB0CTRL as r_ctrl, self._LoadTxBuffer(txBufferId) as (r_id, r_dlc, r_data):
+                timeStart = self._StartSend(msg, timeoutMilliseconds, r_ctrl, r_id, r_data, r_dlc, txBufferId)
+
+            # Request the transmission only after the buffer was written
+            self._RequestSend([txBufferId])
+
+        return timeStart
+
+    def _LoadTxBuffer(self, txBufferId):
+        reg = self.reg
+        registers = ((reg.TXB0ID, reg.TXB0DLC, reg.TXB0DATA), 
+                     (reg.TXB1ID, reg.TXB1DLC, reg.TXB1DATA), 
+                     (reg.TXB2ID, reg.TXB2DLC, reg.TXB2DATA))[txBufferId]
+        return reg.Compose(*registers, write = lambda image: self.hal.LoadTxBuffer(txBufferId, image))
 
     def _EndSendTXB0(self, timeoutMilliseconds, timeStart):
         txBufferId = 0
         sent = False
         while ((not sent) and self._CheckTimeout(timeoutMilliseconds, timeStart)):
-            with self.reg.TXB0CTRL as r_ctrl:
-                sent = self._PollSend(r_ctrl)
+            sent = self._PollSend([txBufferId])
 
         if (not sent):
             with self.reg.TXB0CTRL as r_ctrl:
@@ -297,8 +478,9 @@ class MCP25625_api(object):
     def _StartSend(self, msg, timeoutMilliseconds, r_ctrl, r_id, r_data, r_dlc, txBufferId):
         timeStart = datetime.now()
 
-        # Verify if current buffer is not already trying to send.
-        if r_ctrl.TXREQ != TXBnCTRLx.TXREQ_NotPending:
+        # Verify if current buffer is not already trying to send (TXREQ from a 
+        # READ STATUS, issued before the batched commands).
+        if (self.hal.ReadStatus() & self._txRequestStatusBits[txBufferId]):
             raise IOError("Transmit already pending in buffer {0}.".format(txBufferId))
 
         # Clear interrupt flag
@@ -308,6 +490,23 @@ class MCP25625_api(object):
             else:
                 r_canintf.TX1IF = 0
 
+        # Highest priority, set once per Initialize with a BIT MODIFY of TXP 
+        # only (TXREQ is set by the RTS instruction)
+        if not self._sendPrioritySet:
+            r_ctrl.TXP = TXBnCTRLx.TXP_HighestMessagePriority
+            self._sendPrioritySet = True
+
+        self._FillTxBuffer(msg, r_id, r_data, r_dlc)
+
+        if (self.verbosePrint):
+            print ("- _StartSend(TXB{0})".format(txBufferId))
+            r_id.Print()
+            r_data.Print()
+            r_dlc.Print()
+
+        return timeStart
+
+    def _FillTxBuffer(self, msg, r_id, r_data, r_dlc):
         #  ExtendedID
         if (msg.extended_id):
             r_id.EXIDE = TXBnIDx.EXIDE_Enabled
@@ -325,21 +524,22 @@ class MCP25625_api(object):
             r_dlc.DLC = len(msg.data)
             r_data.DATA = msg.Serialize()
 
-        # Start send
-        r_ctrl.TXP = TXBnCTRLx.TXP_HighestMessagePriority
-        r_ctrl.TXREQ = TXBnCTRLx.TXREQ_BufferPending
-    
-        if (self.verbosePrint):
-            print ("- _StartSend(TXB{0})".format(txBufferId))
-            r_ctrl.Print()
-            r_id.Print()
-            r_data.Print()
-            r_dlc.Print()
-
-        return timeStart
+    def _RequestSend(self, txBufferIds):
+        # Start send of the loaded buffers with a single RTS instruction
+        txBufferMask = 0
+        for txBufferId in txBufferIds:
+            txBufferMask |= 1 << txBufferId
+        self.hal.RequestToSend(txBufferMask)
 
-    def _PollSend(self, r_ctrl):
-        if (r_ctrl.TXREQ != TXBnCTRLx.TXREQ_NotPending):
+        if (self.verbosePrint):
+            print ("- _RequestSend(TXB{0})".format(list(txBufferIds)))
+
+    def _PollSend(self, txBufferIds):
+        # TXREQ of the buffers from a READ STATUS (a single 2-byte transfer)
+        txRequestBits = 0
+        for txBufferId in txBufferIds:
+            txRequestBits |= self._txRequestStatusBits[txBufferId]
+        if (self.hal.ReadStatus() & txRequestBits):
             if (self.verbosePrint):
                 print("- _PollSend(delay={0})".format(self._txPollingIntervalSeconds))
 
@@ -358,6 +558,20 @@ class MCP25625_api(object):
 
             raise TimeoutError("Transmit aborted in buffer {0}".format(txBufferId))
 
+    def _AbortSendBurst(self, txBufferIds):
+        # Timeout: abort the transmits still pending, then report them
+        status = self.hal.ReadStatus()
+        pending = [txBufferId for txBufferId in txBufferIds if status & self._txRequestStatusBits[txBufferId]]
+        for txBufferId, ctrl in enumerate((self.reg.TXB0CTRL, self.reg.TXB1CTRL, self.reg.TXB2CTRL)):
+            if txBufferId in pending:
+                with ctrl as r_ctrl:
+                    r_ctrl.TXREQ = TXBnCTRLx.TXREQ_NotPending
+        if (self.verbosePrint):
+            print("- _AbortSendBurst({0})".format(pending))
+
+        if pending:
+            raise TimeoutError("Transmit aborted in buffers {0}".format(pending))
+
     def _CheckTimeout(self, timeoutMilliseconds, timeStart):
         return (timeoutMilliseconds == None) or ((datetime.now() - timeStart).total_seconds() * 1000 < timeoutMilliseconds)
 
@@ -366,7 +580,7 @@ class MCP25625_api(object):
 
         if (self.verbosePrint):
             print("_BeginReceiveRXB0(RBX0)")
-            self.reg.CANINTF.Print()
+            self.reg.Snapshot(self.reg.CANINTF).Print()
 
         return timeStart
 
@@ -380,17 +594,19 @@ class MCP25625_api(object):
         if (not received):
             self._AbortReceive(rxBufferId)
 
-        m = None
-        d = 0
-        with self.reg.RXB0ID as r_id, self.reg.RXB0DLC as r_dlc, self.reg.RXB0DATA as r_data:
-            m = self._CreateMessage(r_id, r_dlc, r_data)
-            d = r_data.val
-            # print("Data : ", hex(d))
-        
-        # Clear interrupt flag.
-        if m != None:
-            self.reg.CANINTF.Zero()
-            return m
+        # RXB0ID, RXB0DLC and RXB0DATA are read with a single READ RX BUFFER 
+        # instruction, which also clears CANINTF.RX0IF
+        rxBytes = self.hal.ReadRxBuffer(rxBufferId)
+        if self.verbosePrint or (self.reg.RXB0ID.stats != None):
+            # Through register transactions, which print and count the registers
+            with self.reg.Transaction(self.reg.RXB0ID, self.reg.RXB0DLC, self.reg.RXB0DATA, readBytes = rxBytes) as (r_id, r_dlc, r_data):
+                return self._CreateMessage(r_id, r_dlc, r_data)
+
+        rxBytes = memoryview(rxBytes)
+        arbitration_id, extended_id, dlc = self._DecodeRxBuffer(rxBytes)
+        msg = Message(arbitration_id, None, extended_id)
+        msg.DeSerializeBytes(rxBytes[5:13], dlc)
+        return msg
 
 
     def _PeekRXB0(self):
@@ -398,16 +614,8 @@ class MCP25625_api(object):
         return self._Peek(rxBufferId)
 
     def _Peek(self, rxBufferId):
-        received = False
-        with self.reg.CANINTF as r_canintf:
-            if (rxBufferId == 0):
-                if (r_canintf.RX0IF == 1):
-                    received = True
-            else:
-                if (r_canintf.RX1IF == 1):
-                    received = True
-
-        return received
+        # RXnIF of the buffer from a RX STATUS (a single 2-byte transfer)
+        return (self.hal.RxStatus() & self._rxStatusBits[rxBufferId]) != 0
 
     def _PollRecv(self, rxBufferId):
         received = self._Peek(rxBufferId)
@@ -425,6 +633,16 @@ class MCP25625_api(object):
                 r_canintf.Print()
         raise TimeoutError("Receive aborted in buffer {0}".format(rxBufferId))
 
+    def _DecodeRxBuffer(self, rxBytes):
+        # The arbitration id, IDE and DLC of the bytes read from RXBnSIDH, 
+        # decoded by the generated unpackBytes of RXBnIDx and RXBnDLCx 
+        # without opening transactions
+        idVals = RXBnIDx.unpackBytes(rxBytes[0:4], self._rxIdVals)
+        dlc = RXBnDLCx.unpackBytes(rxBytes[4:5], self._rxDlcVals)[self._rxDLC]
+        if (idVals[self._rxIDE] == RXBnIDx.IDE_ReceivedExtendedFrame):
+            return (idVals[self._rxSID] << 18) + idVals[self._rxEID], True, dlc
+        return idVals[self._rxSID], False, dlc
+
     def _CreateMessage(self, r_id, r_dlc, r_data):
         if (self.verbosePrint):
             print ("- _CreateMessage()")
@@ -448,7 +666,7 @@ class MCP25625_api(object):
         msg = Message(arbitration_id, None, extended_id)
 
         #  Data Length and Data
-        msg.DeSerialize(r_data.DATA, r_dlc.DLC)
+        msg.DeSerializeBytes(r_data.DATA_bytes, r_dlc.DLC)
         
         return msg
 
@@ -521,6 +739,26 @@ class Message(object):
 
             serializedVal = serializedVal >> 8
 
+    def DeSerializeBytes(self, dataBytes, dlc):
+        """
+        Sets the message's data property to the first dlc bytes of dataBytes.
+        The data is a view of dataBytes, not a copy: Recv returns messages whose 
+        data references the bytes read from the receive buffer.
+
+        Args:
+            dataBytes: memoryview of the CAN data (8 bytes)
+            dlc: the data length
+        """
+
+        if (dlc > self._maxBytes):
+            raise ValueError("dlc must be less then 8")
+
+        if (dlc == 0):
+            self.data = None
+            return
+
+        self.data = dataBytes[:dlc]
+
     def __str__(self):
         if (self.data != None):
             data_hex = ''.join('{:02X} '.format(x) for x in self.data)
@@ -1,21 +1,243 @@
 # Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
 # See the LICENSE.txt file in the project root for more information.
 
-import spidev as spidev
 
+# Hardware abstraction layer - Low-level access to MCP25625 (spidev 
+# backend, see MCP25625_hal_base)
+# The device is selected by SPI bus and chip select (device) number, 
+# CS0 of SPI bus 0 by default
+# Alternatively an already opened spidev-like object can be given 
+# (see MCP25625_trace for recording and replaying SPI traffic)
+# The SPI clock is defaultSpiClockHz unless given. The MCP25625 supports 
+# up to 10 MHz, the wiring to it may not: AutoTuneSpiClock finds the 
+# highest reliable clock.
+# Commands can be grouped in a batch (see Batch) and submitted together.
+# Writes are not read back unless a write verification policy is set: 
+# VERIFY_SAMPLED reads back every verifyEvery-th write and only counts 
+# mismatches, VERIFY_ALWAYS reads back every write and raises IOError on a 
+# mismatch (see WriteBytes and the verify counters).
+# Commands are built in preallocated buffers, one per instruction and 
+# length, and issued with the buffer-protocol calls of spidev: xfer2 when 
+# the response is needed, writebytes2 otherwise. A HAL must therefore 
+# only be used by one thread at a time.
 
-# Hardware abstraction layer - Low-level access to MCP25625
-class MCP25625_hal:
+import ctypes
+import struct
+from MCP25625_hal_base import MCP25625_hal_base
+try:
+   import fcntl
+except ImportError:
+   # Not on Linux: batches are executed one command at a time
+   fcntl = None
 
-   def __init__(self, verbosePrint = False):
-      self.s=spidev.SpiDev()
-      self.s.open(0,0)
-      self.s.max_speed_hz=10000
+
+class MCP25625_hal(MCP25625_hal_base):
+
+   capabilities = MCP25625_hal_base.CAP_SPI | MCP25625_hal_base.CAP_BATCH | \
+                  MCP25625_hal_base.CAP_VERIFY | MCP25625_hal_base.CAP_SPI_CLOCK
+
+   defaultSpiClockHz = 10000
+
+   # Write verification policies
+   VERIFY_NEVER = 0
+   VERIFY_SAMPLED = 1
+   VERIFY_ALWAYS = 2
+
+   # Clocks tried by AutoTuneSpiClock, in increasing order
+   _autoTuneClocksHz = (10000, 20000, 50000, 100000, 200000, 500000, 
+                        1000000, 2000000, 4000000, 5000000, 8000000, 
+                        10000000)
+   # Scratch bytes of AutoTuneSpiClock: TXB0 data (TXB0D0-TXB0D7)
+   _autoTuneAddress = 0x36
+   _autoTuneLength = 8
+
+   # Constant commands
+   _resetCommand = bytes([0b11000000])
+   _readStatusCommand = bytes([0b10100000, 0])
+   _rxStatusCommand = bytes([0b10110000, 0])
+
+   def __init__(self, verbosePrint = False, bus = 0, device = 0, spi = None,
+                spiClockHz = None, verifyPolicy = VERIFY_NEVER, 
+                verifyEvery = 100):
+      self.bus = bus
+      self.device = device
       self.verbosePrint = verbosePrint
+      self.SetVerifyPolicy(verifyPolicy, verifyEvery)
+      self.ResetVerifyStats()
+      # Command buffers by length (see NewCommand)
+      self._readCommands = {}
+      self._writeCommands = {}
+      self._rxBufferCommands = {}
+      self._txBufferCommands = {}
+      self._rtsCommand = bytearray(1)
+      self._bitModifyCommand = bytearray([0b00000101, 0, 0, 0])
+      # Batch queuing the commands, if any (see Batch)
+      self._batch = None
+      if spi is None:
+         # Imported here so that the API and the mock HAL can be used on 
+         # machines without spidev
+         import spidev
+         spi=spidev.SpiDev()
+         spi.open(bus, device)
+         if spiClockHz is None:
+            spiClockHz = self.defaultSpiClockHz
+      self.s = spi
+      self.spiClockHz = getattr(spi, "max_speed_hz", None)
+      if spiClockHz is not None:
+         self.SetSpiClock(spiClockHz)
+
+   @classmethod
+   def Open(cls, bus = 0, device = 0, verbosePrint = False):
+      return cls(verbosePrint, bus, device)
 
    def close(self):
       self.s.close()
 
+   # Returns a batch of commands, used as a context:
+   #    with hal.Batch() as batch:
+   #       hal.BitModify(...)
+   #       hal.LoadTxBuffer(...)
+   #       hal.RequestToSend(...)
+   # While the batch is open, the write instructions of the HAL (WRITE, 
+   # BIT MODIFY, LOAD TX BUFFER, RTS, RESET) are queued in it instead of 
+   # being issued, and submitted together when it is closed. Reads submit 
+   # the queued commands first, so they see the effect of the writes. 
+   # Raw commands can be queued with batch.Transfer, their responses are 
+   # in batch.results once the batch is closed. An exception discards 
+   # the commands not submitted yet.
+   def Batch(self):
+      return MCP25625_hal_batch(self)
+
+   def SetSpiClock(self, spiClockHz):
+      self.s.max_speed_hz = spiClockHz
+      self.spiClockHz = spiClockHz
+
+   # Sets the write verification policy (VERIFY_NEVER, VERIFY_SAMPLED or 
+   # VERIFY_ALWAYS) and the sampling period of VERIFY_SAMPLED
+   def SetVerifyPolicy(self, verifyPolicy, verifyEvery = 100):
+      if verifyPolicy not in (self.VERIFY_NEVER, self.VERIFY_SAMPLED, 
+                              self.VERIFY_ALWAYS):
+         raise ValueError("Invalid write verification policy {0}"
+                          .format(verifyPolicy))
+      if verifyEvery < 1:
+         raise ValueError("verifyEvery must be at least 1")
+      self.verifyPolicy = verifyPolicy
+      self.verifyEvery = verifyEvery
+
+   # Verify counters: writes that could be verified (non-zero verify mask), 
+   # writes read back and read-backs that did not match
+   def ResetVerifyStats(self):
+      self.verifiableWrites = 0
+      self.verifiedWrites = 0
+      self.verifyMismatches = 0
+
+   # Internal method. Returns True if a write with the given verify mask 
+   # must be read back under the current policy
+   def VerifyNext(self, verifyMask):
+      if self.verifyPolicy == self.VERIFY_NEVER:
+         return False
+      if (verifyMask is not None) and not any(verifyMask):
+         return False
+      self.verifiableWrites += 1
+      if self.verifyPolicy == self.VERIFY_SAMPLED:
+         return self.verifiableWrites % self.verifyEvery == 0
+      return True
+
+   # Internal method. Counts a read-back and compares it with the bytes 
+   # written, under the verify mask (all bits if None). Raises IOError on 
+   # a mismatch if the policy is VERIFY_ALWAYS.
+   def CheckWrite(self, addressByte, written, readBack, verifyMask):
+      self.verifiedWrites += 1
+      if verifyMask is None:
+         verifyMask = b'\xff' * len(written)
+      for w, r, m in zip(written, readBack, verifyMask):
+         if (w & m) != (r & m):
+            break
+      else:
+         return
+      self.verifyMismatches += 1
+      if self.verbosePrint:
+         print("## Write verification failed at address 0x{0:02x}: "
+               "wrote {1}, read {2}".format(addressByte, 
+               [hex(i) for i in written], [hex(i) for i in readBack]))
+      if self.verifyPolicy == self.VERIFY_ALWAYS:
+         raise IOError("Write verification failed at address 0x{0:02x}."
+                       .format(addressByte))
+
+   # Sets the highest reliable SPI clock up to maxSpiClockHz, less the 
+   # safety margin (a fraction of it), and returns it
+   # Each clock of _autoTuneClocksHz is tried in increasing order until 
+   # write/read-back patterns of the TXB0 data bytes fail. The clock set 
+   # is the highest clock that passed below the margin. The TXB0 data 
+   # bytes are restored; TXB0 must not have a pending transmission.
+   def AutoTuneSpiClock(self, maxSpiClockHz = 10000000, safetyMargin = 0.2, 
+                        iterations = 10):
+      startClockHz = self.spiClockHz
+      if self.ReadByte(0x30) & 0b00001000:
+         raise IOError("Transmit pending in buffer 0.")
+      savedData = bytes(self.ReadBytes(self._autoTuneAddress, 
+                                       self._autoTuneLength))
+
+      passedClocksHz = []
+      # Without a reliable clock, the start clock is set back (the default 
+      # clock if the SPI clock was unknown)
+      chosenClockHz = startClockHz
+      if chosenClockHz is None:
+         chosenClockHz = self.defaultSpiClockHz
+      try:
+         for spiClockHz in self._autoTuneClocksHz:
+            if spiClockHz > maxSpiClockHz:
+               break
+            self.SetSpiClock(spiClockHz)
+            passed = self.CheckSpiClock(iterations)
+            if self.verbosePrint:
+               print("## SPI clock {0} Hz: {1}".format(spiClockHz, 
+                  "pass" if passed else "fail"))
+            if not passed:
+               break
+            passedClocksHz += [spiClockHz]
+
+         if not passedClocksHz:
+            raise IOError("No reliable SPI clock found.")
+
+         targetClockHz = passedClocksHz[-1] * (1 - safetyMargin)
+         chosenClockHz = passedClocksHz[0]
+         for spiClockHz in passedClocksHz:
+            if spiClockHz <= targetClockHz:
+               chosenClockHz = spiClockHz
+      finally:
+         # The data bytes are restored at the clock set, whether the 
+         # tuning succeeded, found no reliable clock or raised
+         self.SetSpiClock(chosenClockHz)
+         self.s.writebytes2(bytes([0b00000010, self._autoTuneAddress]) + 
+                            savedData)
+
+      if self.verbosePrint:
+         print("## SPI clock set to {0} Hz (highest reliable {1} Hz)"
+               .format(chosenClockHz, passedClocksHz[-1]))
+      return chosenClockHz
+
+   # Returns True if write/read-back patterns of the TXB0 data bytes 
+   # succeed at the current SPI clock
+   def CheckSpiClock(self, iterations = 10):
+      length = self._autoTuneLength
+      patterns = [[0x00] * length, [0xFF] * length, 
+                  [0x55, 0xAA] * (length // 2), [0xAA, 0x55] * (length // 2),
+                  [1 << i for i in range(length)], 
+                  [0xFF ^ (1 << i) for i in range(length)]]
+      for i in range(iterations):
+         for pattern in patterns:
+            # Vary the patterns across iterations
+            pattern = [b ^ ((i * 0x11) & 0xFF) for b in pattern]
+            self.s.writebytes2(bytes([0b00000010, self._autoTuneAddress] + 
+                                     pattern))
+            response = self.s.xfer2(bytes([0b00000011, 
+                                           self._autoTuneAddress] + 
+                                          [0] * length))
+            if list(response[2:]) != pattern:
+               return False
+      return True
+
    # Reset the HW before beginning to inteact with it
    def __enter__(self):
       self.Reset()
@@ -29,48 +251,135 @@ class MCP25625_hal:
    # Low-level SPI commands implemented by MCP25625
    #
 
+   # Internal method. Creates the command buffer of the given length in 
+   # commands (one of the command buffer dictionaries), with the 
+   # instruction byte and zeroes. The callers look the buffer up first 
+   # and overwrite the instruction variants, address and data bytes only: 
+   # the dummy bytes of reads stay zero.
+   @staticmethod
+   def NewCommand(commands, instruction, length):
+      command = bytearray(length)
+      command[0] = instruction
+      commands[length] = command
+      return command
+
    def Reset(self):
-      self.s.xfer([int('11000000',2)])
+      if self._batch is not None:
+         self._batch.Transfer(self._resetCommand, False)
+         return
+      self.s.writebytes2(self._resetCommand)
 
    # Read a number of bytes starting from given address and length
    def ReadBytes(self, addressBytes, len):
-      # dummyData = [0]*len
-      # command = [0b00000011, addressBytes] + dummyData
-      dummyData = b'\x00'*len
-      command = list(0b00000011.to_bytes(1, 'big') 
-                     + addressBytes.to_bytes(1, 'big') + dummyData)
-      # print(command)
-      response = self.s.xfer(command)
+      command = self._readCommands.get(2 + len)
+      if command is None:
+         command = self.NewCommand(self._readCommands, 0b00000011, 2 + len)
+      command[1] = addressBytes
+      if self._batch is not None:
+         self._batch.Submit()
+      response = self.s.xfer2(command)
       # print(response)
       # TODO test that first two bytes are zero
       # eliminate the first two bytes
       # TODO assert that readData is proper length
-      readData = response[2:]
+      # The response is copied once into a new buffer. Transactions keep 
+      # references to it (see RegisterTransaction.RawBuffer), so it must 
+      # not be reused for another transfer.
+      readData = memoryview(bytearray(response))[2:]
       # print(readData)
       return readData
 
-   def WriteBytes(self, addressBytes, arrayDataBytes):
+   # Writes arrayDataBytes from the given address
+   # The bytes are read back according to the verification policy. 
+   # verifyMask selects the bits compared for each byte (all of them if 
+   # None); an all-zero mask (e.g. volatile registers) is never verified.
+   def WriteBytes(self, addressBytes, arrayDataBytes, verifyMask = None):
       if self.verbosePrint:
           print("## Writing {0} at address 0x{1:02x}".format(arrayDataBytes, 
                                                        addressBytes))
-      command = list(0b00000010.to_bytes(1, 'big') 
-                     + addressBytes.to_bytes(1, 'big') + arrayDataBytes)
+      command = self._writeCommands.get(2 + len(arrayDataBytes))
+      if command is None:
+         command = self.NewCommand(self._writeCommands, 0b00000010, 
+                                   2 + len(arrayDataBytes))
+      command[1] = addressBytes
+      command[2:] = arrayDataBytes
 
       if self.verbosePrint:
           print("## SPI write command: {0} ({1})".format( 
              [hex(i) for i in command],
              [bin(i) for i in command]))
 
-      self.s.xfer(command)
+      if self._batch is not None:
+         self._batch.Transfer(command, False)
+      else:
+         self.s.writebytes2(command)
 
-      rr = self.ReadBytes(addressBytes, len(arrayDataBytes))
-      
+      if self.verifyPolicy and self.VerifyNext(verifyMask):
+         rr = self.ReadBytes(addressBytes, len(arrayDataBytes))
+         if self.verbosePrint:
+             print("## SPI read content: {0} ({1})".format( 
+                [hex(i) for i in rr], 
+                [bin(i) for i in rr]        
+                ))
+         self.CheckWrite(addressBytes, arrayDataBytes, rr, verifyMask)
+
+   # READ RX BUFFER: reads receive buffer rxBufferId (0 or 1) from 
+   # RXBnSIDH (or from RXBnD0 if fromData) without an address byte. The 
+   # device clears CANINTF.RXnIF at the end of the transfer. 
+   # The 13 bytes of ID, DLC and data take a single 14-byte transfer.
+   def ReadRxBuffer(self, rxBufferId, len = 13, fromData = False):
+      command = self._rxBufferCommands.get(1 + len)
+      if command is None:
+         command = self.NewCommand(self._rxBufferCommands, 0, 1 + len)
+      command[0] = 0b10010010 | (rxBufferId << 2) if fromData \
+                   else 0b10010000 | (rxBufferId << 2)
+      if self._batch is not None:
+         self._batch.Submit()
+      response = self.s.xfer2(command)
+      # New buffer without the instruction byte (see ReadBytes)
+      return memoryview(bytearray(response))[1:]
+
+   # LOAD TX BUFFER: writes transmit buffer txBufferId (0 to 2) from 
+   # TXBnSIDH (or from TXBnD0 if fromData) without an address byte
+   def LoadTxBuffer(self, txBufferId, arrayDataBytes, fromData = False):
       if self.verbosePrint:
-          print("## SPI read content: {0} ({1})".format( 
-             [hex(i) for i in rr], 
-             [bin(i) for i in rr]        
-             ))
-          
+          print("## Loading {0} in TX buffer {1}".format(
+             list(arrayDataBytes), txBufferId))
+      command = self._txBufferCommands.get(1 + len(arrayDataBytes))
+      if command is None:
+         command = self.NewCommand(self._txBufferCommands, 0, 
+                                   1 + len(arrayDataBytes))
+      command[0] = 0b01000001 | (txBufferId << 1) if fromData \
+                   else 0b01000000 | (txBufferId << 1)
+      command[1:] = arrayDataBytes
+      if self._batch is not None:
+         self._batch.Transfer(command, False)
+         return
+      self.s.writebytes2(command)
+
+   # RTS: requests the transmission of the transmit buffers selected by 
+   # txBufferMask (bit n for TXBn, so several buffers start with a 
+   # single byte)
+   def RequestToSend(self, txBufferMask):
+      self._rtsCommand[0] = 0b10000000 | (txBufferMask & 0b111)
+      if self._batch is not None:
+         self._batch.Transfer(self._rtsCommand, False)
+         return
+      self.s.writebytes2(self._rtsCommand)
+
+   # READ STATUS: returns the RXnIF, TXnIF and TXREQ bits of all buffers 
+   # in one byte (see READSTATUSx), with a single 2-byte transfer
+   def ReadStatus(self):
+      if self._batch is not None:
+         self._batch.Submit()
+      return self.s.xfer2(self._readStatusCommand)[1]
+
+   # RX STATUS: returns the receive buffers holding a message, with the 
+   # type and filter match of the last one, in one byte (see RXSTATUSx)
+   def RxStatus(self):
+      if self._batch is not None:
+         self._batch.Submit()
+      return self.s.xfer2(self._rxStatusCommand)[1]
 
    # TODO optimize this for writing a single byte
    def WriteByte(self, addressByte, byteValue):
@@ -80,33 +389,47 @@ class MCP25625_hal:
    def ReadByte(self, addressByte):
       return self.ReadBytes(addressByte, 1)[0]
 
-   # TODO optimize this
-   def BitModify(self, addressByte, maskByte, dataByte):
-      rr = self.ReadByte(addressByte)
-
+   # Changes the bits selected by maskByte to the values in dataByte
+   # Issued as a single BIT MODIFY frame. Only valid for registers 
+   # that support bit modify (see the MCP25625 datasheet).
+   def BitModify(self, addressByte, maskByte, dataByte, verifyMask = None):
       if self.verbosePrint:
+        rr = self.ReadByte(addressByte)
         print("## (SPI read content = 0x{0:02x} (0x{0:08b}))".format(rr))
         print("## Bit modifying address 0x{0:02x} "
             "to value {1} (hex = 0x{1:02x}, bin = 0b{1:08b}) " \
             "with mask {2} (hex = 0x{2:02x}, bin = 0b{2:08b}) ..." \
             .format(addressByte, dataByte, maskByte))
 
-      command = list(0b00000101.to_bytes(1, 'big') 
-                     + addressByte.to_bytes(1, 'big')
-                     + maskByte.to_bytes(1, 'big')
-                     + dataByte.to_bytes(1, 'big'))
+      command = self._bitModifyCommand
+      command[1] = addressByte
+      command[2] = maskByte
+      command[3] = dataByte
 
       if self.verbosePrint:
           print("## SPI bit modify command: {0} ({1})".format( 
              [hex(i) for i in command],
              [bin(i) for i in command]))
       
-      self.s.xfer(command)
+      if self._batch is not None:
+         self._batch.Transfer(command, False)
+      else:
+         self.s.writebytes2(command)
 
-      rr = self.ReadByte(addressByte)
-      
-      if self.verbosePrint:
-        print("## (SPI read content = 0x{0:02x} (0x{0:08b}))".format(rr))
+      if self.verifyPolicy:
+         self.VerifyBitModify(addressByte, maskByte, dataByte, verifyMask)
+
+   # Internal method. Verifies a BIT MODIFY according to the policy
+   # Only the modified bits are verified
+   def VerifyBitModify(self, addressByte, maskByte, dataByte, verifyMask):
+      if verifyMask is None:
+         verifyMask = 0xFF
+      verifyMask &= maskByte
+      if self.VerifyNext((verifyMask,)):
+         rr = self.ReadByte(addressByte)
+         if self.verbosePrint:
+           print("## (SPI read content = 0x{0:02x} (0x{0:08b}))".format(rr))
+         self.CheckWrite(addressByte, (dataByte,), (rr,), (verifyMask,))
 
    #
    #  Utilities
@@ -131,3 +454,111 @@ class MCP25625_hal:
       else:
          arrB = val
       return self.s.xfer(arrB)
+
+
+# Batch of SPI commands of a MCP25625_hal (see MCP25625_hal.Batch)
+# The commands are submitted with a single SPI_IOC_MESSAGE(n) ioctl, one 
+# transfer per command with chip select released between them 
+# (cs_change), so each one is a separate MCP25625 instruction. When the 
+# ioctl is not available (not Linux, or a spidev-like object without a 
+# file descriptor, e.g. a trace recorder) the commands are issued one at a 
+# time with xfer2, or writebytes2 if their response is not needed.
+class MCP25625_hal_batch(object):
+
+   # struct spi_ioc_transfer of linux/spi/spidev.h (32 bytes): tx_buf, 
+   # rx_buf, len, speed_hz, delay_usecs, bits_per_word, cs_change, 
+   # tx_nbits, rx_nbits, word_delay_usecs, pad
+   _spiIocTransfer = struct.Struct("=QQIIHBBBBBB")
+   # The ioctl size field has 14 bits, and spidev rejects messages of more 
+   # bytes than its buffer (4096 bytes by default)
+   _maxTransfers = (1 << 14) // 32 - 1
+   _maxBytes = 4096
+
+   # SPI_IOC_MESSAGE(n): _IOW(SPI_IOC_MAGIC, 0, char[n * 32])
+   @staticmethod
+   def SpiIocMessage(transferCount):
+      return (1 << 30) | ((transferCount * 32) << 16) | (0x6B << 8)
+
+   def __init__(self, hal):
+      self.hal = hal
+      self.previous = None
+      self.results = []
+      self.Clear()
+
+   def __enter__(self):
+      # A batch opened inside another one submits the commands of the 
+      # outer batch first, and gives it back the HAL when closed
+      self.previous = self.hal._batch
+      if self.previous is not None:
+         self.previous.Submit()
+      self.hal._batch = self
+      return self
+
+   def __exit__(self, type, value, traceback):
+      self.hal._batch = self.previous
+      self.previous = None
+      if type is None:
+         self.Submit()
+      else:
+         self.Clear()
+      return
+
+   # Internal method. Drops the commands not submitted
+   def Clear(self):
+      self.tx = bytearray()
+      # (offset in tx, length, response needed) of each command
+      self.commands = []
+
+   # Queues a command (list or bytes-like object, copied) and returns the 
+   # index of its response in results. The response of a command queued with 
+   # response False is None.
+   # Raises ValueError for a command larger than a SPI message (_maxBytes)
+   def Transfer(self, command, response = True):
+      if len(command) > self._maxBytes:
+         raise ValueError("SPI command of {0} bytes exceeds {1} bytes"
+                          .format(len(command), self._maxBytes))
+      if (len(self.commands) == self._maxTransfers) or \
+            (len(self.tx) + len(command) > self._maxBytes):
+         self.Submit()
+      self.commands += [(len(self.tx), len(command), response)]
+      self.tx.extend(command)
+      self.results += [None]
+      return len(self.results) - 1
+
+   # Submits the queued commands and returns the responses of all the 
+   # commands of the batch
+   def Submit(self):
+      if not self.commands:
+         return self.results
+      tx = self.tx
+      commands = self.commands
+      self.Clear()
+      first = len(self.results) - len(commands)
+
+      fileno = getattr(self.hal.s, "fileno", None)
+      if (fcntl is None) or (fileno is None):
+         for i, (offset, length, response) in enumerate(commands):
+            if response:
+               self.results[first + i] = bytes(
+                  self.hal.s.xfer2(tx[offset:offset + length]))
+            else:
+               self.hal.s.writebytes2(tx[offset:offset + length])
+         return self.results
+
+      rx = bytearray(len(tx))
+      txAddress = ctypes.addressof(ctypes.c_char.from_buffer(tx))
+      rxAddress = ctypes.addressof(ctypes.c_char.from_buffer(rx))
+      speedHz = self.hal.spiClockHz or 0
+      message = bytearray(self._spiIocTransfer.size * len(commands))
+      for i, (offset, length, response) in enumerate(commands):
+         # Chip select is released after each transfer but the last
+         csChange = 1 if i < len(commands) - 1 else 0
+         self._spiIocTransfer.pack_into(message, 
+            i * self._spiIocTransfer.size, txAddress + offset, 
+            rxAddress + offset, length, speedHz, 0, 0, csChange, 
+            0, 0, 0, 0)
+      fcntl.ioctl(fileno(), self.SpiIocMessage(len(commands)), message)
+      for i, (offset, length, response) in enumerate(commands):
+         if response:
+            self.results[first + i] = bytes(rx[offset:offset + length])
+      return self.results
@@ -0,0 +1,283 @@
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Interface of the MCP25625 hardware abstraction layers (HAL)
+#
+# The API, the register group and the tools only use the methods of
+# MCP25625_hal_base. Each backend derives from it, implements the MCP25625
+# SPI instructions (abstract methods: a backend missing one cannot be
+# instantiated) and declares what else it supports with capability flags:
+#    spidev   MCP25625_hal          the device on a Linux SPI bus
+#    memory   MCP25625_hal_memory   register map in memory (no device
+#                                   semantics), for tests and benchmarks
+#    mock     MCP25625_hal_mock     the memory backend printing each call
+#    sim      MCP25625_hal_sim      MCP25625_hal over a behavioral model of
+#                                   the device (see MCP25625_sim)
+# CreateHal opens the backend given (e.g. by a command line option), else
+# the backend named by the MCP25625_HAL environment variable, else spidev,
+# so tests and benchmarks can run against another backend without code
+# changes.
+# The time spent in each instruction is measured once EnableStats is
+# called.
+
+import abc
+import contextlib
+import importlib
+import os
+import time
+
+
+# Call count and time of the instructions of a HAL
+class MCP25625_hal_stats(object):
+
+   def __init__(self):
+      self.Reset()
+
+   def Reset(self):
+      # [calls, seconds, max seconds] by instruction method name
+      self.instructions = {}
+
+   def Timed(self, name, seconds):
+      stats = self.instructions.get(name)
+      if stats is None:
+         stats = self.instructions[name] = [0, 0.0, 0.0]
+      stats[0] += 1
+      stats[1] += seconds
+      if seconds > stats[2]:
+         stats[2] = seconds
+
+   def ToDict(self):
+      return dict((name, {"calls": calls, "seconds": seconds,
+                          "maxSeconds": maxSeconds})
+                  for name, (calls, seconds, maxSeconds)
+                  in self.instructions.items())
+
+
+class MCP25625_hal_base(metaclass = abc.ABCMeta):
+
+   # Capability flags
+   # The instructions go over a SPI bus (their time is the bus time)
+   CAP_SPI = 0x01
+   # Batches are submitted as a single transfer (see Batch)
+   CAP_BATCH = 0x02
+   # Writes can be read back (see MCP25625_hal.SetVerifyPolicy)
+   CAP_VERIFY = 0x04
+   # The SPI clock can be set and tuned (see MCP25625_hal.SetSpiClock)
+   CAP_SPI_CLOCK = 0x08
+   # The traffic is recorded or replayed, operations are delimited by
+   # Marker (see MCP25625_trace)
+   CAP_TRACE = 0x10
+   # The device behavior is simulated: modes, transmissions, receptions
+   CAP_DEVICE_MODEL = 0x20
+
+   capabilities = 0
+
+   # Timing statistics (see EnableStats), None when disabled
+   stats = None
+
+   # Instructions timed by EnableStats
+   _timedInstructions = ("Reset", "ReadBytes", "WriteBytes", "ReadRxBuffer",
+                         "LoadTxBuffer", "RequestToSend", "ReadStatus",
+                         "RxStatus", "BitModify", "xfer")
+
+   # Opens the backend for the device on the given SPI bus and chip
+   # select (ignored by backends without a device)
+   @classmethod
+   def Open(cls, bus = 0, device = 0, verbosePrint = False):
+      return cls(verbosePrint = verbosePrint)
+
+   def HasCapabilities(self, capabilities):
+      return (self.capabilities & capabilities) == capabilities
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, type, value, traceback):
+      self.close()
+      return
+
+   def close(self):
+      pass
+
+   #
+   # MCP25625 instructions
+   #
+
+   # RESET: restores the registers to their reset values, Configuration
+   # mode
+   @abc.abstractmethod
+   def Reset(self):
+      raise NotImplementedError()
+
+   # READ: returns len bytes from the given address as a bytes-like
+   # object (not reused by later calls)
+   @abc.abstractmethod
+   def ReadBytes(self, addressBytes, len):
+      raise NotImplementedError()
+
+   # WRITE: writes the bytes from the given address. verifyMask selects
+   # the bits a backend verifying writes compares (all if None).
+   @abc.abstractmethod
+   def WriteBytes(self, addressBytes, arrayDataBytes, verifyMask = None):
+      raise NotImplementedError()
+
+   # READ RX BUFFER: returns len bytes of receive buffer rxBufferId from
+   # RXBnSIDH (or RXBnD0 if fromData) and clears CANINTF.RXnIF
+   @abc.abstractmethod
+   def ReadRxBuffer(self, rxBufferId, len = 13, fromData = False):
+      raise NotImplementedError()
+
+   # LOAD TX BUFFER: writes transmit buffer txBufferId from TXBnSIDH (or
+   # TXBnD0 if fromData)
+   @abc.abstractmethod
+   def LoadTxBuffer(self, txBufferId, arrayDataBytes, fromData = False):
+      raise NotImplementedError()
+
+   # RTS: sets TXBnCTRL.TXREQ of the buffers of txBufferMask (bit n for
+   # TXBn)
+   @abc.abstractmethod
+   def RequestToSend(self, txBufferMask):
+      raise NotImplementedError()
+
+   # READ STATUS: returns the status byte (see READSTATUSx)
+   @abc.abstractmethod
+   def ReadStatus(self):
+      raise NotImplementedError()
+
+   # RX STATUS: returns the status byte (see RXSTATUSx)
+   @abc.abstractmethod
+   def RxStatus(self):
+      raise NotImplementedError()
+
+   # BIT MODIFY: changes the bits selected by maskByte to the values in
+   # dataByte
+   @abc.abstractmethod
+   def BitModify(self, addressByte, maskByte, dataByte, verifyMask = None):
+      raise NotImplementedError()
+
+   def WriteByte(self, addressByte, byteValue):
+      self.WriteBytes(addressByte, bytes([byteValue]))
+
+   def ReadByte(self, addressByte):
+      return self.ReadBytes(addressByte, 1)[0]
+
+   # Returns a context grouping commands (see MCP25625_hal.Batch). Without
+   # CAP_BATCH the commands are executed at once and the batch only
+   # delimits them.
+   def Batch(self):
+      return contextlib.nullcontext()
+
+   # Transfers a raw SPI frame (list or bytes-like object) and returns the
+   # bytes received as a list. The frame is decoded into the instruction
+   # methods; backends on a SPI bus transfer it as is.
+   def xfer(self, command):
+      command = bytes(command)
+      if not command:
+         return []
+      op = command[0]
+      response = [0] * len(command)
+      if op == 0b11000000:
+         self.Reset()
+      elif op == 0b00000011:
+         response[2:] = self.ReadBytes(command[1], len(command) - 2)
+      elif op == 0b00000010:
+         self.WriteBytes(command[1], command[2:])
+      elif op == 0b00000101:
+         self.BitModify(command[1], command[2], command[3])
+      elif (op & 0b11111001) == 0b10010000:
+         response[1:] = self.ReadRxBuffer((op >> 2) & 1, len(command) - 1,
+                                          bool(op & 0b10))
+      elif 0b01000000 <= op <= 0b01000101:
+         self.LoadTxBuffer((op >> 1) & 0b11, command[1:], bool(op & 1))
+      elif (op & 0b11111000) == 0b10000000:
+         self.RequestToSend(op & 0b111)
+      elif op == 0b10100000:
+         response[1:] = [self.ReadStatus()] * (len(command) - 1)
+      elif op == 0b10110000:
+         response[1:] = [self.RxStatus()] * (len(command) - 1)
+      else:
+         raise ValueError("Unknown MCP25625 instruction 0x{0:02x}"
+                          .format(op))
+      return response
+
+   #
+   # Timing statistics
+   #
+
+   # Measures the time spent in each instruction (see GetStats)
+   # The instruction methods of the HAL are replaced by timed wrappers,
+   # so a HAL without statistics pays nothing.
+   def EnableStats(self, enabled = True):
+      for name in self._timedInstructions:
+         self.__dict__.pop(name, None)
+      if not enabled:
+         self.stats = None
+         return
+      self.stats = MCP25625_hal_stats()
+      for name in self._timedInstructions:
+         setattr(self, name, self.TimedInstruction(name, getattr(self, name)))
+
+   # Internal method. Returns the instruction timed in the statistics
+   def TimedInstruction(self, name, instruction):
+      stats = self.stats
+      def timed(*args, **kwargs):
+         timeStart = time.perf_counter()
+         try:
+            return instruction(*args, **kwargs)
+         finally:
+            stats.Timed(name, time.perf_counter() - timeStart)
+      return timed
+
+   def ResetStats(self):
+      if self.stats is not None:
+         self.stats.Reset()
+
+   # Returns the timing statistics as a dictionary keyed by instruction
+   # method name (empty when disabled)
+   def GetStats(self):
+      return {} if self.stats is None else self.stats.ToDict()
+
+
+# HAL backends by name: (module, class)
+_halBackends = {
+   "spidev": ("MCP25625_hal", "MCP25625_hal"),
+   "memory": ("MCP25625_hal_memory", "MCP25625_hal_memory"),
+   "mock": ("MCP25625_hal_mock", "MCP25625_hal_mock"),
+   "sim": ("MCP25625_sim", "MCP25625_hal_sim"),
+}
+
+halBackendVariable = "MCP25625_HAL"
+defaultHalBackend = "spidev"
+
+# Returns the names of the HAL backends
+def HalBackends():
+   return sorted(_halBackends)
+
+# Returns the HAL backend name selected by backend, else by the
+# MCP25625_HAL environment variable, else default
+def SelectHalBackend(backend = None, default = defaultHalBackend):
+   return backend or os.environ.get(halBackendVariable) or default
+
+# Opens a HAL of the selected backend (see SelectHalBackend) for the
+# device on the given SPI bus and chip select
+# verifyPolicy ("never", "sampled" or "always", see
+# MCP25625_hal.SetVerifyPolicy) is applied to backends with CAP_VERIFY;
+# backends without it never verify writes.
+def CreateHal(backend = None, bus = 0, device = 0, verbosePrint = False,
+              verifyPolicy = None, verifyEvery = 100):
+   name = SelectHalBackend(backend)
+   if name not in _halBackends:
+      raise ValueError("Unknown MCP25625 HAL backend {0} (one of {1})"
+                       .format(name, ", ".join(HalBackends())))
+   moduleName, className = _halBackends[name]
+   halClass = getattr(importlib.import_module(moduleName), className)
+   hal = halClass.Open(bus, device, verbosePrint)
+   if (verifyPolicy is not None) and \
+         hal.HasCapabilities(MCP25625_hal_base.CAP_VERIFY):
+      policy = getattr(hal, "VERIFY_" + verifyPolicy.upper(), None)
+      if policy is None:
+         hal.close()
+         raise ValueError("Unknown write verification policy {0}"
+                          .format(verifyPolicy))
+      hal.SetVerifyPolicy(policy, verifyEvery)
+   return hal
@@ -0,0 +1,97 @@
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+from MCP25625_hal_base import MCP25625_hal_base
+
+
+# Dictionary-like view over the mock register memory
+# testData[address] returns the byte at that address as a one-element
+# list and testData[address] = [b0, b1, ...] writes consecutive bytes
+class MCP25625_mock_memory(object):
+    def __init__(self, memory):
+        self.memory = memory
+
+    def __getitem__(self, address):
+        return [self.memory[address]]
+
+    def __setitem__(self, address, listBytes):
+        self.memory[address:address + len(listBytes)] = bytes(listBytes)
+
+
+# Hardware abstraction layer over a register map in memory (memory backend,
+# see MCP25625_hal_base)
+# The instructions read and write the memory at once, without device
+# semantics beyond the instructions themselves: no mode changes, no
+# transmissions or receptions. Used by tests and benchmarks needing a fast
+# HAL; MCP25625_hal_mock prints each call.
+class MCP25625_hal_memory(MCP25625_hal_base):
+
+    # Size of the MCP25625 register map
+    _memorySize = 0x80
+
+    # READ RX BUFFER and LOAD TX BUFFER start addresses
+    _rxBufferAddresses = ((0x61, 0x66), (0x71, 0x76))
+    _txBufferAddresses = ((0x31, 0x36), (0x41, 0x46), (0x51, 0x56))
+
+    def __init__(self, verbosePrint = False):
+        self.memory = bytearray(self._memorySize)
+        self.testData = MCP25625_mock_memory(self.memory)
+        self.verbosePrint = verbosePrint
+
+    def Reset(self):
+        self.memory[:] = bytes(self._memorySize)
+        # CANCTRL and CANSTAT start in configuration mode
+        self.memory[0x0F] = 0b10000111
+        self.memory[0x0E] = 0b10000000
+
+    def ReadBytes(self, addressBytes, len):
+        # A new buffer for each read: transactions keep a reference to it
+        return self.memory[addressBytes:addressBytes + len]
+
+    # The memory cannot fail, writes are never verified
+    def WriteBytes(self, addressBytes, listBytes, verifyMask = None):
+        self.memory[addressBytes:addressBytes + len(listBytes)] = \
+            bytes(listBytes)
+
+    def ReadRxBuffer(self, rxBufferId, len = 13, fromData = False):
+        address = self._rxBufferAddresses[rxBufferId][int(fromData)]
+        readData = self.memory[address:address + len]
+        # RXnIF is cleared at the end of the instruction
+        self.memory[0x2C] &= ~(1 << rxBufferId)
+        return readData
+
+    def LoadTxBuffer(self, txBufferId, listBytes, fromData = False):
+        address = self._txBufferAddresses[txBufferId][int(fromData)]
+        self.memory[address:address + len(listBytes)] = bytes(listBytes)
+
+    # RTS sets TXBnCTRL.TXREQ of the selected buffers
+    def RequestToSend(self, txBufferMask):
+        for txBufferId, address in enumerate((0x30, 0x40, 0x50)):
+            if txBufferMask & (1 << txBufferId):
+                self.memory[address] |= 0b00001000
+
+    # READ STATUS built from CANINTF and TXBnCTRL.TXREQ
+    def ReadStatus(self):
+        canintf = self.memory[0x2C]
+        status = canintf & 0b00000011
+        for txBufferId, address in enumerate((0x30, 0x40, 0x50)):
+            if self.memory[address] & 0b00001000:
+                status |= 0b00000100 << (2 * txBufferId)
+            if canintf & (0b00000100 << txBufferId):
+                status |= 0b00001000 << (2 * txBufferId)
+        return status
+
+    # RX STATUS built from CANINTF (message type and filter match are
+    # not simulated)
+    def RxStatus(self):
+        return (self.memory[0x2C] & 0b00000011) << 6
+
+    def WriteByte(self, addressByte, byteValue):
+        self.memory[addressByte] = byteValue
+
+    def ReadByte(self, addressByte):
+        return self.memory[addressByte]
+
+    def BitModify(self, addressByte, maskByte, dataByte, verifyMask = None):
+        self.memory[addressByte] = \
+            (self.memory[addressByte] & ~maskByte) | (dataByte & maskByte)
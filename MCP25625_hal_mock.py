@@ -1,42 +1,63 @@
 # Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
 # See the LICENSE.txt file in the project root for more information.
 
-import spidev as spidev
+from MCP25625_hal_memory import MCP25625_hal_memory, MCP25625_mock_memory
 
 
 # Hardware abstraction (mock) layer - Low-level access to MCP25625
-class MCP25625_hal_mock:
-    def __init__(self):
-        self.testData = {}
+# The register map in memory of MCP25625_hal_memory (mock backend, see
+# MCP25625_hal_base), printing each call when verbosePrint is set
+class MCP25625_hal_mock(MCP25625_hal_memory):
 
-    # Reset the HW before beginning to inteact with it
-    def __enter__(self):
-        return self
+    def __init__(self, verbosePrint = True):
+        super().__init__(verbosePrint)
 
-    def __exit__(self, type, value, traceback):
-        pass
-      
     #
     # mock commands implemented by MCP25625
     #
 
     def Reset(self):
-        print("Reset")
+        if self.verbosePrint:
+            print("Reset")
+        super().Reset()
 
     # Read a number of bytes starting from given address and length
     def ReadBytes(self, addressBytes, len):
-        print("ReadBytes({0},{1},{2}".format(self, addressBytes, len))
-        return self.testData[addressBytes]
+        if self.verbosePrint:
+            print("ReadBytes({0},{1},{2}".format(self, addressBytes, len))
+        return super().ReadBytes(addressBytes, len)
+
+    def WriteBytes(self, addressBytes, listBytes, verifyMask = None):
+        if self.verbosePrint:
+            print("WriteBytes({0},{1},{2}".format(
+                self, addressBytes, listBytes))
+        super().WriteBytes(addressBytes, listBytes, verifyMask)
+
+    def ReadRxBuffer(self, rxBufferId, len = 13, fromData = False):
+        if self.verbosePrint:
+            print("ReadRxBuffer({0},{1},{2},{3}".format(
+                self, rxBufferId, len, fromData))
+        return super().ReadRxBuffer(rxBufferId, len, fromData)
+
+    def LoadTxBuffer(self, txBufferId, listBytes, fromData = False):
+        if self.verbosePrint:
+            print("LoadTxBuffer({0},{1},{2},{3}".format(
+                self, txBufferId, listBytes, fromData))
+        super().LoadTxBuffer(txBufferId, listBytes, fromData)
+
+    def RequestToSend(self, txBufferMask):
+        if self.verbosePrint:
+            print("RequestToSend({0},{1:03b}".format(self, txBufferMask))
+        super().RequestToSend(txBufferMask)
 
-    def WriteBytes(self, addressBytes, listBytes):
-        print("WriteBytes({0},{1},{2}".format(
-            self, addressBytes, listBytes))
-        self.testData[addressBytes] = listBytes
-
-    # TODO optimize this for writing a single byte
     def WriteByte(self, addressByte, byteValue):
         self.WriteBytes(addressByte, [byteValue])
 
-    # TODO optimize this to use the other read command
     def ReadByte(self, addressByte):
         return self.ReadBytes(addressByte, 1)[0]
+
+    def BitModify(self, addressByte, maskByte, dataByte, verifyMask = None):
+        if self.verbosePrint:
+            print("BitModify({0},{1},{2},{3}".format(
+                self, addressByte, maskByte, dataByte))
+        super().BitModify(addressByte, maskByte, dataByte, verifyMask)
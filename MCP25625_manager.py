@@ -0,0 +1,211 @@
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Runs several MCP25625 devices in parallel
+
+import queue
+import threading
+from MCP25625_api import MCP25625_api
+from MCP25625_hal_base import CreateHal
+from MCP25625_registers import MCP25625_RegisterGroup
+
+class MCP25625_device(object):
+    """
+    A device run by MCP25625_manager: its HAL, CAN API instance, message queues
+    and counters.
+    """
+
+    def __init__(self, bus, cs, hal, api):
+        self.bus = bus
+        self.cs = cs
+        self.hal = hal
+        self.api = api
+        self.txQueue = queue.Queue()
+        self.rxQueue = queue.Queue()
+        self.sent = 0
+        self.received = 0
+        self.sendErrors = 0
+        self.recvErrors = 0
+        # Last exception raised by a Send or Recv of the I/O thread
+        self.lastError = None
+        self.thread = None
+
+class MCP25625_manager(object):
+    """
+    Opens one MCP25625 per (bus, cs) pair and runs each of them from its own
+    I/O thread.
+
+    Each device has its own HAL, register group and CAN API instance. Its I/O
+    thread alternates between sending the messages queued with Send and
+    receiving the messages available on the device into its receive queue
+    (see Recv). A failed send or receive is counted in the sendErrors or
+    recvErrors of the device (lastError holds the exception) and the thread
+    keeps running. Devices only share the Python interpreter, so the aggregate
+    throughput scales with the number of devices as long as the time is spent
+    in SPI transfers.
+
+    Usage:
+        with MCP25625_manager([(0, 0), (0, 1)]) as manager:
+            manager.Send(0, msg)
+            msg = manager.Recv(1, timeoutSeconds = 1)
+    """
+
+    # Wait of an I/O thread with nothing to send or receive
+    _idleWaitSeconds = 0.001
+
+    def __init__(self, devices, halFactory = None, loopbackMode = False,
+                 sendTimeoutMilliseconds = 1000, verbosePrint = False, backend = None):
+        """
+        Creates a device manager (devices are opened by Open).
+
+        Args:
+            devices: List of (bus, cs) pairs, one per MCP25625.
+            halFactory: Function returning the HAL of a (bus, cs) pair
+                (by default the HAL backend selected by CreateHal).
+            backend: The HAL backend name used by the default halFactory (see 
+                CreateHal, by default the MCP25625_HAL environment variable, or spidev).
+            loopbackMode: Set the devices in Loopback mode instead of Normal mode.
+            sendTimeoutMilliseconds: The timeout of each message sent.
+            verbosePrint: Enable console verbose logging.
+        """
+
+        if halFactory == None:
+            halFactory = lambda bus, cs: CreateHal(backend, bus = bus, device = cs)
+        self.deviceIds = list(devices)
+        self.halFactory = halFactory
+        self.loopbackMode = loopbackMode
+        self.sendTimeoutMilliseconds = sendTimeoutMilliseconds
+        self.verbosePrint = verbosePrint
+        self.devices = []
+        self._stopEvent = threading.Event()
+
+    def __enter__(self):
+        self.Open()
+        self.Start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.Close()
+        return
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __getitem__(self, index):
+        return self.devices[index]
+
+    def Open(self):
+        """
+        Opens and initializes every device.
+        """
+
+        for bus, cs in self.deviceIds:
+            hal = self.halFactory(bus, cs)
+            api = MCP25625_api(MCP25625_RegisterGroup(), self.verbosePrint)
+            api.Initialize(hal)
+            if self.loopbackMode:
+                api.SetLoopbackMode()
+            else:
+                api.SetNormalMode()
+            self.devices += [MCP25625_device(bus, cs, hal, api)]
+
+    def Start(self):
+        """
+        Starts the I/O thread of each device.
+        """
+
+        self._stopEvent.clear()
+        for device in self.devices:
+            device.thread = threading.Thread(
+                target = self._IoLoop, args = (device,),
+                name = "MCP25625 {0}.{1}".format(device.bus, device.cs))
+            device.thread.daemon = True
+            device.thread.start()
+
+    def Stop(self):
+        """
+        Stops the I/O threads, after the messages being sent or received.
+        """
+
+        self._stopEvent.set()
+        for device in self.devices:
+            if device.thread != None:
+                device.thread.join()
+                device.thread = None
+
+    def Close(self):
+        """
+        Stops the I/O threads and closes every device.
+        """
+
+        self.Stop()
+        for device in self.devices:
+            device.api.__exit__(None, None, None)
+        self.devices = []
+
+    def Send(self, index, msg):
+        """
+        Queues a CAN Message to be sent by a device.
+
+        Args:
+            index: The device index (order of the (bus, cs) pairs).
+            msg: The CAN Message.
+        """
+
+        self.devices[index].txQueue.put(msg)
+
+    def Recv(self, index, timeoutSeconds = None):
+        """
+        Receives a CAN Message from a device.
+
+        Args:
+            index: The device index (order of the (bus, cs) pairs).
+            timeoutSeconds: the timeout in seconds to wait for a new message.
+
+        Returns:
+            A CAN Message
+
+        Raises:
+            TimeoutError: if the timeoutSeconds passed without receiving any message.
+        """
+
+        try:
+            return self.devices[index].rxQueue.get(timeout = timeoutSeconds)
+        except queue.Empty:
+            raise TimeoutError("No message received from device {0}".format(index))
+
+    def _IoLoop(self, device):
+        api = device.api
+        while not self._stopEvent.is_set():
+            busy = False
+
+            try:
+                msg = device.txQueue.get_nowait()
+            except queue.Empty:
+                msg = None
+            if msg != None:
+                busy = True
+                try:
+                    api.Send(msg, timeoutMilliseconds = self.sendTimeoutMilliseconds)
+                    device.sent += 1
+                except Exception as e:
+                    device.sendErrors += 1
+                    self._IoError(device, e)
+
+            try:
+                if api.Peek():
+                    busy = True
+                    device.rxQueue.put(api.Recv())
+                    device.received += 1
+            except Exception as e:
+                device.recvErrors += 1
+                self._IoError(device, e)
+
+            if not busy:
+                self._stopEvent.wait(self._idleWaitSeconds)
+
+    # Internal method. Records an exception of the I/O thread of a device
+    def _IoError(self, device, e):
+        device.lastError = e
+        if self.verbosePrint:
+            print("- _IoLoop({0}.{1}): {2!r}".format(device.bus, device.cs, e))
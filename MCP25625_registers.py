@@ -290,42 +290,42 @@ class CANINTFx(Register):
     # Message Error Interrupt Flag bit
     # 1 = Interrupt pending (must be cleared by MCU to reset interrupt)
     # 0 = No interrupt pending
-    MERRF = Field(7, 1, Access.RW, 0)
+    MERRF = Field(7, 1, Access.RW, 0, volatile = True)
 
     # Wake-up Interrupt Flag bit
     # 1 = Interrupt pending (must be cleared by MCU to reset interrupt)
     # 0 = No interrupt pending
-    WAKIF = Field(6, 1, Access.RW, 0)
+    WAKIF = Field(6, 1, Access.RW, 0, volatile = True)
 
     # Error Interrupt Flag bit (multiple sources in the EFLG register)
     # 1 = Interrupt pending (must be cleared by MCU to reset interrupt)
     # 0 = No interrupt pending
-    ERRIF = Field(5, 1, Access.RW, 0)
+    ERRIF = Field(5, 1, Access.RW, 0, volatile = True)
 
     # Transmit Buffer 2 Empty Interrupt Flag bit
     # 1 = Interrupt pending (must be cleared by MCU to reset interrupt)
     # 0 = No interrupt pending
-    TX2IF = Field(4, 1, Access.RW, 0)
+    TX2IF = Field(4, 1, Access.RW, 0, volatile = True)
 
     # Transmit Buffer 1 Empty Interrupt Flag bit
     # 1 = Interrupt pending (must be cleared by MCU to reset interrupt)
     # 0 = No interrupt pending
-    TX1IF = Field(3, 1, Access.RW, 0)
+    TX1IF = Field(3, 1, Access.RW, 0, volatile = True)
 
     # Transmit Buffer 0 Empty Interrupt Flag bit
     # 1 = Interrupt pending (must be cleared by MCU to reset interrupt)
     # 0 = No interrupt pending
-    TX0IF = Field(2, 1, Access.RW, 0)
+    TX0IF = Field(2, 1, Access.RW, 0, volatile = True)
 
     #  Receive Buffer 1 Full Interrupt Flag bit
     # 1 = Interrupt pending (must be cleared by MCU to reset interrupt)
     # 0 = No interrupt pending
-    RX1IF = Field(1, 1, Access.RW, 0)
+    RX1IF = Field(1, 1, Access.RW, 0, volatile = True)
 
     #  Receive Buffer 0 Full Interrupt Flag bit
     # 1 = Interrupt pending (must be cleared by MCU to reset interrupt)
     # 0 = No interrupt pending
-    RX0IF = Field(0, 1, Access.RW, 0)
+    RX0IF = Field(0, 1, Access.RW, 0, volatile = True)
 
 
 #
@@ -402,7 +402,7 @@ class TXBnCTRLx(Register):
     TXREQ_NotPending = 0
 
     # Message transmit request bit
-    TXREQ = Field(3, 1, Access.RW, TXREQ_NotPending)
+    TXREQ = Field(3, 1, Access.RW, TXREQ_NotPending, volatile = True)
 
     # bit 2 not implemented (reads 0)
 
@@ -748,63 +748,140 @@ class RXMnIDx(Register):
     EID = Field(17, 18, Access.RW, 0b000000000000000000)
 
 
+#
+# Status bytes of the READ STATUS and RX STATUS instructions
+# They are not registers of the register map: the HAL returns them as a 
+# byte (see MCP25625_hal.ReadStatus and RxStatus), decoded with the 
+# register masks of the fields below.
+#
+
+
+# READ STATUS: transmit requests and interrupt flags of all buffers
+class READSTATUSx(Register):
+
+    # CANINTF.TX2IF
+    TX2IF = Field(7, 1, Access.R, 0)
+
+    # TXB2CTRL.TXREQ
+    TX2REQ = Field(6, 1, Access.R, 0)
+
+    # CANINTF.TX1IF
+    TX1IF = Field(5, 1, Access.R, 0)
+
+    # TXB1CTRL.TXREQ
+    TX1REQ = Field(4, 1, Access.R, 0)
+
+    # CANINTF.TX0IF
+    TX0IF = Field(3, 1, Access.R, 0)
+
+    # TXB0CTRL.TXREQ
+    TX0REQ = Field(2, 1, Access.R, 0)
+
+    # CANINTF.RX1IF
+    RX1IF = Field(1, 1, Access.R, 0)
+
+    # CANINTF.RX0IF
+    RX0IF = Field(0, 1, Access.R, 0)
+
+
+# RX STATUS: received messages, type and filter match
+class RXSTATUSx(Register):
+
+    # Message in RXB1 (CANINTF.RX1IF)
+    RX1 = Field(7, 1, Access.R, 0)
+
+    # Message in RXB0 (CANINTF.RX0IF)
+    RX0 = Field(6, 1, Access.R, 0)
+
+    # Bit 5 not used
+
+    MSGTYPE_StandardDataFrame = 0b00
+    MSGTYPE_StandardRemoteFrame = 0b01
+    MSGTYPE_ExtendedDataFrame = 0b10
+    MSGTYPE_ExtendedRemoteFrame = 0b11
+
+    # Type of the last received message
+    MSGTYPE = Field(4, 2, Access.R, MSGTYPE_StandardDataFrame)
+
+    # Filter match of the last received message
+    # 0..5: RXF0..RXF5
+    # 6, 7: RXF0, RXF1 (rolled over into RXB1)
+    FILHIT = Field(2, 3, Access.R, 0b000)
+
+
 #
 #  Register instances
 #
 
 
+# Registers bound with cacheable=True only change when written by the 
+# MCU and can be served from the group shadow cache (see 
+# RegisterGroup.EnableCache). All other registers (status, flags, error 
+# counters, TX/RX control and RX buffers) are volatile.
+#
+# Note: the mask and filter registers read as zero outside of 
+# Configuration mode. Their shadow copy keeps the configured value.
+#
+# Registers bound with bitModifiable=True accept the BIT MODIFY SPI 
+# instruction, so transactions on them only update the modified fields.
 class MCP25625_RegisterGroup(RegisterGroup):
 
+    # Snapshot() reads the whole register map in a single READ
+    # (CANSTAT and CANCTRL are mirrored at every xEh/xFh address)
+    snapshotAddress = 0x00
+    snapshotLength = 0x80
+
     # General control and status registers
 
     CANSTAT = CANSTATx().BindToAddress(0x0E)
-    CANCTRL = CANCTRLx().BindToAddress(0x0F)
+    CANCTRL = CANCTRLx().BindToAddress(0x0F, bitModifiable=True)
 
-    CNF1 = CNF1x().BindToAddress(0x2A)
-    CNF2 = CNF2x().BindToAddress(0x29)
-    CNF3 = CNF3x().BindToAddress(0x28)
+    CNF1 = CNF1x().BindToAddress(0x2A, cacheable=True, bitModifiable=True)
+    CNF2 = CNF2x().BindToAddress(0x29, cacheable=True, bitModifiable=True)
+    CNF3 = CNF3x().BindToAddress(0x28, cacheable=True, bitModifiable=True)
 
     TEC = TECx().BindToAddress(0x1C)
     REC = RECx().BindToAddress(0x2C)
 
-    EFLG = EFLGx().BindToAddress(0x2D)
+    EFLG = EFLGx().BindToAddress(0x2D, bitModifiable=True)
 
-    CANINTE = CANINTEx().BindToAddress(0x2B)
-    CANINTF = CANINTFx().BindToAddress(0x2C)
+    CANINTE = CANINTEx().BindToAddress(0x2B, cacheable=True, 
+                                       bitModifiable=True)
+    CANINTF = CANINTFx().BindToAddress(0x2C, bitModifiable=True)
 
     # Transmission registers: control, ID and data
 
     # TX global control
-    TXRTSCTRL = TXRTSCTRLx().BindToAddress(0x0D)
+    TXRTSCTRL = TXRTSCTRLx().BindToAddress(0x0D, bitModifiable=True)
 
     # TX Buffer control
-    TXB0CTRL = TXBnCTRLx().BindToAddress(0x30)
-    TXB1CTRL = TXBnCTRLx().BindToAddress(0x40)
-    TXB2CTRL = TXBnCTRLx().BindToAddress(0x50)
+    TXB0CTRL = TXBnCTRLx().BindToAddress(0x30, bitModifiable=True)
+    TXB1CTRL = TXBnCTRLx().BindToAddress(0x40, bitModifiable=True)
+    TXB2CTRL = TXBnCTRLx().BindToAddress(0x50, bitModifiable=True)
    
     # TX Standard ID and extended ID   
-    TXB0ID = TXBnIDx().BindToAddress(0x31, 4)
-    TXB1ID = TXBnIDx().BindToAddress(0x41, 4)
-    TXB2ID = TXBnIDx().BindToAddress(0x51, 4)
+    TXB0ID = TXBnIDx().BindToAddress(0x31, 4, cacheable=True)
+    TXB1ID = TXBnIDx().BindToAddress(0x41, 4, cacheable=True)
+    TXB2ID = TXBnIDx().BindToAddress(0x51, 4, cacheable=True)
 
     # TX Data length code
-    TXB0DLC = TXBnDLCx().BindToAddress(0x35)
-    TXB1DLC = TXBnDLCx().BindToAddress(0x45)
-    TXB2DLC = TXBnDLCx().BindToAddress(0x55)
+    TXB0DLC = TXBnDLCx().BindToAddress(0x35, cacheable=True)
+    TXB1DLC = TXBnDLCx().BindToAddress(0x45, cacheable=True)
+    TXB2DLC = TXBnDLCx().BindToAddress(0x55, cacheable=True)
 
     # TX Data buffers
-    TXB0DATA = TXBnDATAx().BindToAddress(0x36, 8)
-    TXB1DATA = TXBnDATAx().BindToAddress(0x46, 8)
-    TXB2DATA = TXBnDATAx().BindToAddress(0x56, 8)
+    TXB0DATA = TXBnDATAx().BindToAddress(0x36, 8, cacheable=True)
+    TXB1DATA = TXBnDATAx().BindToAddress(0x46, 8, cacheable=True)
+    TXB2DATA = TXBnDATAx().BindToAddress(0x56, 8, cacheable=True)
 
     # Reception registers: control, ID, data
 
     # RxnBF pin mode and status (pin interrupt or digital mode)
-    BFPCTRL = BFPCTRLx().BindToAddress(0x0C)
+    BFPCTRL = BFPCTRLx().BindToAddress(0x0C, bitModifiable=True)
 
     # Receive buffer control registers
-    RXB0CTRL = RXB0CTRLx().BindToAddress(0x60)
-    RXB1CTRL = RXB1CTRLx().BindToAddress(0x70)
+    RXB0CTRL = RXB0CTRLx().BindToAddress(0x60, bitModifiable=True)
+    RXB1CTRL = RXB1CTRLx().BindToAddress(0x70, bitModifiable=True)
 
     # Received identifiers
     RXB0ID = RXBnIDx().BindToAddress(0x61, 4)
@@ -821,14 +898,14 @@ class MCP25625_RegisterGroup(RegisterGroup):
     # Acceptance filter and mask registers
 
     # Filters 0..5
-    RXF0ID = RXFnIDx().BindToAddress(0x00, 4)
-    RXF1ID = RXFnIDx().BindToAddress(0x04, 4)
-    RXF2ID = RXFnIDx().BindToAddress(0x08, 4)
-    RXF3ID = RXFnIDx().BindToAddress(0x10, 4)
-    RXF4ID = RXFnIDx().BindToAddress(0x14, 4)
-    RXF5ID = RXFnIDx().BindToAddress(0x18, 4)
+    RXF0ID = RXFnIDx().BindToAddress(0x00, 4, cacheable=True)
+    RXF1ID = RXFnIDx().BindToAddress(0x04, 4, cacheable=True)
+    RXF2ID = RXFnIDx().BindToAddress(0x08, 4, cacheable=True)
+    RXF3ID = RXFnIDx().BindToAddress(0x10, 4, cacheable=True)
+    RXF4ID = RXFnIDx().BindToAddress(0x14, 4, cacheable=True)
+    RXF5ID = RXFnIDx().BindToAddress(0x18, 4, cacheable=True)
 
     # Masks 0..1
-    RXM0ID = RXMnIDx().BindToAddress(0x20, 4)
-    RXM1ID = RXMnIDx().BindToAddress(0x24, 4)
+    RXM0ID = RXMnIDx().BindToAddress(0x20, 4, cacheable=True)
+    RXM1ID = RXMnIDx().BindToAddress(0x24, 4, cacheable=True)
 
@@ -0,0 +1,517 @@
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Behavioral model of the MCP25625 for running the API without a device
+#
+# MCP25625_sim is a spidev-like object decoding every SPI instruction of
+# the MCP25625 (RESET, READ, WRITE, BIT MODIFY, READ RX BUFFER, LOAD TX
+# BUFFER, RTS, READ STATUS, RX STATUS) against a model of the device:
+# - register reset values, read-only bits, CANSTAT/CANCTRL mirrored at
+#   every xEh/xFh address, registers only writable in Configuration mode,
+#   filters and masks reading as 0 outside of it, BIT MODIFY acting as a
+#   WRITE on registers that do not support it
+# - CANCTRL.REQOP applied to CANSTAT.OPMOD at once (the bus is idle)
+# - transmit requests completing in priority order (TXP, then the highest
+#   buffer) in Normal and Loopback modes: TXREQ cleared, TXnIF set, the
+#   frame looped back (Loopback) or put on the bus (Normal), aborts with
+#   ABAT or by clearing TXREQ
+# - reception into RXB0/RXB1 through the masks and filters (RXM modes,
+#   standard frame data byte filtering), RXB0 to RXB1 rollover (BUKT),
+#   FILHIT, RXRTR, RX STATUS message type and filter match, RXnOVR and
+#   ERRIF on overflow, CANSTAT.ICOD from the enabled flags
+# The bit timing, bus errors and error counters, Sleep mode wake-up,
+# one-shot mode and the RXnBF/TXnRTS pins are not simulated.
+#
+# MCP25625_hal_sim is the HAL backend ("sim", see MCP25625_hal_base)
+# running MCP25625_hal over a MCP25625_sim, so the API is exercised down
+# to the SPI frames. Frames are received with MCP25625_sim.Receive, or
+# from other simulated devices on a MCP25625_sim_bus.
+
+from MCP25625_hal import MCP25625_hal
+
+
+# CAN frame on the simulated bus
+class MCP25625_sim_frame(object):
+   __slots__ = ("arbitrationId", "data", "extended", "rtr", "dlc")
+
+   def __init__(self, arbitrationId, data = b"", extended = True,
+                rtr = False, dlc = None):
+      self.arbitrationId = arbitrationId
+      self.data = bytes(data)
+      self.extended = extended
+      self.rtr = rtr
+      self.dlc = len(self.data) if dlc is None else dlc
+
+   def __eq__(self, other):
+      return isinstance(other, MCP25625_sim_frame) and \
+         (self.arbitrationId, self.data, self.extended, self.rtr, self.dlc) \
+         == (other.arbitrationId, other.data, other.extended, other.rtr,
+             other.dlc)
+
+   def __repr__(self):
+      return "MCP25625_sim_frame(0x{0:x}, {1}, extended = {2}, " \
+             "rtr = {3}, dlc = {4})".format(self.arbitrationId,
+             list(self.data), self.extended, self.rtr, self.dlc)
+
+
+# CAN bus between simulated devices: a frame transmitted by a device in
+# Normal mode is received by the other devices (see MCP25625_sim.Receive)
+class MCP25625_sim_bus(object):
+
+   def __init__(self):
+      self.devices = []
+      # Frames transmitted on the bus, in order
+      self.frames = []
+
+   def Attach(self, device):
+      self.devices += [device]
+      device.bus = self
+
+   def Transmit(self, frame, sender):
+      self.frames += [frame]
+      for device in self.devices:
+         if device is not sender:
+            device.Receive(frame)
+
+
+class MCP25625_sim(object):
+
+   # Operation modes (CANCTRL.REQOP, CANSTAT.OPMOD)
+   MODE_NORMAL = 0b000
+   MODE_SLEEP = 0b001
+   MODE_LOOPBACK = 0b010
+   MODE_LISTEN_ONLY = 0b011
+   MODE_CONFIGURATION = 0b100
+
+   # Register addresses
+   _CANCTRL = 0x0F
+   _CNF3 = 0x28
+   _CANINTE = 0x2B
+   _CANINTF = 0x2C
+   _EFLG = 0x2D
+   _TXBCTRL = (0x30, 0x40, 0x50)
+   _RXBCTRL = (0x60, 0x70)
+   _RXF = (0x00, 0x04, 0x08, 0x10, 0x14, 0x18)
+   _RXM = (0x20, 0x24)
+   # Filters of each receive buffer
+   _rxFilters = ((0, 1), (2, 3, 4, 5))
+
+   # READ RX BUFFER and LOAD TX BUFFER start addresses
+   _readRxAddresses = (0x61, 0x66, 0x71, 0x76)
+   _loadTxAddresses = (0x31, 0x36, 0x41, 0x46, 0x51, 0x56)
+
+   # Registers supporting BIT MODIFY (CANCTRL at every xFh address)
+   _bitModifiable = frozenset([0x0C, 0x0D, 0x28, 0x29, 0x2A, 0x2B, 0x2C,
+                               0x2D, 0x30, 0x40, 0x50, 0x60, 0x70] +
+                              list(range(0x0F, 0x80, 0x10)))
+
+   # Registers only writable in Configuration mode: TXRTSCTRL, CNF1-3,
+   # filters and masks
+   _configurationOnly = frozenset([0x0D, 0x28, 0x29, 0x2A] +
+                                  list(range(0x00, 0x0C)) +
+                                  list(range(0x10, 0x1C)) +
+                                  list(range(0x20, 0x28)))
+
+   # Filters and masks, reading as 0 outside of Configuration mode
+   _filtersAndMasks = frozenset(list(range(0x00, 0x0C)) +
+                                list(range(0x10, 0x1C)) +
+                                list(range(0x20, 0x28)))
+
+   # Writable bits of each register
+   _writeMasks = bytearray([0xFF] * 0x80)
+   _writeMasks[0x0C] = 0b00111111                # BFPCTRL
+   _writeMasks[0x0D] = 0b00000111                # TXRTSCTRL
+   _writeMasks[0x1C] = 0                         # TEC
+   _writeMasks[0x1D] = 0                         # REC
+   _writeMasks[0x28] = 0b11000111                # CNF3
+   _writeMasks[0x2D] = 0b11000000                # EFLG (RXnOVR)
+   for _address in (0x01, 0x05, 0x09, 0x11, 0x15, 0x19):
+      _writeMasks[_address] = 0b11101011         # RXFnSIDL
+   for _address in (0x21, 0x25):
+      _writeMasks[_address] = 0b11100011         # RXMnSIDL
+   for _address in (0x30, 0x40, 0x50):
+      _writeMasks[_address] = 0b00001011         # TXBnCTRL (TXREQ, TXP)
+      _writeMasks[_address + 2] = 0b11101011     # TXBnSIDL
+      _writeMasks[_address + 5] = 0b01001111     # TXBnDLC
+   _writeMasks[0x60] = 0b01100100                # RXB0CTRL (RXM, BUKT)
+   _writeMasks[0x70] = 0b01100000                # RXB1CTRL (RXM)
+   for _address in list(range(0x61, 0x6E)) + list(range(0x71, 0x7E)):
+      _writeMasks[_address] = 0                  # receive buffers
+   del _address
+
+   def __init__(self, bus = None, transmitImmediately = True):
+      self.memory = bytearray(0x80)
+      self.mode = self.MODE_CONFIGURATION
+      # MSGTYPE and FILHIT of RX STATUS for each receive buffer
+      self.rxStatus = [0, 0]
+      # Complete the transmit requests at the end of each instruction,
+      # otherwise when TransmitPending is called
+      self.transmitImmediately = transmitImmediately
+      # Frames transmitted in Normal mode
+      self.transmitted = []
+      self.bus = None
+      if bus is not None:
+         bus.Attach(self)
+      # SPI traffic
+      self.max_speed_hz = MCP25625_hal.defaultSpiClockHz
+      self.transfers = 0
+      self.transferBytes = 0
+      self.Reset()
+
+   #
+   # spidev interface
+   #
+
+   def xfer(self, command):
+      return self.Transfer(command)
+
+   xfer2 = xfer
+   xfer3 = xfer
+
+   def writebytes(self, command):
+      self.Transfer(command)
+
+   writebytes2 = writebytes
+
+   # Clocks zeroes (no instruction) and returns what the device sends
+   def readbytes(self, length):
+      return self.Transfer(bytes(length))
+
+   def close(self):
+      pass
+
+   # Time of the SPI transfers at the SPI clock
+   def BusSeconds(self):
+      return self.transferBytes * 8.0 / self.max_speed_hz
+
+   #
+   # SPI instructions
+   #
+
+   # Executes the instruction of one SPI frame (chip select low to high)
+   # and returns the bytes sent by the device
+   def Transfer(self, command):
+      command = bytes(command)
+      length = len(command)
+      self.transfers += 1
+      self.transferBytes += length
+      response = [0] * length
+      if length == 0:
+         return response
+      op = command[0]
+      if op == 0b11000000:
+         self.Reset()
+      elif op == 0b00000011:
+         if length > 2:
+            response[2:] = self.ReadRegisters(command[1], length - 2)
+      elif op == 0b00000010:
+         if length > 2:
+            self.WriteRegisters(command[1], command[2:])
+      elif op == 0b00000101:
+         if length >= 4:
+            address = command[1] & 0x7F
+            mask = command[2] if address in self._bitModifiable else 0xFF
+            self.WriteRegister(address, command[3], mask)
+      elif (op & 0b11111001) == 0b10010000:
+         # READ RX BUFFER: RXnIF is cleared when chip select rises
+         response[1:] = self.ReadRegisters(
+            self._readRxAddresses[(op >> 1) & 0b11], length - 1)
+         self.memory[self._CANINTF] &= ~(1 << ((op >> 2) & 1)) & 0xFF
+      elif 0b01000000 <= op <= 0b01000101:
+         self.WriteRegisters(self._loadTxAddresses[op & 0b111], command[1:])
+      elif (op & 0b11111000) == 0b10000000:
+         for txBufferId, address in enumerate(self._TXBCTRL):
+            if op & (1 << txBufferId):
+               self.WriteRegister(address, 0b00001000, 0b00001000)
+      elif op == 0b10100000:
+         response[1:] = [self.ReadStatus()] * (length - 1)
+      elif op == 0b10110000:
+         response[1:] = [self.RxStatus()] * (length - 1)
+      # Other instructions are ignored
+      if self.transmitImmediately:
+         self.TransmitPending()
+      return response
+
+   # RESET: registers to their reset values, Configuration mode
+   def Reset(self):
+      self.memory[:] = bytes(len(self.memory))
+      # CLKEN, CLKPRE = 1:8, Configuration mode requested
+      self.memory[self._CANCTRL] = 0b10000111
+      self.mode = self.MODE_CONFIGURATION
+      self.rxStatus = [0, 0]
+
+   def ReadRegisters(self, address, length):
+      return [self.ReadRegister((address + i) & 0x7F) for i in range(length)]
+
+   def WriteRegisters(self, address, data):
+      for i, value in enumerate(data):
+         self.WriteRegister((address + i) & 0x7F, value)
+
+   def ReadRegister(self, address):
+      low = address & 0x0F
+      if low == 0x0E:
+         return (self.mode << 5) | (self.InterruptCode() << 1)
+      if low == 0x0F:
+         return self.memory[self._CANCTRL]
+      if (self.mode != self.MODE_CONFIGURATION) and \
+            (address in self._filtersAndMasks):
+         return 0
+      return self.memory[address]
+
+   # Writes the bits of value selected by mask, except the read-only bits,
+   # and applies the side effects of the write
+   def WriteRegister(self, address, value, mask = 0xFF):
+      low = address & 0x0F
+      if low == 0x0E:
+         return
+      if low == 0x0F:
+         address = self._CANCTRL
+      if (self.mode != self.MODE_CONFIGURATION) and \
+            (address in self._configurationOnly):
+         return
+      mask &= self._writeMasks[address]
+      old = self.memory[address]
+      new = (old & ~mask & 0xFF) | (value & mask)
+      self.memory[address] = new
+
+      if address == self._CANCTRL:
+         self.RequestMode(new >> 5)
+         if new & 0b00010000:
+            self.AbortAll()
+      elif address in self._TXBCTRL:
+         if (old & ~new) & 0b00001000:
+            # Cleared while pending: aborted
+            self.memory[address] |= 0b01000000
+         elif (new & ~old) & 0b00001000:
+            # ABTF, MLOA and TXERR are cleared by a new request
+            self.memory[address] &= 0b10001111
+      elif address == self._RXBCTRL[0]:
+         # BUKT1 is a copy of BUKT
+         self.memory[address] = (new & 0b11111101) | ((new >> 1) & 0b10)
+
+   # READ STATUS: RXnIF, TXnREQ and TXnIF (see READSTATUSx)
+   def ReadStatus(self):
+      canintf = self.memory[self._CANINTF]
+      status = canintf & 0b00000011
+      for txBufferId, address in enumerate(self._TXBCTRL):
+         if self.memory[address] & 0b00001000:
+            status |= 0b00000100 << (2 * txBufferId)
+         if canintf & (0b00000100 << txBufferId):
+            status |= 0b00001000 << (2 * txBufferId)
+      return status
+
+   # RX STATUS: buffers holding a message, with the message type and
+   # filter match of RXB0 if it holds one, else of RXB1 (see RXSTATUSx)
+   def RxStatus(self):
+      canintf = self.memory[self._CANINTF]
+      status = (canintf & 0b00000011) << 6
+      if canintf & 0b00000001:
+         status |= self.rxStatus[0]
+      elif canintf & 0b00000010:
+         status |= self.rxStatus[1]
+      return status
+
+   # CANSTAT.ICOD: highest priority interrupt among the enabled flags
+   def InterruptCode(self):
+      flags = self.memory[self._CANINTF] & self.memory[self._CANINTE]
+      # ERRIF, WAKIF, TX0IF, TX1IF, TX2IF, RX0IF, RX1IF
+      for code, bit in enumerate((5, 6, 2, 3, 4, 0, 1)):
+         if flags & (1 << bit):
+            return code + 1
+      return 0
+
+   #
+   # Modes and transmission
+   #
+
+   # Applies CANCTRL.REQOP (the other values are ignored)
+   def RequestMode(self, mode):
+      if mode <= self.MODE_CONFIGURATION:
+         self.mode = mode
+
+   # ABAT: aborts the pending transmissions
+   def AbortAll(self):
+      for address in self._TXBCTRL:
+         if self.memory[address] & 0b00001000:
+            self.memory[address] = (self.memory[address] & 0b11110111) | \
+                                   0b01000000
+
+   # Completes the pending transmit requests in Normal and Loopback mode,
+   # highest priority (TXP, then buffer number) first
+   def TransmitPending(self):
+      if self.mode not in (self.MODE_NORMAL, self.MODE_LOOPBACK):
+         return
+      while True:
+         pending = [(self.memory[address] & 0b11, txBufferId)
+                    for txBufferId, address in enumerate(self._TXBCTRL)
+                    if self.memory[address] & 0b00001000]
+         if not pending:
+            return
+         self.Transmit(max(pending)[1])
+
+   def Transmit(self, txBufferId):
+      address = self._TXBCTRL[txBufferId]
+      frame = self.DecodeFrame(self.memory[address + 1:address + 14])
+      self.memory[address] &= 0b11110111
+      self.memory[self._CANINTF] |= 0b00000100 << txBufferId
+      if self.mode == self.MODE_LOOPBACK:
+         self.Accept(frame)
+      else:
+         self.transmitted += [frame]
+         if self.bus is not None:
+            self.bus.Transmit(frame, self)
+
+   #
+   # Reception
+   #
+
+   # Receives a frame from the bus (Normal and Listen-only modes)
+   # Returns True if the frame was stored in a receive buffer
+   def Receive(self, frame):
+      if self.mode not in (self.MODE_NORMAL, self.MODE_LISTEN_ONLY):
+         return False
+      return self.Accept(frame)
+
+   # Stores a frame in the receive buffer whose masks and filters accept
+   # it: RXB0 first, rolling over to RXB1 if RXB0 is full and BUKT is
+   # set, else RXB1
+   def Accept(self, frame):
+      canintf = self.memory[self._CANINTF]
+      filterHit = self.Match(frame, 0)
+      if filterHit is not None:
+         if not (canintf & 0b00000001):
+            self.Store(0, frame, filterHit)
+            return True
+         if self.memory[self._RXBCTRL[0]] & 0b00000100:
+            if not (canintf & 0b00000010):
+               self.Store(1, frame, filterHit)
+               return True
+            self.Overflow(1)
+         else:
+            self.Overflow(0)
+         return False
+      filterHit = self.Match(frame, 1)
+      if filterHit is not None:
+         if not (canintf & 0b00000010):
+            self.Store(1, frame, filterHit)
+            return True
+         self.Overflow(1)
+      return False
+
+   # Returns the filter of the receive buffer accepting the frame, or
+   # None (the first filter of the buffer if masks and filters are off)
+   def Match(self, frame, rxBufferId):
+      rxm = (self.memory[self._RXBCTRL[rxBufferId]] >> 5) & 0b11
+      filters = self._rxFilters[rxBufferId]
+      if rxm == 0b11:
+         return filters[0]
+      if (rxm == 0b01 and frame.extended) or \
+            (rxm == 0b10 and not frame.extended):
+         return None
+      maskSid, maskExtended, maskEid = self.DecodeId(
+         self.memory[self._RXM[rxBufferId]:self._RXM[rxBufferId] + 4])
+      for filterId in filters:
+         address = self._RXF[filterId]
+         filterSid, filterExtended, filterEid = self.DecodeId(
+            self.memory[address:address + 4])
+         if filterExtended != frame.extended:
+            continue
+         if frame.extended:
+            if ((frame.arbitrationId >> 18) ^ filterSid) & maskSid:
+               continue
+            if ((frame.arbitrationId & 0x3FFFF) ^ filterEid) & maskEid:
+               continue
+         else:
+            if (frame.arbitrationId ^ filterSid) & maskSid:
+               continue
+            # EID15:0 apply to the first two data bytes of standard data
+            # frames when both frame types are received
+            if (rxm == 0b00) and not frame.rtr:
+               data = frame.data + bytes(2)
+               if (((data[0] << 8) | data[1]) ^ filterEid) & maskEid & 0xFFFF:
+                  continue
+         return filterId
+      return None
+
+   def Store(self, rxBufferId, frame, filterHit):
+      address = self._RXBCTRL[rxBufferId]
+      image = self.EncodeFrame(frame)
+      self.memory[address + 1:address + 1 + len(image)] = image
+      rxrtr = 0b00001000 if frame.rtr else 0
+      rxStatusFilter = filterHit
+      if rxBufferId == 0:
+         self.memory[address] = (self.memory[address] & 0b11110110) | \
+                                rxrtr | (filterHit & 1)
+      else:
+         self.memory[address] = (self.memory[address] & 0b11110000) | \
+                                rxrtr | filterHit
+         if filterHit < 2:
+            # Rolled over from RXB0: RXB1CTRL.FILHIT is 000/001, RXB0
+            # keeps the filter hit of its own message
+            rxStatusFilter = 0b110 | filterHit
+      self.rxStatus[rxBufferId] = \
+         (((int(frame.extended) << 1) | int(frame.rtr)) << 3) | rxStatusFilter
+      self.memory[self._CANINTF] |= 1 << rxBufferId
+
+   # RXnOVR and ERRIF: a frame was accepted by a full buffer
+   def Overflow(self, rxBufferId):
+      self.memory[self._EFLG] |= 0b01000000 << rxBufferId
+      self.memory[self._CANINTF] |= 0b00100000
+
+   #
+   # Frame images (SIDH, SIDL, EID8, EID0, DLC, D0-D7)
+   #
+
+   @staticmethod
+   def DecodeId(image):
+      sid = (image[0] << 3) | (image[1] >> 5)
+      extended = bool(image[1] & 0b00001000)
+      eid = ((image[1] & 0b11) << 16) | (image[2] << 8) | image[3]
+      return sid, extended, eid
+
+   @staticmethod
+   def DecodeFrame(image):
+      sid, extended, eid = MCP25625_sim.DecodeId(image)
+      rtr = bool(image[4] & 0b01000000)
+      dlc = image[4] & 0b00001111
+      data = b"" if rtr else bytes(image[5:5 + min(dlc, 8)])
+      arbitrationId = (sid << 18) | eid if extended else sid
+      return MCP25625_sim_frame(arbitrationId, data, extended, rtr, dlc)
+
+   # Receive buffer image of a frame (RXBnSIDL.SRR and RXBnDLC.RTR for
+   # standard and extended remote frames)
+   @staticmethod
+   def EncodeFrame(frame):
+      if frame.extended:
+         sid = (frame.arbitrationId >> 18) & 0x7FF
+         eid = frame.arbitrationId & 0x3FFFF
+         sidl = ((sid & 0b111) << 5) | 0b00001000 | (eid >> 16)
+         dlc = (0b01000000 if frame.rtr else 0) | (frame.dlc & 0b1111)
+      else:
+         sid = frame.arbitrationId & 0x7FF
+         eid = 0
+         sidl = ((sid & 0b111) << 5) | (0b00010000 if frame.rtr else 0)
+         dlc = frame.dlc & 0b1111
+      return bytes([sid >> 3, sidl, (eid >> 8) & 0xFF, eid & 0xFF, dlc]) + \
+             frame.data[:8]
+
+
+# MCP25625_hal over a simulated device (sim backend, see MCP25625_hal_base)
+class MCP25625_hal_sim(MCP25625_hal):
+
+   capabilities = MCP25625_hal.CAP_DEVICE_MODEL | MCP25625_hal.CAP_VERIFY | \
+                  MCP25625_hal.CAP_SPI_CLOCK
+
+   def __init__(self, verbosePrint = False, sim = None, spiClockHz = None,
+                verifyPolicy = MCP25625_hal.VERIFY_NEVER, verifyEvery = 100):
+      if sim is None:
+         sim = MCP25625_sim()
+      MCP25625_hal.__init__(self, verbosePrint, spi = sim,
+                            spiClockHz = spiClockHz,
+                            verifyPolicy = verifyPolicy,
+                            verifyEvery = verifyEvery)
+      self.sim = sim
+
+   @classmethod
+   def Open(cls, bus = 0, device = 0, verbosePrint = False):
+      return cls(verbosePrint)
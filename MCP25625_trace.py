@@ -0,0 +1,261 @@
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# SPI trace recording and replay
+#
+# MCP25625_hal_recorder logs every SPI transfer of a MCP25625_hal to a
+# binary trace file. MCP25625_hal_replay serves the recorded responses
+# back, checking that the same commands are issued in the same order, so
+# a recorded session (e.g. Initialize + Send/Recv) can be rerun off-target
+# as a regression test of the SPI traffic.
+#
+# Trace file format (little endian):
+#    header: magic "MCPT", version (1 byte)
+#    records: kind (1 byte), monotonic timestamp in ns (8 bytes),
+#             command length (2 bytes), response length (2 bytes),
+#             command bytes, response bytes
+# Kinds: transfer (xfer/xfer2/xfer3), write (writebytes), read
+# (readbytes, no command) and marker (the command holds a UTF-8 label,
+# e.g. the API call being traced).
+
+import struct
+import time
+from MCP25625_hal import MCP25625_hal
+
+
+class SpiTraceException(Exception):
+   pass
+
+
+# Record of a trace file
+class SpiTraceRecord(object):
+   __slots__ = ("kind", "timestampNs", "command", "response")
+
+   KIND_TRANSFER = 0
+   KIND_WRITE = 1
+   KIND_READ = 2
+   KIND_MARKER = 3
+
+   def __init__(self, kind, timestampNs, command, response):
+      self.kind = kind
+      self.timestampNs = timestampNs
+      self.command = command
+      self.response = response
+
+   # Label of a marker record
+   @property
+   def label(self):
+      return self.command.decode("utf-8")
+
+
+_traceMagic = b"MCPT"
+_traceVersion = 1
+_recordHeader = struct.Struct("<BQHH")
+
+
+# Writes SPI trace records to a binary file (path or file object)
+class SpiTraceWriter(object):
+
+   def __init__(self, traceFile):
+      if isinstance(traceFile, str):
+         self.f = open(traceFile, "wb")
+         self.ownsFile = True
+      else:
+         self.f = traceFile
+         self.ownsFile = False
+      self.f.write(_traceMagic + bytes([_traceVersion]))
+
+   def Write(self, kind, command, response = b""):
+      command = bytes(command)
+      response = bytes(response)
+      self.f.write(_recordHeader.pack(kind, time.monotonic_ns(),
+                                      len(command), len(response)))
+      self.f.write(command)
+      self.f.write(response)
+
+   def close(self):
+      if self.ownsFile:
+         self.f.close()
+      else:
+         self.f.flush()
+
+
+# Reads the records of a binary SPI trace file (path or file object)
+class SpiTraceReader(object):
+
+   def __init__(self, traceFile):
+      if isinstance(traceFile, str):
+         with open(traceFile, "rb") as f:
+            data = f.read()
+      else:
+         data = traceFile.read()
+      if data[:len(_traceMagic)] != _traceMagic:
+         raise SpiTraceException("not a SPI trace file")
+      if data[len(_traceMagic)] != _traceVersion:
+         raise SpiTraceException("unsupported SPI trace version {0}"
+                                 .format(data[len(_traceMagic)]))
+      self.records = []
+      offset = len(_traceMagic) + 1
+      while offset < len(data):
+         kind, timestampNs, commandLen, responseLen = \
+            _recordHeader.unpack_from(data, offset)
+         offset += _recordHeader.size
+         command = data[offset:offset + commandLen]
+         offset += commandLen
+         response = data[offset:offset + responseLen]
+         offset += responseLen
+         if len(response) != responseLen:
+            raise SpiTraceException("truncated SPI trace")
+         self.records += [SpiTraceRecord(kind, timestampNs, command,
+                                         response)]
+
+   def __iter__(self):
+      return iter(self.records)
+
+   def __len__(self):
+      return len(self.records)
+
+
+# spidev-like wrapper logging every transfer of another spidev object
+class SpiRecorder(object):
+
+   def __init__(self, spi, writer):
+      self.spi = spi
+      self.writer = writer
+
+   def xfer(self, command):
+      response = self.spi.xfer(command)
+      self.writer.Write(SpiTraceRecord.KIND_TRANSFER, command, response)
+      return response
+
+   def xfer2(self, command):
+      response = self.spi.xfer2(command)
+      self.writer.Write(SpiTraceRecord.KIND_TRANSFER, command, response)
+      return response
+
+   def xfer3(self, command):
+      response = self.spi.xfer3(command)
+      self.writer.Write(SpiTraceRecord.KIND_TRANSFER, command, response)
+      return response
+
+   def writebytes(self, command):
+      self.spi.writebytes(command)
+      self.writer.Write(SpiTraceRecord.KIND_WRITE, command)
+
+   def writebytes2(self, command):
+      self.spi.writebytes2(command)
+      self.writer.Write(SpiTraceRecord.KIND_WRITE, command)
+
+   def readbytes(self, length):
+      response = self.spi.readbytes(length)
+      self.writer.Write(SpiTraceRecord.KIND_READ, b"", response)
+      return response
+
+   # SPI clock of the wrapped spidev object
+   @property
+   def max_speed_hz(self):
+      return self.spi.max_speed_hz
+
+   @max_speed_hz.setter
+   def max_speed_hz(self, spiClockHz):
+      self.spi.max_speed_hz = spiClockHz
+
+   def Marker(self, label):
+      self.writer.Write(SpiTraceRecord.KIND_MARKER, label.encode("utf-8"))
+
+   def close(self):
+      self.spi.close()
+      self.writer.close()
+
+
+# spidev-like object serving the responses of a SPI trace
+# Each transfer must match the next recorded one (kind and command
+# bytes), otherwise a SpiTraceException is raised. Markers are skipped.
+# A write also matches a recorded transfer of the same command, so traces 
+# recorded before MCP25625_hal issued writes with writebytes2 still replay.
+class SpiReplay(object):
+
+   def __init__(self, reader):
+      self.records = [r for r in reader
+                      if r.kind != SpiTraceRecord.KIND_MARKER]
+      self.index = 0
+
+   # Number of recorded transfers not replayed yet
+   def Remaining(self):
+      return len(self.records) - self.index
+
+   def Next(self, kind, command):
+      command = bytes(command)
+      if self.index >= len(self.records):
+         raise SpiTraceException(
+            "transfer {0} beyond the end of the trace: {1}".format(
+               self.index, command.hex()))
+      record = self.records[self.index]
+      kindMatches = (record.kind == kind) or \
+         ((kind == SpiTraceRecord.KIND_WRITE) and 
+          (record.kind == SpiTraceRecord.KIND_TRANSFER))
+      if (not kindMatches) or (record.command != command):
+         raise SpiTraceException(
+            "transfer {0} differs from the trace: {1} instead of {2}"
+            .format(self.index, command.hex(), record.command.hex()))
+      self.index += 1
+      return record.response
+
+   def xfer(self, command):
+      return list(self.Next(SpiTraceRecord.KIND_TRANSFER, command))
+
+   xfer2 = xfer
+   xfer3 = xfer
+
+   def writebytes(self, command):
+      self.Next(SpiTraceRecord.KIND_WRITE, command)
+
+   writebytes2 = writebytes
+
+   def readbytes(self, length):
+      return list(self.Next(SpiTraceRecord.KIND_READ, b""))
+
+   def Marker(self, label):
+      pass
+
+   def close(self):
+      pass
+
+
+# MCP25625_hal recording its SPI traffic to a trace file
+class MCP25625_hal_recorder(MCP25625_hal):
+
+   # Batches are recorded one command at a time (no single transfer)
+   capabilities = (MCP25625_hal.capabilities & ~MCP25625_hal.CAP_BATCH) | \
+                  MCP25625_hal.CAP_TRACE
+
+   def __init__(self, traceFile, verbosePrint = False, bus = 0, device = 0,
+                spiClockHz = None):
+      MCP25625_hal.__init__(self, verbosePrint, bus, device, 
+                            spiClockHz = spiClockHz)
+      self.s = SpiRecorder(self.s, SpiTraceWriter(traceFile))
+
+   # Adds a marker (e.g. "Send") to the trace, delimiting the transfers
+   # of an operation
+   def Marker(self, label):
+      self.s.Marker(label)
+
+
+# MCP25625_hal replaying a trace file instead of accessing the device
+class MCP25625_hal_replay(MCP25625_hal):
+
+   # Not on a SPI bus, and batches are replayed one command at a time
+   capabilities = MCP25625_hal.CAP_TRACE | MCP25625_hal.CAP_VERIFY
+
+   def __init__(self, traceFile, verbosePrint = False):
+      MCP25625_hal.__init__(self, verbosePrint,
+                            spi = SpiReplay(SpiTraceReader(traceFile)))
+
+   def Marker(self, label):
+      pass
+
+   # Raises a SpiTraceException if recorded transfers were not replayed
+   def CheckComplete(self):
+      if self.s.Remaining():
+         raise SpiTraceException("{0} recorded transfers not replayed"
+                                 .format(self.s.Remaining()))
@@ -6,7 +6,7 @@ import time
 
 import argparse
 import metalcore as mc
-from MCP25625_hal import MCP25625_hal
+from MCP25625_hal_base import CreateHal, HalBackends
 from MCP25625_hal_mock import MCP25625_hal_mock
 from MCP25625_registers import *
 from MCP25625_api import MCP25625_api
@@ -154,7 +154,7 @@ class MCP25625_cli(object):
                 self.reg.CANINTF.Print()
 
                 with self.reg.RXB0DATA as rxb0data:
-                    data = list(rxb0data.DATA_bytes)[:dataLen]
+                    data = rxb0data.DATA_bytes[:dataLen]
                     print("data = ", [hex(x) for x in data])
 
             input("end of loop. Press Enter to continue...")
@@ -251,9 +251,11 @@ if __name__ == "__main__":
         help='Reset state')
     parser.add_argument('-v', '--verbose', action='store_true', 
         help='Verbose output')
+    parser.add_argument('-b', '--backend', choices=HalBackends(), 
+        help='HAL backend (default: MCP25625_HAL environment variable, or spidev)')
     args = parser.parse_args()
 
-    hal_hw = MCP25625_hal()
+    hal_hw = CreateHal(args.backend)
     reg = MCP25625_RegisterGroup()
 
     print("--- start test ---")
@@ -62,4 +62,20 @@ CAN_ID_commands = 0x120801F1
 # the CAN ID for COM2 picture data
 CAN_ID_pictures = 2
 
-CAN_ID_output_telemetry = 0x122801F0
\ No newline at end of file
+CAN_ID_output_telemetry = 0x122801F0
+
+# Keep the CAN controller configuration and received frames when COM2
+# restarts instead of resetting the controller (see MCP25625_api.Initialize).
+# Off by default: deployments opt in.
+CAN_warm_start = False
+
+# HAL backend of the CAN controller (see MCP25625_hal_base.CreateHal);
+# None selects the MCP25625_HAL environment variable, else spidev
+CAN_hal_backend = None
+
+# Write verification of the CAN controller HAL: "never", "sampled" (every
+# CAN_verify_every-th write is read back and mismatches are counted) or
+# "always" (every write is read back, a mismatch raises IOError); see
+# MCP25625_hal.SetVerifyPolicy
+CAN_verify_policy = "sampled"
+CAN_verify_every = 100
@@ -4,10 +4,6 @@
 
 # TODO:
 # - [register]
-#    - define context at register group level (and instantiate with 
-#      a HAL/device)
-#       - this will allow support for multiple devices
-#       - will also allow simpler usage - tx spans across registers
 #    - multi-byte registers
 # - [HAL]
 #     - separate lower-level device functions from higher level ones 
@@ -15,7 +11,11 @@
 
 
 from enum import Enum
+import copy
 import inspect
+import json
+import sys
+import time
 
 
 #
@@ -62,12 +62,16 @@ class Field(object):
    # as in 7.......0
    # 
    # Bit offset and length are not limited in size
+   # A volatile field is also changed by the device (e.g. interrupt flags, 
+   # transmit requests completing), so it cannot be verified by reading 
+   # it back after a write.
    def __init__(
          self, 
          bitOffsetMSB, 
          bitsLength, 
          access = Access.RW, 
-         initialValue = 0
+         initialValue = 0,
+         volatile = False
          ):
       ArgumentException.ThrowIf(bitOffsetMSB < 0, 
          "MSB offset cannot be negative")
@@ -80,6 +84,7 @@ class Field(object):
       self.bitsLength = bitsLength
       self.access = access
       self.initialValue = initialValue
+      self.volatile = volatile
       self.valueMask = Field.Mask(bitOffsetMSB, bitsLength)
       self.rightPaddingBits = Field.RightPaddingBits(bitOffsetMSB, 
                                                      bitsLength
@@ -96,185 +101,364 @@ class Field(object):
 #  Modifiable state
 #
 
-# internal class to implement a field state
-class FieldInstance(object):
-   def __init__(self, tx, fieldName, field):
-      self.field = field
+# internal descriptor exposing a field of a transaction as a property
+# Created once per Register class by RegisterLayout and shared by all 
+# transactions opened on registers of that class. The field state 
+# itself lives in the transaction (vals array and modifiedFields mask) 
+# at the field index.
+class FieldProperty(object):
+   __slots__ = ("index", "fieldName", "field", "asBytes", "readable", 
+                "writeable", "modifiedBit", "shift", "valueMask", 
+                "byteAligned", "firstByteFromEnd", "lastByteFromEnd")
+
+   def __init__(self, index, fieldName, field, asBytes = False):
+      self.index = index
       self.fieldName = fieldName
-      self.tx = tx
-      self.val = 0
-      self.modified = False
+      self.field = field
+      self.asBytes = asBytes
+      self.readable = field.IsReadable()
+      self.writeable = field.IsWriteable()
+      self.modifiedBit = 1 << index
+      self.shift = field.rightPaddingBits
+      self.valueMask = field.valueMask
+      # Byte-aligned fields are read as a view of the register bytes, 
+      # located from the end of the register (its length depends on the 
+      # register instance)
+      self.byteAligned = ((field.rightPaddingBits & 7) == 0) and \
+                         ((field.bitsLength & 7) == 0)
+      self.firstByteFromEnd = (field.bitOffsetMSB >> 3) + 1
+      self.lastByteFromEnd = field.rightPaddingBits >> 3
 
-   # Internal method. Called to initialize the instance from a register
-   def LoadFromRegister(self):
-      self.val = (self.tx.val & self.field.registerMask) >> \
-                  self.field.rightPaddingBits
-      assert (self.val & ~ self.field.valueMask) == 0
-
-   # Internal method. Called to save the current value into a register
-   def SaveToRegister(self):
-      assert (self.val & ~ self.field.valueMask) == 0
-      if (self.modified):
-         modifiedTxVal = self.tx.val
-         modifiedTxVal &= ~ self.field.registerMask
-         shiftedVal = self.val << self.field.rightPaddingBits
-         assert  (shiftedVal & ~self.field.registerMask) == 0
-         modifiedTxVal |= shiftedVal
-         # print("Applying {0}: Tx:{1:08b} -> Tx:{2:08b}".format( 
-         #     self.fieldName, self.tx.val, modifiedTxVal))
-         self.tx.val = modifiedTxVal
-
-   # Internal method. Getter that returns the current value 
-   # in the asscociated property.
-   def Read(self, tx):
-      # print("Read reached: ", tx, tx.register, ", ", self.fieldName, 
-      #        "val == ", self.val)
-      assert (self.val & ~ self.field.valueMask) == 0
-      return self.val
-
-   # Internal method. Getter that returns the current value 
-   # in the asscociated property.
+   def __get__(self, tx, owner):
+      if tx is None:
+         return self
+      if not self.readable:
+         raise AttributeError("field {0} is not readable"
+                              .format(self.fieldName))
+      if self.asBytes and self.byteAligned and \
+            not (tx.modifiedFields & self.modifiedBit):
+         if not tx.loaded:
+            tx.Load()
+         if tx.raw is not None:
+            return self.Read_view(tx)
+      # The register is read and decoded on the first access to a field 
+      # that was not written in this transaction
+      if not (tx.decoded or (tx.modifiedFields & self.modifiedBit)):
+         tx.Decode()
+      if self.asBytes:
+         return self.Read_bytes(tx)
+      return tx.vals[self.index]
+
+   def __set__(self, tx, val):
+      # TODO - add implementation for write bytes? 
+      if self.asBytes or not self.writeable:
+         raise AttributeError("field {0} is not writeable"
+                              .format(self.fieldName))
+      self.Write(tx, val)
+
+   # Internal method. Returns the field as a memoryview of the register 
+   # bytes read, without copying them
+   def Read_view(self, tx):
+      raw = tx.raw
+      return memoryview(raw)[len(raw) - self.firstByteFromEnd:
+                             len(raw) - self.lastByteFromEnd]
+
+   # Internal method. Returns the current value as bytes
    def Read_bytes(self, tx):
-      # print("Read reached: ", tx, tx.register, ", ", self.fieldName, 
-      #        "val == ", self.val)
-      assert (self.val & ~ self.field.valueMask) == 0
-      bytesLen = ((self.field.bitsLength + 7) & 0xfffa) >> 3
-      print(bytesLen)
-      bytesData = self.val.to_bytes(bytesLen, byteorder='big')
+      bytesLen = (self.field.bitsLength + 7) >> 3
+      bytesData = tx.vals[self.index].to_bytes(bytesLen, byteorder='big')
       return bytesData
 
-   # Internal method. Setter that sets the current value to something 
-   # supplied by the property
+   # Internal method. Sets the current value, marking the field and 
+   # the transaction as modified
+   # Before the register is read the write is blind and always counts 
+   # as a modification. Afterwards the value is compared with the 
+   # register contents (which need not be decoded).
    def Write(self, tx, val):
-      assert (self.field.access == Access.RW) \
-             or (self.field.access == Access.W)
-      # print("Write reached: ", tx, tx.register, ", ", self.fieldName, 
-      #        "=", val)
-
       # This error is thrown when attempting to set a larger value that 
       # a bitfield can hold 
-
-      # print("Applying {0}: Tx:{1:b} # Tx:{2:b}".format(self.fieldName, 
-      #        val, self.field.valueMask))
-      ArgumentException.ThrowIf((val & ~ self.field.valueMask) != 0, 
+      ArgumentException.ThrowIf((val < 0) or (val > self.valueMask),
          "Value needs to fit into the field")
-      if (self.val != val):
-         # print("Modifying {0}: {1} -> {2}".format(self.fieldName,    \
-         #      self.val, val)                                        
-         self.val = val
-         self.modified = True
-         self.tx.modified = True
+      if (tx.modifiedFields & self.modifiedBit) or (not tx.loaded) or \
+            (((tx.registerVal >> self.shift) & self.valueMask) != val):
+         tx.vals[self.index] = val
+         tx.modifiedFields |= self.modifiedBit
+         tx.modified = True
 
 
-# internal class to represent registry state
-class RegisterTransaction(object):
-   def __init__(self, register):
-      self.val = 0
-      self.register = register
+# internal class holding the field layout of a Register class
+# Built once when the Register class is defined. The overlap checks 
+# and the field properties are done here so that opening a transaction 
+# only costs the register read.
+#
+# The layout also generates two functions specialised for the fields 
+# of the class, where each field is a constant shift and mask:
+#    unpack(registerVal, vals) decodes every field into vals
+#    pack(registerVal, vals, fieldsMask) returns registerVal with the 
+#       fields selected by fieldsMask (bit = field index) set from vals
+class RegisterLayout(object):
+   def __init__(self, registerClass):
+      self.registerClass = registerClass
       self.fields = []
-      self.hal = register.hal
-      self.modified = False
-      # print("Register type = ", type(self.register))
-      for n,v in inspect.getmembers(type(self.register)):
+      for n,v in inspect.getmembers(registerClass):
          if isinstance(v, Field):
-            # print("Adding field ", n, v)
-            fieldTx = FieldInstance(self, n, v)
-
             # Check for non-overlaping bitmasks with other fields in 
             # the same register
             # If there is an error thrown here then some fields have 
             # overlapping bit-field declarations within the register
-            for otherField in self.fields:
-               overlap = (otherField.field.registerMask \
-                           & fieldTx.field.registerMask)
+            for otherName, otherField in self.fields:
+               overlap = (otherField.registerMask & v.registerMask)
                ArgumentException.ThrowIf(
                   overlap,
-                  "Fields {0}.{1} with mask {2:08b} and {0}.{3} " + 
-                  "with mask {4:08b} have overlapping masks"
+                  ("Fields {0}.{1} with mask {2:08b} and {0}.{3} " + 
+                  "with mask {4:08b} have overlapping masks")
                   .format( 
-                     str(type(self.register)), otherField.fieldName, 
-                     otherField.field.registerMask, fieldTx.fieldName, 
-                     fieldTx.field.registerMask)
+                     registerClass.__name__, otherName, 
+                     otherField.registerMask, n, v.registerMask)
                   )
+            self.fields += [(n, v)]
+
+      # Each Register class gets its own transaction class so that 
+      # fields with the same name in different registers do not clash
+      self.properties = []
+      self.writeableFields = 0
+      self.volatileFields = 0
+      self.initialVal = 0
+      classDict = {"__slots__": ()}
+      for index, (n, v) in enumerate(self.fields):
+         fieldProperty = FieldProperty(index, n, v)
+         self.properties += [fieldProperty]
+         if fieldProperty.writeable:
+            self.writeableFields |= fieldProperty.modifiedBit
+            self.initialVal |= v.initialValue << v.rightPaddingBits
+         if v.volatile:
+            self.volatileFields |= fieldProperty.modifiedBit
+         classDict[n] = fieldProperty
+         classDict[n + "_bytes"] = FieldProperty(index, n, v, True)
+      self.transactionClass = type(
+         registerClass.__name__ + "Transaction", 
+         (RegisterTransaction,), 
+         classDict)
+
+      # Value mask of each field, used with pack() to compute the 
+      # register mask of a set of fields
+      self.valueMasks = [v.valueMask for n, v in self.fields]
+      self.unpack, self.unpackBytes, self.pack = self.CompileCodecs()
+      # Bits of the register set by the writeable fields
+      self.writeableMask = self.pack(0, self.valueMasks, self.writeableFields)
+      # Writeable bits that read back as written (not volatile)
+      self.verifyMask = self.pack(0, self.valueMasks, 
+         self.writeableFields & ~self.volatileFields)
+
+   # Returns the index of a field in the vals of unpack() and unpackBytes()
+   def FieldIndex(self, fieldName):
+      return self.transactionClass.__dict__[fieldName].index
+
+   # Internal method. Generates the unpack(), unpackBytes() and pack() 
+   # functions. unpackBytes(readBytes, vals) decodes the register bytes 
+   # (big endian) in the same call, for decoding frames read in bulk.
+   def CompileCodecs(self):
+      unpackLines = []
+      packLines = ["def pack(registerVal, vals, fieldsMask):"]
+      for fieldProperty in self.properties:
+         field = fieldProperty.field
+         shifted = "registerVal"
+         value = "vals[{0}]".format(fieldProperty.index)
+         if field.rightPaddingBits:
+            shifted = "(registerVal >> {0})".format(field.rightPaddingBits)
+            value = "({0} << {1})".format(value, field.rightPaddingBits)
+         unpackLines += ["   vals[{0}] = {1} & {2:#x}".format(
+            fieldProperty.index, shifted, field.valueMask)]
+         packLines += [
+            "   if fieldsMask & {0:#x}:".format(fieldProperty.modifiedBit),
+            "      registerVal = (registerVal & ~{0:#x}) | {1}".format(
+               field.registerMask, value)]
+      unpackLines += ["   return vals"]
+      packLines += ["   return registerVal"]
+
+      codecs = {}
+      source = "\n".join(
+         ["def unpack(registerVal, vals):"] + unpackLines + 
+         ["def unpackBytes(readBytes, vals, from_bytes = int.from_bytes):",
+          "   registerVal = from_bytes(readBytes, 'big')"] + unpackLines + 
+         packLines) + "\n"
+      exec(compile(source, 
+                   "<{0} codecs>".format(self.registerClass.__name__), 
+                   "exec"), 
+           codecs)
+      return codecs["unpack"], codecs["unpackBytes"], codecs["pack"]
+
+
+# internal class to represent registry state
+# Transactions are pooled by their Register and reopened for each 
+# "with" block, so their field state is kept in preallocated slots 
+# instead of per-field objects.
+#
+# The register is only read when a field that was not written is 
+# accessed (or when "val" is used), and its fields are only decoded 
+# on the first field access. When closing, single-byte 
+# registers supporting the BIT MODIFY instruction only update the 
+# written fields; other registers are read first unless every writable 
+# field was written.
+#
+# Write-only transactions (see Register.write) start from a known value 
+# instead of reading the register, and write all the writable fields.
+class RegisterTransaction(object):
+   __slots__ = ("register", "hal", "registerVal", "raw", "vals", "loaded", 
+                "decoded", "modified", "modifiedFields", "writeOnly", 
+                "outer", "timeStart")
+
+   def __init__(self, register):
+      self.register = register
+      self.hal = register.hal
+      self.registerVal = 0
+      # Register bytes read (see RawBuffer), None if not read
+      self.raw = None
+      self.vals = [0] * len(register.layout.properties)
+      self.loaded = False
+      self.decoded = False
+      self.modified = False
+      self.modifiedFields = 0
+      self.writeOnly = False
+      self.outer = None
+      self.timeStart = 0
 
-            # set "int" field property
-            readRoutine = None
-            writeRoutine = None
-            if (fieldTx.field.IsReadable()):
-               readRoutine = fieldTx.Read
-            if (fieldTx.field.IsWriteable()):
-               writeRoutine = fieldTx.Write
-            setattr(type(self), n, property(readRoutine, writeRoutine))
-
-            # set "bytes" field property
-            readRoutine_bytes = None
-            writeRoutine_bytes = None
-            if (fieldTx.field.IsReadable()):
-               readRoutine_bytes = fieldTx.Read_bytes
-            # TODO - add implementation for write bytes? 
-            setattr(type(self), n + "_bytes", 
-               property(readRoutine_bytes, writeRoutine_bytes))
-
-            self.fields += [fieldTx]
+   # Register value (as read at the beginning of the transaction)
+   @property
+   def val(self):
+      if not self.loaded:
+         self.Load()
+      return self.registerVal
+
+   # Internal method. (Re)initializes the transaction for the register
+   # If given, readBytes holds the register contents already read by 
+   # the caller (e.g. as part of a burst read). If given, writeOnlyVal 
+   # is the starting value of a write-only transaction.
+   def Open(self, readBytes = None, writeOnlyVal = None):
+      self.hal = self.register.hal
+      self.loaded = False
+      self.decoded = False
+      self.modified = False
+      self.modifiedFields = 0
+      self.raw = None
+      self.writeOnly = (writeOnlyVal is not None)
+      if self.writeOnly:
+         self.registerVal = writeOnlyVal
+         self.loaded = True
+      elif readBytes is not None:
+         self.raw = RegisterTransaction.RawBuffer(readBytes)
+         self.registerVal = int.from_bytes(self.raw, 'big')
+         self.loaded = True
+
+   # Internal method. Returns the bytes read from a HAL as a buffer 
+   # owned by the caller, referencing them when possible instead of 
+   # copying them. HALs return a new buffer for each read (never a 
+   # buffer reused for the next transfer): transactions, and the 
+   # memoryviews of byte-aligned fields they return (e.g. DATA_bytes), 
+   # keep a reference to it.
+   @staticmethod
+   def RawBuffer(readBytes):
+      if isinstance(readBytes, (bytes, bytearray)):
+         return readBytes
+      if isinstance(readBytes, memoryview) and readBytes.contiguous:
+         return readBytes
+      return bytearray(readBytes)
+
+   # Internal method. Reads the register from the device
+   def Load(self):
       self.InitializeHw()
-      for field in self.fields:
-         field.LoadFromRegister()
+      self.loaded = True
+
+   # Internal method. Decodes the fields not written yet from the 
+   # register value (reading the register first if needed)
+   def Decode(self):
+      if not self.loaded:
+         self.Load()
+      layout = self.register.layout
+      if self.modifiedFields:
+         # Fold the written fields in so that they are decoded unchanged
+         layout.unpack(layout.pack(self.registerVal, self.vals, 
+                                   self.modifiedFields), 
+                       self.vals)
+      else:
+         layout.unpack(self.registerVal, self.vals)
+      self.decoded = True
 
    # Fills each writable field with zero
    def Zero(self):
-      for field in self.fields:
-         if field.field.IsWriteable():
-            field.Write(self, 0)
+      for fieldProperty in self.register.layout.properties:
+         if fieldProperty.writeable:
+            fieldProperty.Write(self, 0)
       
    def InitializeHw(self):
       MetalCoreException.ThrowIf(self.register.address == None,
          "need to define address field in registry declaration for %s" 
          % type(self.register))
       # Read the register contents at the given address
-      # readBytes = self.hal.ReadBytes(self.register.address, 
-      #                                self.register.lengthBytes
-      #                                )
-      readBytes = self.register.readValue()
-
-      # print(readBytes)
-      self.val = int.from_bytes(readBytes, 'big')
+      self.raw = RegisterTransaction.RawBuffer(self.register.readValue())
+      self.registerVal = int.from_bytes(self.raw, 'big')
       # print("## Read value 0b{0:b} (0x{0:x}) at address 0x{1:x}"
-      #        .format(self.val, self.register.address))
+      #        .format(self.registerVal, self.register.address))
       
+   # Internal method. Applies the modified fields to the register value
+   # Returns the bytes to be written back, or None if nothing changed
+   def Commit(self):
+      if (not self.modified) and (not self.writeOnly):
+         return None
+      if (not self.loaded):
+         writeableFields = self.register.layout.writeableFields
+         if (self.modifiedFields & writeableFields) == writeableFields:
+            # All writable fields are overwritten, no need to read 
+            # the register. Read-only and unimplemented bits are 
+            # ignored by the device.
+            self.registerVal = 0
+         else:
+            self.Load()
+      self.registerVal = self.register.layout.pack(
+                           self.registerVal, self.vals, self.modifiedFields)
+      # print("## Writing value 0b{0:b} (0x{0:x}) at address 0x{1:x}"
+      #      .format(self.registerVal, self.register.address))
+      return self.registerVal.to_bytes(self.register.lengthBytes, 'big')
+
    def Close(self):
-      if (self.modified):
-         # print("start Close()")
-         oldVal = self.val
-         for field in self.fields:
-            field.SaveToRegister()
-         # print("## Writing value 0b{0:b} (0x{0:x}) -> " 
-         #      + "0b{1:b} (0x{1:x}) at address 0x{2:x}"
-         #      .format(oldVal, self.val, self.register.address))
-         # print("#Value info: ", type(self.val), "{0:x}".format(self.val), 
-         #      type(self.register.lengthBytes), self.register.lengthBytes)
-         newBytes = self.val.to_bytes(self.register.lengthBytes, 'big')
-         self.hal.WriteBytes(self.register.address, newBytes)
-         # print("end Close()")
+      if (not self.modified) and (not self.writeOnly):
+         return
+      register = self.register
+      if register.bitModifiable and (register.lengthBytes == 1):
+         # Only touch the bits of the modified fields (all the writable 
+         # fields for a write-only transaction)
+         layout = register.layout
+         modifiedFields = self.modifiedFields
+         if self.writeOnly:
+            modifiedFields = layout.writeableFields
+         maskByte = layout.pack(0, layout.valueMasks, modifiedFields)
+         dataByte = layout.pack(self.registerVal, self.vals, 
+                                self.modifiedFields) & maskByte
+         register.bitModify(maskByte, dataByte)
+      else:
+         register.writeValue(self.Commit())
 
    def Print(self):
+      if not self.decoded:
+         self.Decode()
       print("- Printing {0} = 0b{1:b} (0x{1:x})".format(
          self.register.instanceNameInGroup,
          self.val))
       strList = []
-      for fieldInstance in self.fields:
-         if fieldInstance.field.IsReadable():
-            fieldVal = fieldInstance.Read(self)
+      for fieldProperty in self.register.layout.properties:
+         if fieldProperty.readable:
+            fieldVal = self.vals[fieldProperty.index]
             if (self.register.lengthBytes == 1):
                offsetMsbFformatStr = "{0}"
             else:
                offsetMsbFformatStr = "{0:02}"
             offsetMSB = offsetMsbFformatStr.format(
-                           fieldInstance.field.bitOffsetMSB)
+                           fieldProperty.field.bitOffsetMSB)
             formatStr = "  - [msb:%s] %s.%s = {0:0%db} (0x{0:x})" % (
                            offsetMSB,
                            self.register.instanceNameInGroup,
-                           fieldInstance.fieldName,
-                           fieldInstance.field.bitsLength)
+                           fieldProperty.fieldName,
+                           fieldProperty.field.bitsLength)
             strList += [formatStr.format(fieldVal)]
       strList.sort(reverse=True)
       for s in strList:
@@ -282,6 +466,74 @@ class RegisterTransaction(object):
 
 
 
+# Access statistics of a register, enabled through 
+# RegisterGroup.EnableStats()
+# Counts the SPI reads and writes issued for the register (bytes count 
+# the register contents, not the SPI command overhead), the number of 
+# transactions with their total wall time, and the call sites (file, 
+# line and function outside of this module) that opened them.
+# Reads served by the shadow cache are not counted.
+class RegisterStats(object):
+   __slots__ = ("reads", "bytesRead", "writes", "bitModifies", 
+                "bytesWritten", "transactions", "transactionSeconds", 
+                "callSites")
+
+   def __init__(self):
+      self.Reset()
+
+   def Reset(self):
+      self.reads = 0
+      self.bytesRead = 0
+      self.writes = 0
+      self.bitModifies = 0
+      self.bytesWritten = 0
+      self.transactions = 0
+      self.transactionSeconds = 0.0
+      self.callSites = {}
+
+   def Read(self, lengthBytes):
+      self.reads += 1
+      self.bytesRead += lengthBytes
+
+   def Wrote(self, lengthBytes):
+      self.writes += 1
+      self.bytesWritten += lengthBytes
+
+   def BitModified(self):
+      self.bitModifies += 1
+      self.bytesWritten += 1
+
+   # Internal method. Records the start of a transaction and its call 
+   # site
+   def Opened(self, tx):
+      frame = sys._getframe(1)
+      while (frame is not None) and (frame.f_code.co_filename == __file__):
+         frame = frame.f_back
+      if frame is not None:
+         callSite = "{0}:{1} ({2})".format(frame.f_code.co_filename, 
+                                           frame.f_lineno, 
+                                           frame.f_code.co_name)
+         self.callSites[callSite] = self.callSites.get(callSite, 0) + 1
+      tx.timeStart = time.perf_counter()
+
+   # Internal method. Records the end of a transaction
+   def Closed(self, tx):
+      self.transactions += 1
+      self.transactionSeconds += time.perf_counter() - tx.timeStart
+
+   def ToDict(self):
+      return {
+         "reads": self.reads,
+         "bytesRead": self.bytesRead,
+         "writes": self.writes,
+         "bitModifies": self.bitModifies,
+         "bytesWritten": self.bytesWritten,
+         "transactions": self.transactions,
+         "transactionSeconds": self.transactionSeconds,
+         "callSites": dict(self.callSites)
+      }
+
+
 # Base class representing a single register type
 # Needs to be derived by indicating static fields as inner fields 
 # Implements an auto transaction class that can be used with "with" 
@@ -289,37 +541,165 @@ class RegisterTransaction(object):
 # Allows multiple instances to be bound to different addresses
 class Register(object):
 
+   # Field layout shared by all instances of a Register class
+   layout = None
+
+   # Generated decoder of the register bytes (see 
+   # RegisterLayout.CompileCodecs), bound to each Register class so that 
+   # callers decoding in bulk skip the layout lookup
+   unpackBytes = None
+
+   def __init_subclass__(cls, **kwargs):
+      super().__init_subclass__(**kwargs)
+      cls.layout = RegisterLayout(cls)
+      cls.unpackBytes = staticmethod(cls.layout.unpackBytes)
+
    def __init__(self):
       self.tx = None
+      self.txPool = []
       self.address = None
       self.lengthBytes = 1
       self.hal = None
+      self.group = None
       self.instanceNameInGroup = None
+      self.cacheable = False
+      self.bitModifiable = False
+      # Bits checked by HALs verifying writes (see BindToAddress)
+      self.verifyMask = None
+      # Access statistics (see RegisterGroup.EnableStats), None when 
+      # disabled
+      self.stats = None
 
-   def BindToAddress(self, byteAddress, byteLength = 1):
+   # Binds the register to an address
+   # A cacheable register only changes when written by us, so its 
+   # value can be served from the shadow cache of the register group. 
+   # Registers updated by the device (status, flags, buffers) must be 
+   # left volatile (the default).
+   # A bitModifiable register supports partial updates through the 
+   # HAL BitModify() routine.
+   # Writes are given to the HAL with the mask of the bits it can verify 
+   # by reading them back: the writeable fields, except the volatile 
+   # fields the device may change at once (e.g. a transmit request 
+   # completing, see Field).
+   def BindToAddress(self, byteAddress, byteLength = 1, cacheable = False,
+                     bitModifiable = False):
       self.address = byteAddress
       self.lengthBytes = byteLength
+      self.cacheable = cacheable
+      self.bitModifiable = bitModifiable
+      self.verifyMask = self.layout.verifyMask.to_bytes(byteLength, 'big')
       return self
 
-   def BindToHal(self, hal, instanceNameInGroup):
+   # Returns an unbound copy of the register (same class and address) 
+   # with its own transaction pool
+   def Clone(self):
+      register = copy.copy(self)
+      register.tx = None
+      register.txPool = []
+      register.hal = None
+      register.group = None
+      register.stats = None
+      return register
+
+   def BindToHal(self, hal, instanceNameInGroup, group = None):
       self.hal = hal
       self.instanceNameInGroup = instanceNameInGroup
+      self.group = group
 
    # Instantiate a transaction that can be used to manipulate the 
    # contents of the register
+   # Transactions are taken from (and returned to) a per-register pool, 
+   # so nested "with" blocks on the same register still get their own
    def __enter__(self):
-      self.tx = RegisterTransaction(self)
-      return self.tx
+      tx = self.AcquireTransaction()
+      if self.stats is not None:
+         self.stats.Opened(tx)
+      return tx
 
    def __exit__(self, type, value, traceback):
-      self.tx.Close()
-      self.tx = None
+      tx = self.tx
+      try:
+         tx.Close()
+      finally:
+         self.ReleaseTransaction()
+         if self.stats is not None:
+            self.stats.Closed(tx)
+
+   # Returns the bytes of the register with the given field values 
+   # (a dictionary of field name to value), other fields keeping their 
+   # initialValue. The device is not accessed.
+   def encodeValue(self, fieldValues):
+      tx = self.AcquireTransaction(writeOnlyVal = self.layout.initialVal)
+      try:
+         for n, v in fieldValues.items():
+            setattr(tx, n, v)
+         return tx.Commit()
+      finally:
+         self.ReleaseTransaction()
+
+   # Returns a write-only transaction, used as:
+   #    with reg.write() as tx:
+   # The register is not read: fields start from their initialValue 
+   # (or from zero) and the whole register is written when closing.
+   def write(self, zero = False):
+      if zero:
+         return RegisterWriter(self, 0)
+      return RegisterWriter(self, self.layout.initialVal)
+
+   # Internal method. Takes a transaction from the pool and opens it
+   def AcquireTransaction(self, readBytes = None, writeOnlyVal = None):
+      if self.txPool:
+         tx = self.txPool.pop()
+      else:
+         tx = self.layout.transactionClass(self)
+      tx.Open(readBytes, writeOnlyVal)
+      tx.outer = self.tx
+      self.tx = tx
+      return tx
+
+   # Internal method. Returns the innermost open transaction to the pool
+   def ReleaseTransaction(self):
+      tx = self.tx
+      self.tx = tx.outer
+      tx.outer = None
+      self.txPool.append(tx)
 
    # utility to read the value
-   # TODO add utility to also write the value
    def readValue(self):
+      if self.cacheable and (self.group is not None) \
+            and self.group.cacheEnabled:
+         return self.group.ReadCached(self)
+      if self.stats is not None:
+         self.stats.Read(self.lengthBytes)
       return self.hal.ReadBytes(self.address, self.lengthBytes)
 
+   # utility to write the value
+   def writeValue(self, newBytes):
+      if self.stats is not None:
+         self.stats.Wrote(len(newBytes))
+      self.hal.WriteBytes(self.address, newBytes, self.verifyMask)
+      self.updateShadow(newBytes)
+
+   # utility to update the bits selected by maskByte
+   def bitModify(self, maskByte, dataByte):
+      if self.stats is not None:
+         self.stats.BitModified()
+      self.hal.BitModify(self.address, maskByte, dataByte, 
+                         self.verifyMask[0])
+      if self.cacheable and (self.group is not None) \
+            and self.group.cacheEnabled:
+         cachedBytes = self.group.shadow.get(self)
+         if cachedBytes is not None:
+            self.group.shadow[self] = bytes([
+               (cachedBytes[0] & ~maskByte) | (dataByte & maskByte)])
+
+   # Internal method. Records a value written to the device by other 
+   # means than writeValue (e.g. a burst write)
+   def updateShadow(self, newBytes):
+      if self.cacheable and (self.group is not None) \
+            and self.group.cacheEnabled:
+         self.group.shadow[self] = bytes(newBytes)
+
    def toString(self):
       val = self.readValue()
       return self.instanceNameInGroup + ": " + \
@@ -330,10 +710,189 @@ class Register(object):
          tx.Print()
 
    def Zero(self):
-      with self as tx:
-         tx.Zero()
+      with self.write(zero = True):
+         pass
 
 
+# Context manager returned by Register.write()
+class RegisterWriter(object):
+   __slots__ = ("register", "writeOnlyVal")
+
+   def __init__(self, register, writeOnlyVal):
+      self.register = register
+      self.writeOnlyVal = writeOnlyVal
+
+   def __enter__(self):
+      tx = self.register.AcquireTransaction(writeOnlyVal = self.writeOnlyVal)
+      if self.register.stats is not None:
+         self.register.stats.Opened(tx)
+      return tx
+
+   def __exit__(self, type, value, traceback):
+      self.register.__exit__(type, value, traceback)
+
+
+# Transaction spanning several registers of the same device
+# Opened through RegisterGroup.Transaction(). On enter, all registers 
+# are read with a single burst READ covering their address span, unless 
+# the bytes of the span were already read by the caller (readBytes, e.g. 
+# with a device-specific instruction reading a receive buffer). On 
+# exit, the modified registers are written back with one burst WRITE 
+# per contiguous run of dirty bytes (a single one when the registers 
+# are adjacent).
+#
+# Note: a burst write stores bytes in increasing address order. Writes 
+# that must happen after others (e.g. TXREQ after loading a TX buffer) 
+# belong in a separate transaction.
+class MultiRegisterTransaction(object):
+
+   def __init__(self, registers, readBytes = None):
+      MetalCoreException.ThrowIf(len(registers) == 0,
+         "a multi-register transaction needs at least one register")
+      self.registers = registers
+      self.readBytes = readBytes
+      self.hal = registers[0].hal
+      self.startAddress = min(r.address for r in registers)
+      self.endAddress = max(r.address + r.lengthBytes for r in registers)
+
+      # Check that registers are bound to the same device and that they 
+      # do not overlap (the messages are only formatted on failure, as 
+      # transactions are opened on every Send/Recv)
+      for r in registers:
+         if r.address == None:
+            raise MetalCoreException(
+               "need to define address field in registry declaration for %s" 
+               % type(r))
+         if r.hal is not self.hal:
+            raise MetalCoreException(
+               "registers of a transaction must be bound to the same HAL")
+      endAddress = None
+      for r in sorted(registers, key = lambda r: r.address):
+         if (endAddress is not None) and (r.address < endAddress):
+            raise ValueError(
+               "register {0} overlaps another register of the transaction"
+               .format(r.instanceNameInGroup))
+         endAddress = r.address + r.lengthBytes
+      if readBytes is not None:
+         ArgumentException.ThrowIf(
+            len(readBytes) != self.endAddress - self.startAddress,
+            "{0} bytes given for a span of {1} bytes".format(
+               len(readBytes), self.endAddress - self.startAddress))
+      self.txs = None
+
+   def __enter__(self):
+      readBytes = self.readBytes
+      if readBytes is None:
+         readBytes = self.hal.ReadBytes(self.startAddress, 
+                                        self.endAddress - self.startAddress)
+      # The transactions are opened on views of the read bytes, which 
+      # are written back in place
+      self.image = memoryview(RegisterTransaction.RawBuffer(readBytes))
+      if self.image.readonly:
+         self.image = memoryview(bytearray(self.image))
+      txs = []
+      for r in self.registers:
+         offset = r.address - self.startAddress
+         tx = r.AcquireTransaction(self.image[offset:offset + r.lengthBytes])
+         if r.stats is not None:
+            r.stats.Read(r.lengthBytes)
+            r.stats.Opened(tx)
+         txs += [tx]
+      self.txs = tuple(txs)
+      return self.txs
+
+   def __exit__(self, type, value, traceback):
+      try:
+         # Fold the modified registers into the image and collect the 
+         # dirty byte ranges
+         dirty = []
+         for r, tx in zip(self.registers, self.txs):
+            newBytes = tx.Commit()
+            if newBytes is not None:
+               offset = r.address - self.startAddress
+               self.image[offset:offset + r.lengthBytes] = newBytes
+               dirty += [(offset, offset + r.lengthBytes)]
+               r.updateShadow(newBytes)
+               if r.stats is not None:
+                  r.stats.Wrote(r.lengthBytes)
+
+         # Merge adjacent ranges and write each run in a single burst
+         dirty.sort()
+         runs = []
+         for start, end in dirty:
+            if runs and runs[-1][1] == start:
+               runs[-1][1] = end
+            else:
+               runs += [[start, end]]
+         verifyMask = None
+         for start, end in runs:
+            if verifyMask is None:
+               verifyMask = bytearray(len(self.image))
+               for r in self.registers:
+                  offset = r.address - self.startAddress
+                  verifyMask[offset:offset + r.lengthBytes] = r.verifyMask
+            self.hal.WriteBytes(self.startAddress + start, 
+                                bytes(self.image[start:end]), 
+                                bytes(verifyMask[start:end]))
+      finally:
+         for r, tx in zip(reversed(self.registers), reversed(self.txs)):
+            r.ReleaseTransaction()
+            if r.stats is not None:
+               r.stats.Closed(tx)
+         self.txs = None
+
+
+# Bytes of several registers composed from field values
+# Opened through RegisterGroup.Compose(), for device instructions 
+# writing several registers at once (e.g. loading a transmit buffer). 
+# The transactions are write-only: fields start from their initialValue. 
+# On exit, image holds the bytes of the address span of the registers. 
+# If given, write(image) is then called to write them (the registers 
+# count the write and update their shadow copy), otherwise the device 
+# is not accessed.
+class RegisterImage(object):
+
+   def __init__(self, registers, write = None):
+      MetalCoreException.ThrowIf(len(registers) == 0,
+         "a register image needs at least one register")
+      self.registers = registers
+      self.write = write
+      self.startAddress = min(r.address for r in registers)
+      self.endAddress = max(r.address + r.lengthBytes for r in registers)
+      self.image = None
+      self.txs = None
+
+   def __enter__(self):
+      txs = []
+      for r in self.registers:
+         tx = r.AcquireTransaction(writeOnlyVal = r.layout.initialVal)
+         if r.stats is not None:
+            r.stats.Opened(tx)
+         txs += [tx]
+      self.txs = tuple(txs)
+      return self.txs
+
+   def __exit__(self, type, value, traceback):
+      try:
+         if type is None:
+            image = bytearray(self.endAddress - self.startAddress)
+            for r, tx in zip(self.registers, self.txs):
+               offset = r.address - self.startAddress
+               image[offset:offset + r.lengthBytes] = tx.Commit()
+            self.image = image
+            if self.write is not None:
+               self.write(image)
+               for r in self.registers:
+                  offset = r.address - self.startAddress
+                  r.updateShadow(image[offset:offset + r.lengthBytes])
+                  if r.stats is not None:
+                     r.stats.Wrote(r.lengthBytes)
+      finally:
+         for r, tx in zip(reversed(self.registers), reversed(self.txs)):
+            r.ReleaseTransaction()
+            if r.stats is not None:
+               r.stats.Closed(tx)
+         self.txs = None
 
 
 # Base class representing a well defined group of registers associated 
@@ -341,18 +900,305 @@ class Register(object):
 # Needs to be derived by a specialized implementation containing static 
 # Register() instances
 # Needs to be bound to a HAL using the BindToHal() method
-# Note - an instance of a group of registers can be bound to a given 
-# HAL device
-# - TODO - allow multiple RegisterGroup instantiation to be bound to 
-# different HAL devices
+# The static Register() instances are prototypes: each group instance 
+# works on its own copies (see Register.Clone), so several instances 
+# can be bound to different HAL devices and used from different threads.
+#
+# The group can optionally keep a shadow cache of its cacheable 
+# registers (see EnableCache). Cached registers are read from the device 
+# once and then served from memory; writes through a transaction update 
+# the shadow copy. Writes that bypass the registers (e.g. a device reset 
+# or direct HAL access) require an explicit InvalidateCache().
 class RegisterGroup(object):
 
+   # Address range read by Snapshot(). By default it spans the registers 
+   # of the group.
+   snapshotAddress = None
+   snapshotLength = None
+
    def __init__(self):
+      for n,v in type(self).__dict__.items():
+         if isinstance(v, Register):
+            register = v.Clone()
+            register.instanceNameInGroup = n
+            setattr(self, n, register)
       self.hal = None
+      self.cacheEnabled = False
+      self.shadow = {}
+      self.cacheHits = 0
+      self.cacheMisses = 0
 
    def BindToHal(self, hal):
       self.hal = hal
-      for n,v in type(self).__dict__.items():
+      self.InvalidateCache()
+      for n,v in vars(self).items():
          if isinstance(v, Register):
             # print("Binding HAL to Register", self.hal, n, v)
-            v.BindToHal(hal, n)
+            v.BindToHal(hal, n, self)
+
+   # Returns a transaction over several registers, read and written 
+   # back with burst SPI transfers. Usage:
+   #    with group.Transaction(group.A, group.B) as (a, b):
+   #       ...
+   # The registers can also be decoded from bytes already read:
+   #    with group.Transaction(group.A, group.B, readBytes = data) as (a, b):
+   def Transaction(self, *registers, readBytes = None):
+      return MultiRegisterTransaction(registers, readBytes)
+
+   # Returns a RegisterImage composing the bytes of the registers, 
+   # written with a device-specific instruction:
+   #    with group.Compose(group.A, group.B, 
+   #                       write = hal.SomeInstruction) as (a, b):
+   #       ...
+   def Compose(self, *registers, write = None):
+      return RegisterImage(registers, write)
+
+   # Reads the registers of the group with a single burst READ and 
+   # returns an immutable RegisterSnapshot of them
+   # If registers are given only their address span is read (and 
+   # printed by the snapshot Print() method), otherwise the snapshot 
+   # covers the snapshotAddress/snapshotLength range
+   def Snapshot(self, *registers):
+      if registers:
+         startAddress = min(r.address for r in registers)
+         endAddress = max(r.address + r.lengthBytes for r in registers)
+      elif self.snapshotLength is not None:
+         startAddress = self.snapshotAddress or 0
+         endAddress = startAddress + self.snapshotLength
+      else:
+         startAddress = min(r.address for r in self.Registers())
+         endAddress = max(r.address + r.lengthBytes 
+                          for r in self.Registers())
+      readBytes = self.hal.ReadBytes(startAddress, endAddress - startAddress)
+      return RegisterSnapshot(self, startAddress, bytes(readBytes), 
+                              registers)
+
+   # Compiles a declarative configuration into a RegisterWritePlan
+   # config is a list of stages written in order, each stage being a 
+   # list of (register, {field name: value}) pairs. Registers are 
+   # written whole, fields not given keeping their initialValue. 
+   # Within a stage, registers at adjacent addresses are merged into a 
+   # single burst write.
+   def CompileConfig(self, config):
+      writes = []
+      for stage in config:
+         images = sorted(((register.address, register.encodeValue(values), 
+                           register) for register, values in stage),
+                         key = lambda image: image[0])
+         stageWrites = []
+         for address, data, register in images:
+            if stageWrites:
+               lastAddress, lastData, lastRegisters = stageWrites[-1]
+               ArgumentException.ThrowIf(
+                  address < lastAddress + len(lastData),
+                  "register {0} overlaps another register of the stage"
+                  .format(register.instanceNameInGroup))
+               if address == lastAddress + len(lastData):
+                  stageWrites[-1] = (lastAddress, lastData + data, 
+                                     lastRegisters + (register,))
+                  continue
+            stageWrites += [(address, data, (register,))]
+         writes += stageWrites
+      return RegisterWritePlan(self, writes)
+
+   # Returns the registers of the group bound to an address, in address 
+   # order
+   def Registers(self):
+      registers = [v for v in vars(self).values() 
+                   if isinstance(v, Register) and (v.address is not None)]
+      registers.sort(key = lambda r: r.address)
+      return registers
+
+   # Enables or disables the shadow cache for cacheable registers
+   def EnableCache(self, enabled = True):
+      self.cacheEnabled = enabled
+      self.InvalidateCache()
+
+   # Drops all shadow copies, forcing the next access to each register 
+   # to read the device
+   def InvalidateCache(self):
+      self.shadow.clear()
+
+   def ResetCacheStats(self):
+      self.cacheHits = 0
+      self.cacheMisses = 0
+
+   # Enables or disables the access statistics of the registers of the 
+   # group (see RegisterStats). Enabling them starts from zero.
+   def EnableStats(self, enabled = True):
+      for register in self.Registers():
+         register.stats = RegisterStats() if enabled else None
+
+   # Clears the access statistics of all registers
+   def ResetStats(self):
+      for register in self.Registers():
+         if register.stats is not None:
+            register.stats.Reset()
+
+   # Returns the access statistics as a dictionary keyed by register 
+   # name (registers without statistics are left out)
+   def GetStats(self):
+      return dict((register.instanceNameInGroup, register.stats.ToDict())
+                  for register in self.Registers() 
+                  if register.stats is not None)
+
+   def GetStatsJson(self, indent = None):
+      return json.dumps(self.GetStats(), indent = indent, sort_keys = True)
+
+   # Internal method. Returns the shadow copy of a cacheable register, 
+   # reading it from the device on a miss
+   def ReadCached(self, register):
+      cachedBytes = self.shadow.get(register)
+      if cachedBytes is not None:
+         self.cacheHits += 1
+         return cachedBytes
+      self.cacheMisses += 1
+      if register.stats is not None:
+         register.stats.Read(register.lengthBytes)
+      cachedBytes = bytes(self.hal.ReadBytes(register.address, 
+                                             register.lengthBytes))
+      self.shadow[register] = cachedBytes
+      return cachedBytes
+
+
+# Ordered list of burst writes compiled from a configuration by 
+# RegisterGroup.CompileConfig(). Each write is an (address, bytes, 
+# registers) tuple.
+class RegisterWritePlan(object):
+
+   def __init__(self, group, writes):
+      self.group = group
+      self.writes = writes
+
+   def __len__(self):
+      return len(self.writes)
+
+   def __iter__(self):
+      return iter(self.writes)
+
+   # Issues the writes, in order, to the HAL of the group
+   def Apply(self):
+      hal = self.group.hal
+      for address, data, registers in self.writes:
+         hal.WriteBytes(address, data, 
+                        b"".join(r.verifyMask for r in registers))
+         offset = 0
+         for register in registers:
+            registerBytes = data[offset:offset + register.lengthBytes]
+            register.updateShadow(registerBytes)
+            if register.stats is not None:
+               register.stats.Wrote(register.lengthBytes)
+            offset += register.lengthBytes
+
+   # Returns the registers written by the plan, in write order
+   def Registers(self):
+      return [r for address, data, registers in self.writes 
+              for r in registers]
+
+   # Returns a plan with only the registers whose writeable bits differ 
+   # from a snapshot of the device (e.g. to reconfigure a device without 
+   # resetting it), skipping the given (e.g. volatile) registers
+   # Differing registers that were merged into a burst write stay merged 
+   # when they are still adjacent.
+   def Diff(self, snapshot, skip = ()):
+      writes = []
+      for address, data, registers in self.writes:
+         run = None
+         offset = 0
+         for register in registers:
+            registerBytes = data[offset:offset + register.lengthBytes]
+            offset += register.lengthBytes
+            mask = register.layout.writeableMask
+            actual = int.from_bytes(snapshot.ReadBytes(register.address, 
+               register.lengthBytes), 'big')
+            if (register in skip) or \
+                  ((actual & mask) == 
+                   (int.from_bytes(registerBytes, 'big') & mask)):
+               run = None
+               continue
+            if run is None:
+               run = [register.address, registerBytes, (register,)]
+               writes += [run]
+            else:
+               run[1] += registerBytes
+               run[2] += (register,)
+      return RegisterWritePlan(self.group, [tuple(w) for w in writes])
+
+   def Print(self):
+      for address, data, registers in self.writes:
+         print("- 0x{0:02x}: {1} ({2})".format(address, data.hex(), 
+            ", ".join(r.instanceNameInGroup for r in registers)))
+
+
+# Immutable copy of a range of the register map of a group, read with 
+# a single burst READ (see RegisterGroup.Snapshot)
+# Registers and fields are decoded from the copy without accessing the 
+# device:
+#    snapshot = group.Snapshot()
+#    snapshot.CANCTRL.REQOP       (register of the group by name)
+#    snapshot.Decode(register)    (any register of the range)
+#    snapshot[0x0F]               (byte at an address)
+# Decoded registers are transactions opened on the copied bytes; they 
+# are never written back.
+class RegisterSnapshot(object):
+   __slots__ = ("group", "startAddress", "image", "registers")
+
+   def __init__(self, group, startAddress, image, registers = ()):
+      object.__setattr__(self, "group", group)
+      object.__setattr__(self, "startAddress", startAddress)
+      object.__setattr__(self, "image", image)
+      object.__setattr__(self, "registers", tuple(registers))
+
+   def __setattr__(self, name, value):
+      raise AttributeError("register snapshots are immutable")
+
+   def __len__(self):
+      return len(self.image)
+
+   # Returns the byte at the given address
+   def __getitem__(self, address):
+      return self.image[self.Offset(address, 1)]
+
+   # Returns the decoded register with the given name in the group
+   def __getattr__(self, name):
+      register = getattr(self.group, name, None)
+      if not isinstance(register, Register):
+         raise AttributeError("no register {0} in {1}".format(
+            name, type(self.group).__name__))
+      return self.Decode(register)
+
+   # Internal method. Returns the offset of an address range in the 
+   # image
+   def Offset(self, address, length):
+      offset = address - self.startAddress
+      MetalCoreException.ThrowIf(
+         (offset < 0) or (offset + length > len(self.image)),
+         "address 0x{0:02x} (+{1}) is outside of the snapshot".format(
+            address, length))
+      return offset
+
+   # Returns the bytes at the given address and length
+   def ReadBytes(self, address, length):
+      offset = self.Offset(address, length)
+      return self.image[offset:offset + length]
+
+   # Returns a transaction holding the register contents
+   def Decode(self, register):
+      MetalCoreException.ThrowIf(register.address == None,
+         "need to define address field in registry declaration for %s" 
+         % type(register))
+      tx = register.layout.transactionClass(register)
+      tx.Open(self.ReadBytes(register.address, register.lengthBytes))
+      return tx
+
+   # Prints the registers given to Snapshot() (or all the registers of 
+   # the group within the snapshot)
+   def Print(self):
+      registers = self.registers
+      if not registers:
+         registers = [r for r in self.group.Registers() 
+            if (r.address >= self.startAddress) and 
+               (r.address + r.lengthBytes <= 
+                  self.startAddress + len(self.image))]
+      for register in registers:
+         self.Decode(register).Print()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Bulk decoding of raw register images with NumPy
+#
+# Register transactions decode one register at a time through a HAL.
+# For offline analysis of captured data (RX buffer images, register map
+# dumps) the classes below derive a NumPy structured dtype from Register
+# classes and decode a whole buffer of N images with one vectorized
+# shift and mask per field, without any HAL.
+#
+# Example - decoding N RXB0 images (RXB0ID, RXB0DLC, RXB0DATA):
+#    decoder = ImageDecoder([("ID", RXBnIDx, 0),
+#                            ("DLC", RXBnDLCx, 4),
+#                            ("DATA", RXBnDATAx, 5)])
+#    frames = decoder.Decode(buffer)    # buffer of N * 13 bytes
+#    frames["ID"]["EID"], frames["DLC"]["DLC"], ...
+#
+# NumPy is only needed by this module; metalcore does not depend on it.
+
+import numpy
+
+from metalcore import ArgumentException, Register
+
+
+# Vectorized decoder for the fields of a Register class
+# The register length defaults to the smallest number of bytes holding
+# all the fields of the class.
+class RegisterArrayDecoder(object):
+
+   def __init__(self, registerClass, lengthBytes = None):
+      ArgumentException.ThrowIf(
+         not (isinstance(registerClass, type) and
+              issubclass(registerClass, Register)),
+         "{0} is not a Register class".format(registerClass))
+      fields = registerClass.layout.fields
+      if lengthBytes is None:
+         lengthBytes = max([(v.bitOffsetMSB + 8) >> 3
+                            for n, v in fields] + [1])
+      self.registerClass = registerClass
+      self.lengthBytes = lengthBytes
+
+      # One extractor per field:
+      #    (name, first byte, byte count, shift, value mask)
+      # Fields wider than 64 bits must be byte aligned and are returned
+      # as a byte array (shift and mask are None)
+      self.extractors = []
+      dtypeFields = []
+      for n, v in sorted(fields, key = lambda f: -f[1].bitOffsetMSB):
+         ArgumentException.ThrowIf(v.bitOffsetMSB >= 8 * lengthBytes,
+            "field {0}.{1} does not fit in {2} bytes".format(
+               registerClass.__name__, n, lengthBytes))
+         firstByte = lengthBytes - 1 - (v.bitOffsetMSB >> 3)
+         lastByte = lengthBytes - 1 - (v.rightPaddingBits >> 3)
+         byteCount = 1 + lastByte - firstByte
+         shift = v.rightPaddingBits & 7
+         if v.bitsLength > 64:
+            ArgumentException.ThrowIf(shift or (v.bitsLength & 7),
+               "field {0}.{1} is wider than 64 bits and not byte aligned"
+               .format(registerClass.__name__, n))
+            self.extractors += [(n, firstByte, byteCount, None, None)]
+            dtypeFields += [(n, numpy.uint8, (byteCount,))]
+         else:
+            ArgumentException.ThrowIf(byteCount > 8,
+               "field {0}.{1} spans more than 8 bytes".format(
+                  registerClass.__name__, n))
+            self.extractors += [(n, firstByte, byteCount, shift,
+                                 v.valueMask)]
+            dtypeFields += [(n, RegisterArrayDecoder.FieldType(v))]
+      self.dtype = numpy.dtype(dtypeFields)
+
+   # Returns the smallest unsigned integer type holding the field
+   @staticmethod
+   def FieldType(field):
+      for fieldType in (numpy.uint8, numpy.uint16, numpy.uint32):
+         if field.bitsLength <= 8 * numpy.dtype(fieldType).itemsize:
+            return fieldType
+      return numpy.uint64
+
+   # Decodes the register at the given byte offset of each image
+   # images is a 2D uint8 array with one image per row
+   # Returns a structured array of N elements
+   def DecodeImages(self, images, offset = 0):
+      ArgumentException.ThrowIf(
+         offset + self.lengthBytes > images.shape[1],
+         "{0} bytes at offset {1} exceed the image length {2}".format(
+            self.lengthBytes, offset, images.shape[1]))
+      result = numpy.empty(images.shape[0], dtype = self.dtype)
+      spans = {}
+      for n, firstByte, byteCount, shift, valueMask in self.extractors:
+         columns = images[:, offset + firstByte:
+                             offset + firstByte + byteCount]
+         if shift is None:
+            result[n] = columns
+            continue
+         # Big endian value of the bytes spanned by the field, shared
+         # by the fields spanning the same bytes
+         vals = spans.get((firstByte, byteCount))
+         if vals is None:
+            vals = columns[:, 0].astype(numpy.uint64)
+            for i in range(1, byteCount):
+               vals = (vals << numpy.uint64(8)) | columns[:, i]
+            spans[(firstByte, byteCount)] = vals
+         result[n] = (vals >> numpy.uint64(shift)) & \
+                     numpy.uint64(valueMask)
+      return result
+
+   # Decodes a buffer of N consecutive register images
+   def Decode(self, buffer):
+      return self.DecodeImages(ToImages(buffer, self.lengthBytes))
+
+
+# Vectorized decoder for images made of several registers
+# registers is a list of (name, Register class, byte offset) or
+# (name, Register class, byte offset, length in bytes) tuples. The
+# decoded structured array has one sub-array of fields per register.
+class ImageDecoder(object):
+
+   def __init__(self, registers, imageLength = None):
+      self.decoders = []
+      for r in registers:
+         name, registerClass, offset = r[0], r[1], r[2]
+         lengthBytes = r[3] if len(r) > 3 else None
+         self.decoders += [(name, offset,
+                            RegisterArrayDecoder(registerClass, lengthBytes))]
+      if imageLength is None:
+         imageLength = max(offset + decoder.lengthBytes
+                           for name, offset, decoder in self.decoders)
+      self.imageLength = imageLength
+      self.dtype = numpy.dtype([(name, decoder.dtype)
+                                for name, offset, decoder in self.decoders])
+
+   # Builds a decoder for the registers of a RegisterGroup, at their
+   # address relative to baseAddress (e.g. for a register map dump
+   # starting at address 0)
+   # registerNames selects registers by name (all of them by default)
+   @staticmethod
+   def FromGroup(group, registerNames = None, baseAddress = 0,
+                 imageLength = None):
+      registers = []
+      for v in group.Registers():
+         n = v.instanceNameInGroup
+         if (registerNames is None) or (n in registerNames):
+            registers += [(n, type(v), v.address - baseAddress,
+                           v.lengthBytes)]
+      ArgumentException.ThrowIf(len(registers) == 0,
+         "no register selected")
+      return ImageDecoder(registers, imageLength)
+
+   # Decodes a 2D uint8 array with one image per row
+   def DecodeImages(self, images):
+      result = numpy.empty(images.shape[0], dtype = self.dtype)
+      for name, offset, decoder in self.decoders:
+         result[name] = decoder.DecodeImages(images, offset)
+      return result
+
+   # Decodes a buffer of N consecutive images
+   def Decode(self, buffer):
+      return self.DecodeImages(ToImages(buffer, self.imageLength))
+
+
+# Returns a buffer (bytes-like object or uint8 array) as a 2D uint8
+# array of images with the given length, without copying
+def ToImages(buffer, imageLength):
+   images = numpy.asarray(buffer) if isinstance(buffer, numpy.ndarray) \
+            else numpy.frombuffer(buffer, dtype = numpy.uint8)
+   ArgumentException.ThrowIf(images.dtype != numpy.uint8,
+      "images must be uint8")
+   if images.ndim == 2:
+      ArgumentException.ThrowIf(images.shape[1] != imageLength,
+         "images must be {0} bytes long".format(imageLength))
+      return images
+   ArgumentException.ThrowIf(images.size % imageLength,
+      "buffer length {0} is not a multiple of {1}".format(
+         images.size, imageLength))
+   return images.reshape(-1, imageLength)
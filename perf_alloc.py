@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Measures the heap churn and CPU cost of MCP25625_api.Recv() against
+# the mock HAL, so it can be run without a MCP25625 attached.
+# Heap churn is reported as the tracemalloc peak above the live heap
+# during a single Recv() call.
+
+import time
+import tracemalloc
+from MCP25625_api import MCP25625_api
+from MCP25625_hal_mock import MCP25625_hal_mock
+from MCP25625_registers import MCP25625_RegisterGroup
+
+class perf_alloc(object):
+
+    _warmupIterations = 100
+    _iterations = 2000
+
+    def __init__(self):
+        self.hal = MCP25625_hal_mock(verbosePrint = False)
+        self.can = MCP25625_api(MCP25625_RegisterGroup())
+        self.can.reg.BindToHal(self.hal)
+        self.can.Initialize(self.hal)
+
+        # Park an extended frame with 5 data bytes in RXB0
+        self.hal.testData[0x61] = [0b10010000, 0b00101001, 0x34, 0x56]
+        self.hal.testData[0x65] = [5]
+        self.hal.testData[0x66] = [0x01, 0xDE, 0xAD, 0xCA, 0xFE, 0, 0, 0]
+
+    def Recv(self):
+        # Flag RXB0 as full so that Recv() does not block
+        self.hal.memory[0x2C] |= 0b00000001
+        return self.can.Recv()
+
+    def Start(self):
+        for i in range(self._warmupIterations):
+            self.Recv()
+
+        timeStart = time.perf_counter()
+        for i in range(self._iterations):
+            self.Recv()
+        elapsed = time.perf_counter() - timeStart
+
+        tracemalloc.start()
+        peakTotal = 0
+        peakMax = 0
+        for i in range(self._iterations):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            self.Recv()
+            churn = tracemalloc.get_traced_memory()[1] - baseline
+            peakTotal += churn
+            peakMax = max(peakMax, churn)
+        tracemalloc.stop()
+
+        print("Recv(): {0:.1f} us per call".format(
+            elapsed * 1e6 / self._iterations))
+        print("Recv(): {0:.0f} bytes average / {1} bytes max heap churn "
+              "per call".format(peakTotal / self._iterations, peakMax))
+
+if __name__ == "__main__":
+    perf = perf_alloc()
+    perf.Start()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Measures the aggregate throughput of MCP25625_manager with 1 to 8
+# simulated devices in loopback mode, so it can be run without MCP25625s
+# attached.
+# Each simulated device takes the time of its SPI transfers at the given
+# SPI clock (the caller sleeps like in a blocking spidev transfer) and
+# completes a transmit request at once, looping the frame back into RXB0.
+
+import time
+from MCP25625_api import Message
+from MCP25625_hal_mock import MCP25625_hal_mock
+from MCP25625_manager import MCP25625_manager
+
+class perf_devices_hal(MCP25625_hal_mock):
+
+    def __init__(self, spiClockHz):
+        super().__init__(verbosePrint = False)
+        self.secondsPerByte = 8.0 / spiClockHz
+
+    def Transfer(self, lengthBytes):
+        time.sleep(lengthBytes * self.secondsPerByte)
+
+    def ReadBytes(self, addressBytes, len):
+        self.Transfer(2 + len)
+        return super().ReadBytes(addressBytes, len)
+
+    def WriteBytes(self, addressBytes, listBytes, verifyMask = None):
+        self.Transfer(2 + len(listBytes))
+        super().WriteBytes(addressBytes, listBytes, verifyMask)
+        self.Loopback()
+
+    def ReadRxBuffer(self, rxBufferId, len = 13, fromData = False):
+        self.Transfer(1 + len)
+        return super().ReadRxBuffer(rxBufferId, len, fromData)
+
+    def LoadTxBuffer(self, txBufferId, listBytes, fromData = False):
+        self.Transfer(1 + len(listBytes))
+        super().LoadTxBuffer(txBufferId, listBytes, fromData)
+
+    def RequestToSend(self, txBufferMask):
+        self.Transfer(1)
+        super().RequestToSend(txBufferMask)
+        self.Loopback()
+
+    def ReadStatus(self):
+        self.Transfer(2)
+        return super().ReadStatus()
+
+    def RxStatus(self):
+        self.Transfer(2)
+        return super().RxStatus()
+
+    def BitModify(self, addressByte, maskByte, dataByte, verifyMask = None):
+        self.Transfer(4)
+        super().BitModify(addressByte, maskByte, dataByte, verifyMask)
+        self.Loopback()
+
+    # Completes the pending transmit requests (TXBnCTRL.TXREQ), copying
+    # the ID/DLC/DATA of the last buffer into RXB0 and raising TXnIF and 
+    # RX0IF
+    def Loopback(self):
+        for txBufferId, address in enumerate((0x30, 0x40, 0x50)):
+            if self.memory[address] & 0b00001000:
+                self.memory[address] &= 0b11110111
+                self.memory[0x61:0x6E] = self.memory[address + 1:address + 14]
+                self.memory[0x2C] |= 0b00000001 | (0b00000100 << txBufferId)
+
+class perf_devices(object):
+
+    _spiClockHz = 100000
+    _messagesPerDevice = 50
+
+    def Run(self, deviceCount):
+        devices = [(0, cs) for cs in range(deviceCount)]
+        halFactory = lambda bus, cs: perf_devices_hal(self._spiClockHz)
+        with MCP25625_manager(devices, halFactory, loopbackMode = True) as manager:
+            timeStart = time.perf_counter()
+            for i in range(self._messagesPerDevice):
+                for index in range(deviceCount):
+                    manager.Send(index, Message(0x122801f0, [i, index]))
+            for index in range(deviceCount):
+                for i in range(self._messagesPerDevice):
+                    manager.Recv(index, timeoutSeconds = 10)
+            elapsed = time.perf_counter() - timeStart
+        return deviceCount * self._messagesPerDevice / elapsed
+
+    def Start(self):
+        print("SPI clock {0} Hz, {1} messages per device".format(
+            self._spiClockHz, self._messagesPerDevice))
+        single = None
+        for deviceCount in (1, 2, 4, 8):
+            framesPerSecond = self.Run(deviceCount)
+            if single == None:
+                single = framesPerSecond
+            print("{0} device(s): {1:.0f} frames/s ({2:.2f}x)".format(
+                deviceCount, framesPerSecond, framesPerSecond / single))
+
+if __name__ == "__main__":
+    perf = perf_devices()
+    perf.Start()
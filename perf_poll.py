@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Measures the cost of one poll of MCP25625_api.Peek() (receive) and of 
+# the transmit completion poll, against the register transactions they 
+# replaced (READ of CANINTF / TXB0CTRL and field decode), using the memory 
+# HAL so it can be run without a MCP25625 attached (or the HAL backend 
+# named by the MCP25625_HAL environment variable, see 
+# MCP25625_hal_base.CreateHal).
+# The CPU time is measured; the SPI time is computed from the bytes of 
+# each poll at the given SPI clocks.
+
+import time
+from MCP25625_api import MCP25625_api
+from MCP25625_hal_base import CreateHal, SelectHalBackend
+from MCP25625_registers import MCP25625_RegisterGroup, TXBnCTRLx
+
+class perf_poll(object):
+
+    _iterations = 20000
+    _spiClocksHz = (10000, 1000000, 10000000)
+
+    def __init__(self):
+        self.hal = CreateHal(SelectHalBackend(default = "memory"))
+        self.can = MCP25625_api(MCP25625_RegisterGroup())
+        self.can.Initialize(self.hal)
+
+    # Poll through a CANINTF transaction (READ of 3 bytes)
+    def PeekTransaction(self):
+        with self.can.reg.CANINTF as r_canintf:
+            return r_canintf.RX0IF == 1
+
+    # Poll through RX STATUS (2 bytes)
+    def PeekStatus(self):
+        return self.can._Peek(0)
+
+    # Poll through a TXB0CTRL transaction (READ of 3 bytes)
+    def PollSendTransaction(self):
+        with self.can.reg.TXB0CTRL as r_ctrl:
+            return r_ctrl.TXREQ == TXBnCTRLx.TXREQ_NotPending
+
+    # Poll through READ STATUS (2 bytes)
+    def PollSendStatus(self):
+        return self.can._PollSend([0])
+
+    def Measure(self, poll):
+        for i in range(100):
+            poll()
+        timeStart = time.perf_counter()
+        for i in range(self._iterations):
+            poll()
+        return (time.perf_counter() - timeStart) / self._iterations
+
+    def Start(self):
+        print("{0:<22} {1:>10} {2:>6}  {3}".format("Poll", "CPU us", "bytes", 
+            "  ".join("SPI us @{0} Hz".format(f) for f in self._spiClocksHz)))
+        for name, poll, pollBytes in (
+                ("Peek (CANINTF)", self.PeekTransaction, 3),
+                ("Peek (RX STATUS)", self.PeekStatus, 2),
+                ("Send (TXB0CTRL)", self.PollSendTransaction, 3),
+                ("Send (READ STATUS)", self.PollSendStatus, 2)):
+            seconds = self.Measure(poll)
+            print("{0:<22} {1:>10.2f} {2:>6}  {3}".format(name, seconds * 1e6, 
+                pollBytes, "  ".join("{0:>{1}.1f}".format(
+                    pollBytes * 8.0 / f * 1e6, len("SPI us @{0} Hz".format(f))) 
+                    for f in self._spiClocksHz)))
+
+if __name__ == "__main__":
+    perf = perf_poll()
+    perf.Start()
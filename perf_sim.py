@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Measures the latency of MCP25625_api.Send and Recv of a frame looped
+# back by a simulated MCP25625 (sim HAL backend, see MCP25625_sim), so the
+# API can be benchmarked down to the SPI frames without a device.
+# The CPU time is measured, which includes the time of the device model;
+# the SPI frames and bytes are counted by the simulated device and the SPI
+# time is computed from them at the given SPI clocks.
+
+import time
+from MCP25625_api import MCP25625_api, Message
+from MCP25625_sim import MCP25625_hal_sim
+from MCP25625_registers import MCP25625_RegisterGroup
+
+class perf_sim(object):
+
+    _iterations = 5000
+    _spiClocksHz = (10000, 1000000, 10000000)
+    _arbitrationId = 0x122801f0
+
+    def __init__(self):
+        self.hal = MCP25625_hal_sim()
+        self.sim = self.hal.sim
+        self.can = MCP25625_api(MCP25625_RegisterGroup())
+        self.can.SetFilterIdF0(self._arbitrationId)
+        self.can.Initialize(self.hal)
+        self.can.SetLoopbackMode()
+        self.msg = Message(self._arbitrationId, [1, 2, 3, 4, 5, 6, 7, 8])
+
+    def Send(self):
+        self.can.Send(self.msg, 100)
+
+    def Recv(self):
+        self.can.Recv(100)
+
+    # Returns the CPU seconds, SPI frames and SPI bytes of the measured
+    # operations. Send and Recv alternate so the receive buffer never
+    # overflows; only the measured operations are timed and counted.
+    def Measure(self, measured):
+        for i in range(100):
+            self.Send()
+            self.Recv()
+        seconds = 0.0
+        transfers = 0
+        transferBytes = 0
+        for i in range(self._iterations):
+            for operation in (self.Send, self.Recv):
+                if operation not in measured:
+                    operation()
+                    continue
+                transfersStart = self.sim.transfers
+                bytesStart = self.sim.transferBytes
+                timeStart = time.perf_counter()
+                operation()
+                seconds += time.perf_counter() - timeStart
+                transfers += self.sim.transfers - transfersStart
+                transferBytes += self.sim.transferBytes - bytesStart
+        return (seconds / self._iterations,
+                transfers / float(self._iterations),
+                transferBytes / float(self._iterations))
+
+    def Start(self):
+        print("{0:<12} {1:>10} {2:>7} {3:>6}  {4}".format("Operation",
+            "CPU us", "frames", "bytes", "  ".join("SPI us @{0} Hz".format(f)
+            for f in self._spiClocksHz)))
+        for name, measured in (("Send", (self.Send,)),
+                               ("Recv", (self.Recv,)),
+                               ("Send+Recv", (self.Send, self.Recv))):
+            seconds, frames, frameBytes = self.Measure(measured)
+            print("{0:<12} {1:>10.2f} {2:>7.1f} {3:>6.1f}  {4}".format(name,
+                seconds * 1e6, frames, frameBytes, "  ".join(
+                    "{0:>{1}.1f}".format(frameBytes * 8.0 / f * 1e6,
+                    len("SPI us @{0} Hz".format(f)))
+                    for f in self._spiClocksHz)))
+
+if __name__ == "__main__":
+    perf = perf_sim()
+    perf.Start()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Measures the per-call CPU cost and heap churn of the MCP25625_hal SPI
+# instructions against a fake spidev object, so only the work of the HAL
+# (building the command, handling the response) is measured.
+# perf_spi_legacy_hal issues the same instructions the way MCP25625_hal
+# did before its preallocated command buffers: commands built as lists
+# and every instruction issued with xfer (writes are not read back in
+# either HAL).
+
+import time
+import tracemalloc
+from MCP25625_hal import MCP25625_hal
+
+# spidev-like object returning a list of zeroes for each transfer, like
+# spidev returns a new list of the bytes received
+class perf_spi_fake(object):
+
+    def xfer(self, command):
+        return [0] * len(command)
+
+    xfer2 = xfer
+
+    def writebytes2(self, command):
+        pass
+
+    def close(self):
+        pass
+
+class perf_spi_legacy_hal(MCP25625_hal):
+
+    def ReadBytes(self, addressBytes, len):
+        dummyData = b'\x00'*len
+        command = list(0b00000011.to_bytes(1, 'big')
+                       + addressBytes.to_bytes(1, 'big') + dummyData)
+        response = self.s.xfer(command)
+        return memoryview(bytearray(response))[2:]
+
+    def WriteBytes(self, addressBytes, arrayDataBytes, verifyMask = None):
+        command = list(0b00000010.to_bytes(1, 'big')
+                       + addressBytes.to_bytes(1, 'big') + arrayDataBytes)
+        self.s.xfer(command)
+
+    def ReadRxBuffer(self, rxBufferId, len = 13, fromData = False):
+        command = [0b10010000 | (rxBufferId << 2) | (int(fromData) << 1)] \
+                  + [0] * len
+        response = self.s.xfer(command)
+        return memoryview(bytearray(response))[1:]
+
+    def LoadTxBuffer(self, txBufferId, arrayDataBytes, fromData = False):
+        command = [0b01000000 | (txBufferId << 1) | int(fromData)] \
+                  + list(arrayDataBytes)
+        self.s.xfer(command)
+
+    def RequestToSend(self, txBufferMask):
+        self.s.xfer([0b10000000 | (txBufferMask & 0b111)])
+
+    def ReadStatus(self):
+        return self.s.xfer([0b10100000, 0])[1]
+
+    def BitModify(self, addressByte, maskByte, dataByte, verifyMask = None):
+        command = [0b00000101, addressByte, maskByte, dataByte]
+        self.s.xfer(command)
+
+class perf_spi(object):
+
+    _warmupIterations = 100
+    _iterations = 50000
+    _churnIterations = 2000
+
+    def __init__(self):
+        self.hals = (("legacy", perf_spi_legacy_hal(spi = perf_spi_fake())),
+                     ("buffers", MCP25625_hal(spi = perf_spi_fake())))
+        self.txImage = bytes(13)
+        self.data = bytes(8)
+
+    # Instructions measured: (name, function of the HAL)
+    def Calls(self):
+        return (
+            ("READ 1 byte", lambda hal: hal.ReadBytes(0x2C, 1)),
+            ("READ 13 bytes", lambda hal: hal.ReadBytes(0x61, 13)),
+            ("WRITE 8 bytes", lambda hal: hal.WriteBytes(0x36, self.data)),
+            ("BIT MODIFY", lambda hal: hal.BitModify(0x2C, 0x01, 0x00)),
+            ("READ RX BUFFER", lambda hal: hal.ReadRxBuffer(0)),
+            ("LOAD TX BUFFER", lambda hal: hal.LoadTxBuffer(0, self.txImage)),
+            ("RTS", lambda hal: hal.RequestToSend(0b001)),
+            ("READ STATUS", lambda hal: hal.ReadStatus()))
+
+    def Measure(self, call, hal):
+        for i in range(self._warmupIterations):
+            call(hal)
+        timeStart = time.perf_counter()
+        for i in range(self._iterations):
+            call(hal)
+        return (time.perf_counter() - timeStart) / self._iterations
+
+    # Average tracemalloc peak above the live heap during one call
+    def Churn(self, call, hal):
+        tracemalloc.start()
+        churnTotal = 0
+        for i in range(self._churnIterations):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            call(hal)
+            churnTotal += tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+        return churnTotal / self._churnIterations
+
+    def Start(self):
+        print("{0:<16} {1:>10} {2:>10} {3:>8} {4:>10} {5:>10}".format(
+            "Instruction", "legacy us", "buffers us", "speedup",
+            "legacy B", "buffers B"))
+        for name, call in self.Calls():
+            seconds = [self.Measure(call, hal) for n, hal in self.hals]
+            churn = [self.Churn(call, hal) for n, hal in self.hals]
+            print("{0:<16} {1:>10.2f} {2:>10.2f} {3:>7.2f}x {4:>10.0f} "
+                  "{5:>10.0f}".format(name, seconds[0] * 1e6,
+                  seconds[1] * 1e6, seconds[0] / seconds[1], churn[0],
+                  churn[1]))
+
+if __name__ == "__main__":
+    perf = perf_spi()
+    perf.Start()
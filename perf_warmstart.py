@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Measures the restart-to-first-frame latency of MCP25625_api with and 
+# without warm start (Initialize(warmStart = True)), on a simulated device 
+# so it can be run without a MCP25625 attached.
+# The simulated device takes the time of its SPI transfers at the given 
+# SPI clock and receives a frame from the bus every frame period while in 
+# Normal mode. Each restart happens with a frame waiting in RXB0: a warm 
+# start keeps it, a reset drops it and the first frame is the next one on 
+# the bus.
+
+import time
+from MCP25625_api import MCP25625_api
+from MCP25625_registers import MCP25625_RegisterGroup
+from perf_devices import perf_devices_hal
+
+class perf_warmstart_hal(perf_devices_hal):
+
+    def __init__(self, spiClockHz, framePeriodSeconds):
+        super().__init__(spiClockHz)
+        self.framePeriodSeconds = framePeriodSeconds
+        self.nextFrameTime = time.perf_counter()
+
+    def Reset(self):
+        self.Transfer(1)
+        super().Reset()
+
+    def ReadBytes(self, addressBytes, len):
+        self.Bus()
+        return super().ReadBytes(addressBytes, len)
+
+    def WriteBytes(self, addressBytes, listBytes, verifyMask = None):
+        self.Bus()
+        super().WriteBytes(addressBytes, listBytes, verifyMask)
+
+    def ReadStatus(self):
+        self.Bus()
+        return super().ReadStatus()
+
+    def RxStatus(self):
+        self.Bus()
+        return super().RxStatus()
+
+    def BitModify(self, addressByte, maskByte, dataByte, verifyMask = None):
+        self.Bus()
+        super().BitModify(addressByte, maskByte, dataByte, verifyMask)
+
+    # Updates CANSTAT.OPMOD from CANCTRL.REQOP and receives the frames of 
+    # the bus into RXB0 (when empty) in Normal mode
+    def Bus(self):
+        self.memory[0x0E] = (self.memory[0x0E] & 0b00011111) | \
+                            (self.memory[0x0F] & 0b11100000)
+        now = time.perf_counter()
+        if now < self.nextFrameTime:
+            return
+        while self.nextFrameTime <= now:
+            self.nextFrameTime += self.framePeriodSeconds
+        if ((self.memory[0x0E] >> 5) == 0) and not (self.memory[0x2C] & 0b00000001):
+            # Extended frame 0x120801F1 with 1 data byte
+            self.memory[0x61:0x67] = bytes([0x90, 0x48, 0x01, 0xF1, 1, 0x5A])
+            self.memory[0x2C] |= 0b00000001
+
+class perf_warmstart(object):
+
+    _spiClockHz = 100000
+    _framePeriodSeconds = 0.1
+    _restarts = 20
+
+    def Restart(self, hal, warmStart):
+        api = MCP25625_api(MCP25625_RegisterGroup())
+        api.SetFilterIdF0(0x120801F1)
+        timeStart = time.perf_counter()
+        api.Initialize(hal, warmStart = warmStart)
+        api.SetNormalMode()
+        while not api.Peek():
+            pass
+        api.Recv()
+        return time.perf_counter() - timeStart
+
+    def Run(self, warmStart):
+        hal = perf_warmstart_hal(self._spiClockHz, self._framePeriodSeconds)
+        self.Restart(hal, False)
+        latencies = []
+        for i in range(self._restarts):
+            # Restart with the next frame waiting in RXB0
+            time.sleep(self._framePeriodSeconds)
+            latencies += [self.Restart(hal, warmStart)]
+        return latencies
+
+    def Start(self):
+        print("SPI clock {0} Hz, a frame every {1} ms, {2} restarts".format(
+            self._spiClockHz, self._framePeriodSeconds * 1000, self._restarts))
+        for warmStart in (False, True):
+            latencies = self.Run(warmStart)
+            print("{0}: restart to first frame {1:.1f} ms average, {2:.1f} ms max".format(
+                "warm start" if warmStart else "reset     ", 
+                sum(latencies) / len(latencies) * 1000, max(latencies) * 1000))
+
+if __name__ == "__main__":
+    perf = perf_warmstart()
+    perf.Start()
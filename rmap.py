@@ -5,6 +5,7 @@
 import argparse
 
 import MCP25625_hal as hal
+from MCP25625_registers import MCP25625_RegisterGroup
 
 import colored as clr
 
@@ -12,8 +13,10 @@ import colored as clr
 # Test utility for low-level access to MCP25625 register map
 class rmap:
 
-   def __init__(self):
-      self.hal = hal.MCP25625_hal()
+   def __init__(self, spiClockHz = None):
+      self.hal = hal.MCP25625_hal(spiClockHz = spiClockHz)
+      self.reg = MCP25625_RegisterGroup()
+      self.reg.BindToHal(self.hal)
       self.ra = self.GetRegisters()
       self.rc = self.GetRegisterColors()
 
@@ -26,7 +29,9 @@ class rmap:
    def __setitem__(self, memAddressByte, byteValue):
       self.hal.WriteByte(memAddressByte, byteValue)
 
+   # The dumps read the whole register map with a single SPI transfer
    def DumpMemHex(self):
+      snapshot = self.reg.Snapshot()
       l = "LSB\HSB "
       for v in range(0,8):
          l += " {0:04b}".format(v)
@@ -37,7 +42,7 @@ class rmap:
          l = ""
          for h in range(0,8):
             a = (h << 4) + v
-            b = self[a]
+            b = snapshot[a]
             fgc = clr.fg(self.rc[v][h])
             fgr = clr.attr('reset')
             l += "  {0}{1:02x}{2} ".format(fgc, b, fgr)
@@ -45,6 +50,7 @@ class rmap:
          print("{0:04b}: ".format(v), l)
 
    def DumpMemBin(self):
+      snapshot = self.reg.Snapshot()
       l = "LSB \ MSB  "
       for v in range(0,8):
          l += "{0:04b}xxxx ".format(v)
@@ -55,7 +61,7 @@ class rmap:
          l = ""
          for h in range(0,8):
             a = (h << 4) + v
-            b = self[a]
+            b = snapshot[a]
             fgc = clr.fg(self.rc[v][h])
             fgr = clr.attr('reset')
             l += "{0}{1:08b}{2} ".format(fgc, b, fgr)
@@ -63,6 +69,7 @@ class rmap:
          print("xxxx{0:04b}: ".format(v), l)
 
    def DumpRegBin(self):
+      snapshot = self.reg.Snapshot()
       l = "   LSB \ MSB"
       for v in range(0,8):
          l += " ---- {0:04b}.xxxx ----- ".format(v)
@@ -73,7 +80,7 @@ class rmap:
          l = ""
          for msb in range(0,8):
             a = (msb << 4) + lsb
-            b = self[a]
+            b = snapshot[a]
             fgc = clr.fg(self.rc[lsb][msb])
             fgr = clr.attr('reset')
             l += "{0}{1:>9}/{2:02x}={3:08b}{4} ".format(fgc, 
@@ -83,6 +90,7 @@ class rmap:
          print("xxxx.{0:04b}: ".format(lsb), l)
 
    def DumpRegHex(self):
+      snapshot = self.reg.Snapshot()
       l = "   LSB \ MSB"
       for v in range(0,8):
          l += " - {0:04b}.xxxx -- ".format(v)
@@ -93,7 +101,7 @@ class rmap:
          l = ""
          for msb in range(0,8):
             a = (msb << 4) + lsb
-            b = self[a]
+            b = snapshot[a]
             fgc = clr.fg(self.rc[lsb][msb])
             fgr = clr.attr('reset')
             l += "{0}{1:>9}/{2:02x}={3:02x}{4} ".format(fgc, 
@@ -210,9 +218,22 @@ if __name__ == "__main__":
      help='Set CAN sleep mode')
    parser.add_argument('-MLS', '--listenMode', action='store_true', 
      help='Set CAN listen-only mode')
+   parser.add_argument('-S', '--spiHz', type=int, 
+     help='SPI clock in Hz (default {0})'.format(
+        hal.MCP25625_hal.defaultSpiClockHz))
+   parser.add_argument('-AT', '--autoTuneSpi', action='store_true', 
+     help='Find and use the highest reliable SPI clock (up to --spiHz)')
    args = parser.parse_args()
 
-   m = rmap()
+   m = rmap(None if args.autoTuneSpi else args.spiHz)
+
+   if args.autoTuneSpi:
+      print("Tuning the SPI clock ...")
+      if args.spiHz:
+         spiClockHz = m.hal.AutoTuneSpiClock(args.spiHz)
+      else:
+         spiClockHz = m.hal.AutoTuneSpiClock()
+      print("SPI clock set to {0} Hz".format(spiClockHz))
 
    if args.reset:
       print("Performing a CAN Reset ...")
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# Copyright (C) 2018 Quick2Space.org under the MIT License (MIT)
+# See the LICENSE.txt file in the project root for more information.
+
+# Offline analyzer of MCP25625 SPI traces
+#
+# Decodes each SPI frame of a trace into a MCP25625 instruction and the
+# registers it accesses, and reports where the bus time goes:
+# - frames and bytes per instruction
+# - reads/writes/bit modifies per register
+# - redundant read-backs (READ of the bytes written by the previous frame)
+# - frames, bytes and time per traced operation (Send, Recv, ...), as
+#   delimited by the markers of the trace: the wall time from the marker
+#   to the last frame of the operation, and separately the idle time from
+#   that frame to the next marker
+#
+# Traces are either binary files written by MCP25625_hal_recorder or text
+# logs with one frame per line: the command bytes in hex, optionally
+# followed by "|" and the response bytes. Lines starting with "#" are
+# markers (the rest of the line is the label).
+
+import argparse
+
+from MCP25625_registers import MCP25625_RegisterGroup
+from MCP25625_trace import SpiTraceReader, SpiTraceRecord
+
+
+# Decoded SPI frame
+class spitrace_frame(object):
+
+   def __init__(self, record, instruction, address = None, length = 0,
+                registers = ()):
+      self.record = record
+      self.instruction = instruction
+      self.address = address
+      self.length = length
+      self.registers = registers
+
+   def __str__(self):
+      s = "{0:<16} {1:3} bytes".format(self.instruction,
+                                       len(self.record.command))
+      if self.address is not None:
+         s += "  0x{0:02x}+{1}".format(self.address, self.length)
+      if self.registers:
+         s += "  " + ",".join(self.registers)
+      return s
+
+
+class spitrace:
+
+   # READ RX BUFFER: start address selected by bits 2..1
+   _readRxAddresses = (0x61, 0x66, 0x71, 0x76)
+   # LOAD TX BUFFER: start address selected by bits 2..0
+   _loadTxAddresses = (0x31, 0x36, 0x41, 0x46, 0x51, 0x56)
+
+   def __init__(self, spiClockHz = 10000):
+      self.spiClockHz = spiClockHz
+      self.registerNames = self.GetRegisterNames()
+
+   # Returns the names of the registers at each address of the
+   # register map
+   def GetRegisterNames(self):
+      names = [[] for a in range(0x80)]
+      for r in MCP25625_RegisterGroup().Registers():
+         for a in range(r.address, r.address + r.lengthBytes):
+            names[a] += [r.instanceNameInGroup]
+      # CANSTAT and CANCTRL are mirrored at every xEh/xFh address
+      for a in range(0x0E, 0x80, 0x10):
+         names[a] = ["CANSTAT"]
+         names[a + 1] = ["CANCTRL"]
+      return ["/".join(n) for n in names]
+
+   # Returns the registers accessed by length bytes from address
+   def RegistersAt(self, address, length):
+      registers = []
+      for a in range(address, min(address + length, 0x80)):
+         name = self.registerNames[a] or "0x{0:02x}".format(a)
+         if name not in registers:
+            registers += [name]
+      return tuple(registers)
+
+   def Load(self, fileName, text = False):
+      if text:
+         return self.LoadText(fileName)
+      return list(SpiTraceReader(fileName))
+
+   # Reads a text trace (see the file header)
+   def LoadText(self, fileName):
+      records = []
+      with open(fileName) as f:
+         for line in f:
+            line = line.strip()
+            if not line:
+               continue
+            if line.startswith("#"):
+               records += [SpiTraceRecord(SpiTraceRecord.KIND_MARKER, 0,
+                  line[1:].strip().encode("utf-8"), b"")]
+               continue
+            command, sep, response = line.partition("|")
+            records += [SpiTraceRecord(SpiTraceRecord.KIND_TRANSFER, 0,
+               bytes.fromhex(command), bytes.fromhex(response))]
+      return records
+
+   # Decodes the instruction of a transfer record
+   def Decode(self, record):
+      command = record.command
+      if len(command) == 0:
+         return spitrace_frame(record, "EMPTY")
+      op = command[0]
+      if op == 0xC0:
+         return spitrace_frame(record, "RESET")
+      if (op == 0x03) or (op == 0x02):
+         if len(command) < 2:
+            return spitrace_frame(record, "INVALID")
+         address = command[1]
+         length = len(command) - 2
+         return spitrace_frame(record, "READ" if op == 0x03 else "WRITE",
+            address, length, self.RegistersAt(address, length))
+      if op == 0x05:
+         if len(command) != 4:
+            return spitrace_frame(record, "INVALID")
+         return spitrace_frame(record, "BIT MODIFY", command[1], 1,
+            self.RegistersAt(command[1], 1))
+      if (op & 0b11111001) == 0x90:
+         address = self._readRxAddresses[(op >> 1) & 0b11]
+         length = len(command) - 1
+         return spitrace_frame(record, "READ RX BUFFER", address, length,
+            self.RegistersAt(address, length))
+      if 0x40 <= op <= 0x45:
+         address = self._loadTxAddresses[op & 0b111]
+         length = len(command) - 1
+         return spitrace_frame(record, "LOAD TX BUFFER", address, length,
+            self.RegistersAt(address, length))
+      if (op & 0b11111000) == 0x80:
+         buffers = [b for b in range(3) if op & (1 << b)]
+         return spitrace_frame(record, "RTS",
+            registers = tuple("TXB{0}CTRL".format(b) for b in buffers))
+      if op == 0xA0:
+         return spitrace_frame(record, "READ STATUS")
+      if op == 0xB0:
+         return spitrace_frame(record, "RX STATUS")
+      return spitrace_frame(record, "UNKNOWN 0x{0:02x}".format(op))
+
+   # Decodes the records and computes the statistics
+   def Analyze(self, records):
+      self.frames = []
+      self.instructions = {}
+      self.registers = {}
+      self.readBacks = [0, 0]
+      self.operations = {}
+      operation = None
+      previous = None
+      for record in records:
+         if record.kind == SpiTraceRecord.KIND_MARKER:
+            operation = self.CloseOperation(operation, record.timestampNs)
+            operation = [record.label, record.timestampNs, 0, 0]
+            previous = None
+            continue
+
+         frame = self.Decode(record)
+         self.frames += [frame]
+         frameBytes = len(record.command) + \
+            (0 if record.kind == SpiTraceRecord.KIND_TRANSFER
+             else len(record.response))
+         stats = self.instructions.setdefault(frame.instruction, [0, 0])
+         stats[0] += 1
+         stats[1] += frameBytes
+         for name in frame.registers:
+            counts = self.registers.setdefault(name, {})
+            counts[frame.instruction] = counts.get(frame.instruction, 0) + 1
+
+         # READ of exactly the bytes written by the previous frame
+         if (frame.instruction == "READ") and (previous is not None) and \
+               (previous.instruction == "WRITE") and \
+               (previous.address == frame.address) and \
+               (previous.length == frame.length):
+            self.readBacks[0] += 1
+            self.readBacks[1] += frameBytes
+
+         if operation is not None:
+            operation[2] += 1
+            operation[3] += frameBytes
+            operation[4:] = [record.timestampNs]
+         previous = frame
+      self.CloseOperation(operation, None)
+
+   # Internal method. Adds a traced operation to the statistics
+   # operation is [label, start ns, frames, bytes(, last frame ns)]
+   # nextNs is the time of the next marker, None for the last operation
+   # The statistics are [count, frames, bytes, wall ns, idle ns]
+   def CloseOperation(self, operation, nextNs):
+      if operation is None:
+         return None
+      endNs = operation[4] if len(operation) > 4 else operation[1]
+      stats = self.operations.setdefault(operation[0], [0, 0, 0, 0, 0])
+      stats[0] += 1
+      stats[1] += operation[2]
+      stats[2] += operation[3]
+      stats[3] += endNs - operation[1]
+      if nextNs is not None:
+         stats[4] += nextNs - endNs
+      return None
+
+   def BusSeconds(self, byteCount):
+      return byteCount * 8.0 / self.spiClockHz
+
+   def PrintFrames(self):
+      for frame in self.frames:
+         print(frame)
+
+   def PrintReport(self):
+      totalFrames = len(self.frames)
+      totalBytes = sum(s[1] for s in self.instructions.values())
+      print("{0} frames, {1} bytes, {2:.1f} ms of bus time at {3} Hz".format(
+         totalFrames, totalBytes, self.BusSeconds(totalBytes) * 1000,
+         self.spiClockHz))
+
+      print("\nInstruction          frames    bytes  bytes/frame  bus time")
+      for name, (frames, byteCount) in sorted(self.instructions.items(),
+            key = lambda i: -i[1][1]):
+         print("{0:<18} {1:>8} {2:>8} {3:>12.1f} {4:>7.1f}%".format(
+            name, frames, byteCount, byteCount / frames,
+            100.0 * byteCount / max(totalBytes, 1)))
+
+      print("\nRegister        accesses")
+      for name, counts in sorted(self.registers.items(),
+            key = lambda r: -sum(r[1].values())):
+         print("{0:<15} {1:>8}  {2}".format(name, sum(counts.values()),
+            ", ".join("{0} {1}".format(i, c)
+                      for i, c in sorted(counts.items()))))
+
+      print("\nRedundant read-backs: {0} frames, {1} bytes ({2:.1f}%)".format(
+         self.readBacks[0], self.readBacks[1],
+         100.0 * self.readBacks[1] / max(totalBytes, 1)))
+
+      if self.operations:
+         print("\nOperation        count  frames/op  bytes/op  bus ms/op  "
+               "wall ms/op  idle ms/op")
+         for label, (count, frames, byteCount, ns, idleNs) in sorted(
+               self.operations.items()):
+            print("{0:<15} {1:>6} {2:>10.1f} {3:>9.1f} {4:>10.2f} {5:>11.2f} "
+               "{6:>11.2f}".format(label, count, frames / count,
+                       byteCount / count,
+                       self.BusSeconds(byteCount / count) * 1000,
+                       ns / count / 1e6, idleNs / count / 1e6))
+
+if __name__ == "__main__":
+
+   parser = argparse.ArgumentParser(
+     description='Analyze a MCP25625 SPI trace')
+   parser.add_argument('trace',
+     help='trace file (binary, as written by MCP25625_hal_recorder)')
+   parser.add_argument('-t', '--text', action='store_true',
+     help='the trace is a text log (hex command [| hex response] per line)')
+   parser.add_argument('-d', '--decode', action='store_true',
+     help='print each decoded frame')
+   parser.add_argument('-s', '--spiHz', type=int, default=10000,
+     help='SPI clock used to compute the bus time (default 10000)')
+   args = parser.parse_args()
+
+   t = spitrace(args.spiHz)
+   t.Analyze(t.Load(args.trace, args.text))
+   if args.decode:
+      t.PrintFrames()
+      print()
+   t.PrintReport()
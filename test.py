@@ -51,6 +51,1058 @@ class MCP25625_test(object):
         with reg.CNF2 as cnf2:
             print("CNF1 = {0:08b}".format(cnf2.val))
 
+    def MockHW_TestCache(self):
+        print("MockHW_TestCache()")
+        reg = self.reg
+        hal = self.hal_mock
+        reg.BindToHal(hal)
+        reg.EnableCache()
+        reg.ResetCacheStats()
+
+        hal.testData[reg.CNF1.address] = [0b00000000]
+        with reg.CNF1 as cnf1:
+            assert cnf1.BRP == 0b000000
+            cnf1.BRP = 0b000111
+        assert reg.cacheMisses == 1
+
+        # Served from the shadow copy, not from the (changed) device
+        hal.testData[reg.CNF1.address] = [0b11111111]
+        with reg.CNF1 as cnf1:
+            assert cnf1.BRP == 0b000111
+        assert reg.cacheHits == 1
+
+        reg.InvalidateCache()
+        with reg.CNF1 as cnf1:
+            assert cnf1.BRP == 0b111111
+        assert reg.cacheMisses == 2
+
+        # Volatile registers always go to the device
+        hal.testData[reg.CANINTF.address] = [0b00000001]
+        with reg.CANINTF as canintf:
+            assert canintf.RX0IF == 1
+        hal.testData[reg.CANINTF.address] = [0b00000000]
+        with reg.CANINTF as canintf:
+            assert canintf.RX0IF == 0
+        assert reg.cacheHits == 1 and reg.cacheMisses == 2
+
+        reg.EnableCache(False)
+
+    def MockHW_TestTransaction(self):
+        print("MockHW_TestTransaction()")
+        reg = self.reg
+        hal = self.hal_mock
+        reg.BindToHal(hal)
+
+        hal.testData[reg.TXB0CTRL.address] = [0b00000000] * 14
+        with reg.Transaction(reg.TXB0CTRL, reg.TXB0ID, reg.TXB0DLC, 
+                             reg.TXB0DATA) as (txb0ctrl, txb0id, txb0dlc, 
+                                               txb0data):
+            assert txb0ctrl.TXREQ == reg.TXB0CTRL.TXREQ_NotPending
+            txb0id.SID = 0b10101010111
+            txb0dlc.DLC = 2
+            txb0data.DATA = 0x1234000000000000
+
+        # TXB0CTRL was not modified and is not part of the written span
+        assert hal.testData[reg.TXB0CTRL.address][0] == 0b00000000
+        assert hal.testData[reg.TXB0ID.address][0] == 0b10101010
+        assert hal.testData[reg.TXB0ID.address + 1][0] == 0b11100000
+        assert hal.testData[reg.TXB0DLC.address][0] == 2
+        assert hal.testData[reg.TXB0DATA.address][0] == 0x12
+        assert hal.testData[reg.TXB0DATA.address + 1][0] == 0x34
+
+        with reg.TXB0ID as txb0id, reg.TXB0DLC as txb0dlc:
+            assert txb0id.SID == 0b10101010111
+            assert txb0dlc.DLC == 2
+
+    def MockHW_TestBitModify(self):
+        print("MockHW_TestBitModify()")
+        reg = self.reg
+        hal = self.hal_mock
+        reg.BindToHal(hal)
+
+        hal.testData[reg.CANINTF.address] = [0b00000001]
+        with reg.CANINTF as canintf:
+            canintf.RX0IF = 0
+            # Flag raised by the device during the transaction
+            hal.testData[reg.CANINTF.address] = [0b00000101]
+
+        # Only RX0IF was cleared (no read-modify-write of the register)
+        assert hal.testData[reg.CANINTF.address][0] == 0b00000100
+
+        # RXF0ID is not bit modifiable but all its fields are written, 
+        # so it is written without being read first
+        hal.testData[reg.RXF0ID.address] = [0xFF, 0xFF, 0xFF, 0xFF]
+        with reg.RXF0ID as rxf0id:
+            rxf0id.Zero()
+        assert hal.testData[reg.RXF0ID.address][0] == 0
+        assert hal.testData[reg.RXF0ID.address + 1][0] == 0
+
+    def MockHW_TestWriteOnly(self):
+        print("MockHW_TestWriteOnly()")
+        reg = self.reg
+        hal = self.hal_mock
+        reg.BindToHal(hal)
+
+        # Fields not set in a write-only transaction get their initial 
+        # value (or zero), whatever the register held before
+        hal.testData[reg.RXF1ID.address] = [0xFF, 0xFF, 0xFF, 0xFF]
+        with reg.RXF1ID.write(zero = True) as rxf1id:
+            rxf1id.EXIDE = 1
+        assert hal.testData[reg.RXF1ID.address][0] == 0
+        assert hal.testData[reg.RXF1ID.address + 1][0] == 0b00001000
+        assert hal.testData[reg.RXF1ID.address + 3][0] == 0
+
+        hal.testData[reg.CNF3.address] = [0b11000111]
+        with reg.CNF3.write() as cnf3:
+            cnf3.PHSEG2 = 0b010
+        assert hal.testData[reg.CNF3.address][0] == 0b00000010
+
+    def MockHW_TestArrayDecode(self):
+        print("MockHW_TestArrayDecode()")
+        import metalcore_numpy
+        reg = self.reg
+        hal = self.hal_mock
+        reg.BindToHal(hal)
+
+        # RXB0 images (RXB0ID, RXB0DLC, RXB0DATA) decoded in bulk must 
+        # match the fields read through transactions
+        decoder = metalcore_numpy.ImageDecoder.FromGroup(reg, 
+            ["RXB0ID", "RXB0DLC", "RXB0DATA"], reg.RXB0ID.address)
+        images = [
+            [0b10010000, 0b00101001, 0x34, 0x56, 5, 1, 2, 3, 4, 5, 0, 0, 0],
+            [0xFF, 0xEB, 0xFF, 0xFF, 0x48, 0xDE, 0xAD, 0xCA, 0xFE, 
+             0x12, 0x34, 0x56, 0x78]]
+        frames = decoder.Decode(bytes(images[0] + images[1]))
+        assert len(frames) == 2
+        for image, frame in zip(images, frames):
+            hal.testData[reg.RXB0ID.address] = image
+            with reg.RXB0ID as r_id, reg.RXB0DLC as r_dlc, \
+                    reg.RXB0DATA as r_data:
+                assert frame["RXB0ID"]["SID"] == r_id.SID
+                assert frame["RXB0ID"]["SRR"] == r_id.SRR
+                assert frame["RXB0ID"]["IDE"] == r_id.IDE
+                assert frame["RXB0ID"]["EID"] == r_id.EID
+                assert frame["RXB0DLC"]["RTR"] == r_dlc.RTR
+                assert frame["RXB0DLC"]["DLC"] == r_dlc.DLC
+                assert frame["RXB0DATA"]["DATA"] == r_data.DATA
+
+    def MockHW_TestSnapshot(self):
+        print("MockHW_TestSnapshot()")
+        reg = self.reg
+        hal = self.hal_mock
+        reg.BindToHal(hal)
+        hal.Reset()
+
+        hal.testData[reg.RXF0ID.address] = [0x12, 0x34, 0x56, 0x78]
+        snapshot = reg.Snapshot()
+        assert len(snapshot) == 0x80
+        assert snapshot[reg.CANCTRL.address] == 0b10000111
+        assert snapshot.CANCTRL.REQOP == reg.CANCTRL.REQOP_Configuration
+
+        # The snapshot is not affected by later changes of the device
+        hal.testData[reg.RXF0ID.address] = [0, 0, 0, 0]
+        assert snapshot.RXF0ID.val == 0x12345678
+        assert snapshot.ReadBytes(reg.RXF0ID.address, 2) == bytes([0x12, 0x34])
+        try:
+            snapshot.image = bytes(0x80)
+            assert False
+        except AttributeError:
+            pass
+
+    def MockHW_TestStats(self):
+        print("MockHW_TestStats()")
+        reg = self.reg
+        hal = self.hal_mock
+        reg.BindToHal(hal)
+        reg.EnableStats()
+
+        with reg.RXF0ID as rxf0id:
+            rxf0id.EXIDE = 1
+        with reg.CANINTF as canintf:
+            canintf.RX0IF = 0
+        with reg.Transaction(reg.TXB0ID, reg.TXB0DLC) as (r_id, r_dlc):
+            r_dlc.DLC = 3
+
+        stats = reg.GetStats()
+        assert stats["RXF0ID"]["reads"] == 1
+        assert stats["RXF0ID"]["writes"] == 1
+        assert stats["RXF0ID"]["bytesWritten"] == 4
+        assert stats["CANINTF"]["reads"] == 0
+        assert stats["CANINTF"]["bitModifies"] == 1
+        assert stats["TXB0ID"]["bytesRead"] == 4
+        assert stats["TXB0ID"]["writes"] == 0
+        assert stats["TXB0DLC"]["writes"] == 1
+        for name in ("RXF0ID", "CANINTF", "TXB0ID", "TXB0DLC"):
+            assert stats[name]["transactions"] == 1
+            callSite, = stats[name]["callSites"].keys()
+            assert "MockHW_TestStats" in callSite
+        assert "RXF0ID" in reg.GetStatsJson()
+
+        reg.ResetStats()
+        assert reg.GetStats()["RXF0ID"]["transactions"] == 0
+        reg.EnableStats(False)
+        assert reg.GetStats() == {}
+
+    def MockHW_TestGroups(self):
+        print("MockHW_TestGroups()")
+        # Two register groups bound to two devices do not share state
+        hal0 = MCP25625_hal_mock(verbosePrint = False)
+        hal1 = MCP25625_hal_mock(verbosePrint = False)
+        reg0 = MCP25625_RegisterGroup()
+        reg1 = MCP25625_RegisterGroup()
+        reg0.BindToHal(hal0)
+        reg1.BindToHal(hal1)
+        assert reg0.CNF1 is not reg1.CNF1
+        assert reg0.CNF1.hal is hal0 and reg1.CNF1.hal is hal1
+
+        with reg0.CNF1 as cnf1_0, reg1.CNF1 as cnf1_1:
+            cnf1_0.BRP = 1
+            cnf1_1.BRP = 2
+        assert hal0.testData[reg0.CNF1.address][0] == 1
+        assert hal1.testData[reg1.CNF1.address][0] == 2
+
+    def MockHW_TestTraceReplay(self):
+        print("MockHW_TestTraceReplay()")
+        import io
+        import MCP25625_trace as trace
+
+        # READ of CANCTRL followed by a BIT MODIFY
+        traceFile = io.BytesIO()
+        writer = trace.SpiTraceWriter(traceFile)
+        writer.Write(trace.SpiTraceRecord.KIND_MARKER, b"Test")
+        writer.Write(trace.SpiTraceRecord.KIND_TRANSFER, 
+                     [0x03, 0x0F, 0x00], [0x00, 0x00, 0x87])
+        writer.Write(trace.SpiTraceRecord.KIND_TRANSFER, 
+                     [0x05, 0x0F, 0xE0, 0x40], [0x00, 0x00, 0x00, 0x00])
+        writer.close()
+
+        traceFile.seek(0)
+        hal = trace.MCP25625_hal_replay(traceFile)
+        assert hal.ReadByte(0x0F) == 0x87
+        try:
+            hal.CheckComplete()
+            assert False
+        except trace.SpiTraceException:
+            pass
+        # A different command than the recorded one is reported
+        try:
+            hal.BitModify(0x0F, 0xE0, 0x00)
+            assert False
+        except trace.SpiTraceException:
+            pass
+        hal.BitModify(0x0F, 0xE0, 0x40)
+        hal.CheckComplete()
+
+    def MockHW_TestSpiTrace(self):
+        print("MockHW_TestSpiTrace()")
+        from MCP25625_trace import SpiTraceRecord
+        from spitrace import spitrace
+
+        records = [SpiTraceRecord(SpiTraceRecord.KIND_MARKER, 0, b"Send", b"")] + \
+            [SpiTraceRecord(SpiTraceRecord.KIND_TRANSFER, 0, bytes(c), bytes(len(c))) 
+                for c in ([0x02, 0x35, 0x03], [0x03, 0x35, 0x00], 
+                          [0x05, 0x2C, 0x01, 0x00], [0x94] + [0] * 13)]
+        t = spitrace()
+        t.Analyze(records)
+        assert [f.instruction for f in t.frames] == \
+            ["WRITE", "READ", "BIT MODIFY", "READ RX BUFFER"]
+        assert t.frames[0].registers == ("TXB0DLC",)
+        assert t.frames[3].registers == ("RXB1ID", "RXB1DLC", "RXB1DATA")
+        assert t.readBacks == [1, 3]
+        assert t.operations["Send"][:3] == [1, 4, 24]
+
+        # The wall time of an operation ends at its last frame, the time to
+        # the next marker is idle time
+        records = [SpiTraceRecord(SpiTraceRecord.KIND_MARKER, 1000, b"Send", b""),
+                   SpiTraceRecord(SpiTraceRecord.KIND_TRANSFER, 1500, bytes([0xA0, 0]), bytes(2)),
+                   SpiTraceRecord(SpiTraceRecord.KIND_TRANSFER, 2000, bytes([0x81]), bytes(1)),
+                   SpiTraceRecord(SpiTraceRecord.KIND_MARKER, 9000, b"Send", b""),
+                   SpiTraceRecord(SpiTraceRecord.KIND_TRANSFER, 10000, bytes([0x81]), bytes(1)),
+                   SpiTraceRecord(SpiTraceRecord.KIND_MARKER, 20000, b"Recv", b"")]
+        t.Analyze(records)
+        assert t.operations["Send"] == [2, 3, 4, 2000, 7000 + 10000]
+        assert t.operations["Recv"] == [1, 0, 0, 0, 0]
+
+    def MockHW_TestCompileConfig(self):
+        print("MockHW_TestCompileConfig()")
+        reg = self.reg
+        hal = self.hal_mock
+        reg.BindToHal(hal)
+        hal.Reset()
+
+        # Adjacent registers of a stage are merged, stages stay in order
+        plan = reg.CompileConfig([
+            [(reg.CANCTRL, { "CLKPRE": 0 })],
+            [(reg.CNF2, { "PRSEG": 0b111 }), (reg.CNF1, { "BRP": 1 }), 
+             (reg.RXB0CTRL, {})]])
+        assert [(address, len(data)) for address, data, r in plan] == \
+            [(0x0F, 1), (0x29, 2), (0x60, 1)]
+        plan.Apply()
+        assert hal.testData[reg.CANCTRL.address][0] == 0b10000100
+        assert hal.testData[reg.CNF2.address][0] == 0b00000111
+        assert hal.testData[reg.CNF1.address][0] == 1
+
+    def MockHW_TestWarmStart(self):
+        print("MockHW_TestWarmStart()")
+        hal = MCP25625_hal_mock(verbosePrint = False)
+        hal.Reset()
+        api = MCP25625_api(MCP25625_RegisterGroup())
+        api.SetFilterIdF0(0x120801F1)
+        api.Initialize(hal)
+        assert not api.warmStarted
+        reg = api.reg
+        configured = bytes(hal.memory)
+
+        # Running controller holding a received frame
+        hal.memory[reg.CANCTRL.address] &= 0b00011111
+        hal.memory[reg.CANINTF.address] |= 0b00000001
+        hal.memory[reg.RXB0DATA.address] = 0x5A
+
+        # Same configuration: no reset, only the mode is changed
+        api = MCP25625_api(MCP25625_RegisterGroup())
+        api.SetFilterIdF0(0x120801F1)
+        api.Initialize(hal, warmStart = True)
+        assert api.warmStarted
+        assert hal.memory[reg.CANINTF.address] & 0b00000001
+        assert hal.memory[reg.RXB0DATA.address] == 0x5A
+        assert hal.memory[reg.CANCTRL.address] == configured[reg.CANCTRL.address]
+
+        # Changed filter: rewritten without reset
+        hal.memory[reg.RXF2ID.address] = 0xFF
+        api.Initialize(hal, warmStart = True)
+        assert api.warmStarted
+        assert hal.memory[reg.RXF2ID.address] == configured[reg.RXF2ID.address]
+        assert hal.memory[reg.RXB0DATA.address] == 0x5A
+
+        # Changed bit timing: reset
+        hal.memory[reg.CNF1.address] = 0
+        api.Initialize(hal, warmStart = True)
+        assert not api.warmStarted
+        assert hal.memory == configured
+
+        # Configuration mode entered once the frame on the bus is complete
+        import time
+        class SlowModeHal(MCP25625_hal_mock):
+            def ReadBytes(self, addressBytes, len):
+                if addressBytes == reg.CANSTAT.address:
+                    self.canstatReads += 1
+                    if time.monotonic() >= self.modeTime:
+                        self.memory[reg.CANSTAT.address] = 0b10000000
+                return super().ReadBytes(addressBytes, len)
+        frameSeconds = api._maxFrameBits * api._BitSeconds()
+        hal = SlowModeHal(verbosePrint = False)
+        hal.memory[:] = configured
+        hal.memory[reg.CANSTAT.address] = 0
+        hal.canstatReads = 0
+        hal.modeTime = time.monotonic() + frameSeconds / 2
+        api.Initialize(hal, warmStart = True)
+        assert api.warmStarted
+        assert hal.canstatReads > 1
+
+        # Never entered: reset after the longest frame
+        hal.memory[reg.CANSTAT.address] = 0
+        hal.modeTime = time.monotonic() + 60
+        timeStart = time.monotonic()
+        api.Initialize(hal, warmStart = True)
+        assert not api.warmStarted
+        assert time.monotonic() - timeStart >= frameSeconds
+
+    def MockHW_TestZeroCopy(self):
+        print("MockHW_TestZeroCopy()")
+        reg = self.reg
+        hal = self.hal_mock
+        reg.BindToHal(hal)
+        hal.Reset()
+        hal.testData[reg.RXB0DATA.address] = [0xDE, 0xAD, 0xCA, 0xFE, 1, 2, 3, 4]
+
+        # Byte-aligned fields are views of the bytes read
+        with reg.RXB0DATA as data:
+            view = data.DATA_bytes
+            assert isinstance(view, memoryview)
+            assert view.obj is data.raw
+            assert bytes(view) == bytes([0xDE, 0xAD, 0xCA, 0xFE, 1, 2, 3, 4])
+
+        # Registers of a burst transaction share the buffer read
+        with reg.Transaction(reg.RXB0DLC, reg.RXB0DATA) as (dlc, data):
+            assert data.DATA_bytes.obj is dlc.raw.obj
+
+        # Written fields are not views
+        with reg.TXB0DATA as data:
+            data.DATA = 0x0102
+            assert data.DATA_bytes == bytes([0, 0, 0, 0, 0, 0, 1, 2])
+
+        # Received data references the buffer read, not the device memory
+        api = MCP25625_api(reg)
+        api.Initialize(hal)
+        hal.testData[reg.RXB0ID.address] = [0b10010000, 0b00101001, 0x34, 0x56, 3]
+        hal.testData[reg.RXB0DATA.address] = [0xDE, 0xAD, 0xCA]
+        hal.memory[reg.CANINTF.address] |= 0b00000001
+        msg = api.Recv()
+        assert isinstance(msg.data, memoryview)
+        hal.testData[reg.RXB0DATA.address] = [0, 0, 0]
+        assert list(msg.data) == [0xDE, 0xAD, 0xCA]
+        assert (msg.arbitration_id, msg.extended_id) == ((0b10010000001 << 18) | 0x13456, True)
+
+        # Recv decodes with unpackBytes as the register transactions do
+        hal.testData[reg.RXB0ID.address] = [0x24, 0b01100000, 0, 0, 2, 0xCA, 0xFE]
+        for decode in ("unpackBytes", "transactions"):
+            if decode == "transactions":
+                reg.EnableStats()
+            hal.memory[reg.CANINTF.address] |= 0b00000001
+            msg = api.Recv()
+            assert (msg.arbitration_id, msg.extended_id, bytes(msg.data)) == (0x123, False, bytes([0xCA, 0xFE]))
+        assert reg.GetStats()["RXB0ID"]["reads"] == 1
+        reg.EnableStats(False)
+
+    def MockHW_TestSpiClock(self):
+        print("MockHW_TestSpiClock()")
+
+        # spidev-like device corrupting the data above 5 MHz
+        class FakeSpi(object):
+            def __init__(self):
+                self.memory = bytearray(0x80)
+                self.max_speed_hz = 0
+            def xfer(self, command):
+                address = command[1]
+                if command[0] == 0b00000010:
+                    data = bytes(command[2:])
+                    if self.max_speed_hz > 5000000:
+                        data = bytes([b ^ 0x01 for b in data])
+                    self.memory[address:address + len(data)] = data
+                    return [0] * len(command)
+                return [0, 0] + list(self.memory[address:address + len(command) - 2])
+            xfer2 = xfer
+            writebytes2 = xfer
+
+        spi = FakeSpi()
+        spi.memory[0x36:0x3E] = bytes(range(1, 9))
+        hal = MCP25625_hal(spi = spi, spiClockHz = 10000)
+        assert spi.max_speed_hz == 10000
+
+        # 8 MHz fails, 5 MHz less the margin gives 4 MHz
+        assert hal.AutoTuneSpiClock() == 4000000
+        assert spi.max_speed_hz == 4000000
+        assert hal.spiClockHz == 4000000
+        assert spi.memory[0x36:0x3E] == bytes(range(1, 9))
+        assert hal.AutoTuneSpiClock(maxSpiClockHz = 1000000, safetyMargin = 0) == 1000000
+
+        # Not with a pending transmission
+        spi.memory[0x30] = 0b00001000
+        try:
+            hal.AutoTuneSpiClock()
+            assert False
+        except IOError:
+            pass
+
+        # Device failing at every clock tried (read back corrupted above 5 kHz) or 
+        # raising: the start clock and the data bytes are restored
+        class FailingSpi(FakeSpi):
+            def __init__(self, raiseOnFailure):
+                FakeSpi.__init__(self)
+                self.raiseOnFailure = raiseOnFailure
+            def xfer(self, command):
+                response = FakeSpi.xfer(self, command)
+                if (command[0] == 0b00000011) and (self.max_speed_hz > 5000):
+                    if self.raiseOnFailure:
+                        raise IOError("SPI transfer failed")
+                    response = [b ^ 0x01 for b in response]
+                return response
+            xfer2 = xfer
+        for raiseOnFailure in (False, True):
+            spi = FailingSpi(raiseOnFailure)
+            spi.memory[0x36:0x3E] = bytes(range(1, 9))
+            memory = bytes(spi.memory)
+            hal = MCP25625_hal(spi = spi, spiClockHz = 1000)
+            try:
+                hal.AutoTuneSpiClock()
+                assert False
+            except IOError:
+                pass
+            assert spi.max_speed_hz == 1000 and hal.spiClockHz == 1000
+            assert spi.memory == memory
+
+        # Unknown start clock (no max_speed_hz) and reads raising at 8 MHz: the data 
+        # bytes are restored at the default clock, not at the clock that failed
+        class UnknownClockSpi(FakeSpi):
+            def __init__(self):
+                self.memory = bytearray(0x80)
+            def xfer(self, command):
+                if (command[0] == 0b00000011) and (self.__dict__.get("max_speed_hz", 0) > 5000000):
+                    raise IOError("SPI transfer failed")
+                return FakeSpi.xfer(self, command)
+            xfer2 = xfer
+            writebytes2 = xfer
+        spi = UnknownClockSpi()
+        spi.memory[0x36:0x3E] = bytes(range(1, 9))
+        memory = bytes(spi.memory)
+        hal = MCP25625_hal(spi = spi)
+        assert hal.spiClockHz is None
+        try:
+            hal.AutoTuneSpiClock()
+            assert False
+        except IOError:
+            pass
+        assert spi.max_speed_hz == MCP25625_hal.defaultSpiClockHz
+        assert spi.memory == memory
+
+    def MockHW_TestRxTxBuffer(self):
+        print("MockHW_TestRxTxBuffer()")
+        reg = self.reg
+        hal = self.hal_mock
+        reg.BindToHal(hal)
+        hal.Reset()
+
+        # Registers composed in memory for LOAD TX BUFFER
+        image = reg.Compose(reg.TXB0ID, reg.TXB0DLC)
+        with image as (r_id, r_dlc):
+            r_id.SID = 0b10010000001
+            r_dlc.DLC = 3
+        assert image.image == bytes([0b10010000, 0b00100000, 0, 0, 3])
+        hal.LoadTxBuffer(0, image.image)
+        assert hal.memory[0x31:0x36] == image.image
+        hal.LoadTxBuffer(2, [1, 2], fromData = True)
+        assert hal.memory[0x56:0x58] == bytes([1, 2])
+
+        # Registers decoded from READ RX BUFFER, which clears RXnIF only
+        hal.testData[reg.RXB1ID.address] = [0b10010000, 0b00101001, 0x34, 0x56, 2, 0xCA, 0xFE]
+        hal.testData[reg.CANINTF.address] = [0b00000110]
+        with reg.Transaction(reg.RXB1ID, reg.RXB1DLC, 
+                             readBytes = hal.ReadRxBuffer(1, 5)) as (r_id, r_dlc):
+            assert r_id.SID == 0b10010000001
+            assert r_dlc.DLC == 2
+        assert hal.testData[reg.CANINTF.address][0] == 0b00000100
+        assert bytes(hal.ReadRxBuffer(1, 2, fromData = True)) == bytes([0xCA, 0xFE])
+
+    def MockHW_TestStatus(self):
+        print("MockHW_TestStatus()")
+        hal = MCP25625_hal_mock(verbosePrint = False)
+        hal.Reset()
+        api = MCP25625_api(MCP25625_RegisterGroup())
+        api.Initialize(hal)
+        reg = api.reg
+
+        hal.testData[reg.CANINTF.address] = [0b00001001]
+        hal.testData[reg.TXB0CTRL.address] = [0b00001000]
+        assert hal.ReadStatus() == READSTATUSx.RX0IF.registerMask | \
+            READSTATUSx.TX0REQ.registerMask | READSTATUSx.TX1IF.registerMask
+        assert hal.RxStatus() == RXSTATUSx.RX0.registerMask
+        assert api.Peek()
+        assert not api._PollSend([0])
+
+        hal.testData[reg.CANINTF.address] = [0b00000010]
+        hal.testData[reg.TXB0CTRL.address] = [0]
+        assert not api.Peek()
+        assert api._Peek(1)
+        assert api._PollSend([0])
+
+    def MockHW_TestSendBurst(self):
+        print("MockHW_TestSendBurst()")
+        hal = MCP25625_hal_mock(verbosePrint = False)
+        hal.Reset()
+        api = MCP25625_api(MCP25625_RegisterGroup())
+        api.Initialize(hal)
+        reg = api.reg
+        msgs = [Message(0x120801F0 + i, [i]) for i in range(3)]
+
+        # Loaded in order with decreasing priorities, aborted on timeout
+        try:
+            api.SendBurst(msgs, timeoutMilliseconds = 0)
+            assert False
+        except TimeoutError:
+            pass
+        for i, ctrl in enumerate((reg.TXB0CTRL, reg.TXB1CTRL, reg.TXB2CTRL)):
+            assert hal.memory[ctrl.address] == 3 - i
+            assert hal.memory[ctrl.address + 4] == (0x120801F0 + i) & 0xFF
+            assert hal.memory[ctrl.address + 5] == 1
+        assert [hal.memory[a] for a in (0x36, 0x46, 0x56)] == [0, 1, 2]
+
+        # One RTS for all the buffers
+        requests = []
+        hal.RequestToSend = lambda txBufferMask: requests.append(txBufferMask)
+        api.SendBurst(msgs[:2], timeoutMilliseconds = 1000)
+        assert requests == [0b011]
+        try:
+            api.SendBurst(msgs * 2)
+            assert False
+        except ValueError:
+            pass
+
+    def MockHW_TestWriteVerify(self):
+        print("MockHW_TestWriteVerify()")
+
+        # spidev-like device with bit 0 of address 0x36 stuck at 0, 
+        # counting the frames of each instruction
+        class FakeSpi(object):
+            def __init__(self):
+                self.memory = bytearray(0x80)
+                self.frames = {}
+            def xfer(self, command):
+                self.frames[command[0]] = self.frames.get(command[0], 0) + 1
+                if command[0] == 0b00000010:
+                    address = command[1]
+                    self.memory[address:address + len(command) - 2] = bytes(command[2:])
+                elif command[0] == 0b00000101:
+                    address = command[1]
+                    self.memory[address] = (self.memory[address] & ~command[2]) | \
+                                           (command[2] & command[3])
+                elif command[0] == 0b00000011:
+                    address = command[1]
+                    return [0, 0] + list(self.memory[address:address + len(command) - 2])
+                self.memory[0x36] &= 0xFE
+                return [0] * len(command)
+            xfer2 = xfer
+            writebytes2 = xfer
+
+        # Never read back by default
+        spi = FakeSpi()
+        hal = MCP25625_hal(spi = spi)
+        hal.WriteBytes(0x36, bytes([1, 2]))
+        hal.BitModify(0x36, 0x01, 0x01)
+        assert spi.frames.get(0b00000011, 0) == 0
+        assert (hal.verifiableWrites, hal.verifiedWrites, hal.verifyMismatches) == (0, 0, 0)
+
+        # Always: the mismatch raises, masked bits and zero masks are not verified
+        hal.SetVerifyPolicy(MCP25625_hal.VERIFY_ALWAYS)
+        hal.WriteBytes(0x37, bytes([3]))
+        try:
+            hal.WriteBytes(0x36, bytes([1, 2]))
+            assert False
+        except IOError:
+            pass
+        try:
+            hal.BitModify(0x36, 0x03, 0x03)
+            assert False
+        except IOError:
+            pass
+        hal.WriteBytes(0x36, bytes([1, 2]), bytes([0xFE, 0xFF]))
+        hal.BitModify(0x36, 0x03, 0x03, 0xFE)
+        hal.WriteBytes(0x36, bytes([1]), bytes([0]))
+        hal.BitModify(0x36, 0x01, 0x01, 0xFE)
+        assert spi.frames[0b00000011] == 5
+        assert (hal.verifiableWrites, hal.verifiedWrites, hal.verifyMismatches) == (5, 5, 2)
+
+        # Sampled: every 3rd verifiable write is read back, mismatches are counted
+        hal.SetVerifyPolicy(MCP25625_hal.VERIFY_SAMPLED, verifyEvery = 3)
+        hal.ResetVerifyStats()
+        for i in range(6):
+            hal.WriteBytes(0x36, bytes([1]))
+            hal.WriteBytes(0x36, bytes([1]), bytes([0]))
+        assert spi.frames[0b00000011] == 7
+        assert (hal.verifiableWrites, hal.verifiedWrites, hal.verifyMismatches) == (6, 2, 2)
+
+        try:
+            hal.SetVerifyPolicy(3)
+            assert False
+        except ValueError:
+            pass
+
+        # Registers verify their writeable fields except the volatile ones changed by the device
+        reg = MCP25625_RegisterGroup()
+        reg.BindToHal(hal)
+        assert reg.CANCTRL.verifyMask == bytes([0xFF])
+        assert reg.TXB0CTRL.verifyMask == bytes([0b00000011])
+        assert reg.CANINTF.verifyMask == bytes([0])
+        hal.SetVerifyPolicy(MCP25625_hal.VERIFY_ALWAYS)
+        hal.ResetVerifyStats()
+        with reg.CNF1 as r:
+            r.BRP = 3
+        with reg.CANCTRL as r:
+            r.REQOP = 0b100
+        with reg.TXB0CTRL as r:
+            r.TXP = reg.TXB0CTRL.TXP_HighestMessagePriority
+        with reg.TXB0CTRL as r:
+            r.TXREQ = reg.TXB0CTRL.TXREQ_BufferPending
+        with reg.CANINTF as r:
+            r.RX0IF = 0
+        assert (hal.verifiableWrites, hal.verifiedWrites, hal.verifyMismatches) == (3, 3, 0)
+        try:
+            with reg.TXB0DATA as r:
+                r.DATA = 0x0102030405060708
+            assert False
+        except IOError:
+            pass
+        assert hal.verifyMismatches == 1
+
+    def MockHW_TestBatch(self):
+        print("MockHW_TestBatch()")
+        import ctypes
+        import MCP25625_hal as hal_module
+
+        # spidev-like device logging the frames written and read
+        class FakeSpi(object):
+            def __init__(self):
+                self.memory = bytearray(0x80)
+                self.frames = []
+            def xfer2(self, command):
+                self.frames += [bytes(command)]
+                if command[0] == 0b00000011:
+                    address = command[1]
+                    return [0, 0] + list(self.memory[address:address + len(command) - 2])
+                if command[0] == 0b00000010:
+                    address = command[1]
+                    self.memory[address:address + len(command) - 2] = bytes(command[2:])
+                if command[0] == 0b10100000:
+                    return [0] * len(command)
+                return [0xA5] * len(command)
+            def writebytes2(self, command):
+                self.xfer2(command)
+
+        # Without ioctl the commands are issued in order when the batch is closed
+        spi = FakeSpi()
+        hal = MCP25625_hal(spi = spi)
+        with hal.Batch() as batch:
+            hal.BitModify(0x2C, 0x04, 0x00)
+            hal.LoadTxBuffer(0, bytes([1, 2]))
+            statusIndex = batch.Transfer([0b10100000, 0])
+            hal.RequestToSend(0b001)
+            assert spi.frames == []
+        assert spi.frames == [bytes([0x05, 0x2C, 0x04, 0x00]), bytes([0x40, 1, 2]), 
+                              bytes([0xA0, 0]), bytes([0x81])]
+        assert batch.results == [None, None, bytes([0, 0]), None]
+        assert statusIndex == 2
+
+        # Reads submit the queued writes first
+        spi.frames = []
+        with hal.Batch():
+            hal.WriteBytes(0x36, bytes([7]))
+            assert hal.ReadByte(0x36) == 7
+            hal.RequestToSend(0b001)
+            assert len(spi.frames) == 2
+        assert len(spi.frames) == 3
+
+        # An exception discards the queued commands
+        spi.frames = []
+        try:
+            with hal.Batch():
+                hal.RequestToSend(0b001)
+                raise ValueError()
+        except ValueError:
+            pass
+        assert spi.frames == []
+        hal.RequestToSend(0b001)
+        assert spi.frames == [bytes([0x81])]
+
+        # A command larger than a SPI message is refused, the queued commands are kept
+        spi.frames = []
+        maxBytes = hal_module.MCP25625_hal_batch._maxBytes
+        with hal.Batch() as batch:
+            hal.RequestToSend(0b001)
+            try:
+                batch.Transfer(bytes(maxBytes + 1))
+                assert False
+            except ValueError:
+                pass
+            batch.Transfer(bytes(maxBytes), response = False)
+            assert spi.frames == [bytes([0x81])]
+        assert spi.frames == [bytes([0x81]), bytes(maxBytes)]
+
+        # With a file descriptor the commands are one SPI_IOC_MESSAGE(n) ioctl
+        class FakeFcntl(object):
+            def __init__(self):
+                self.requests = []
+            def ioctl(self, fd, request, message):
+                transferCount = len(message) // 32
+                assert request == 0x40006B00 | (transferCount * 32 << 16)
+                transfers = []
+                for i in range(transferCount):
+                    txAddress, rxAddress, length, speedHz, delay, bits, csChange = \
+                        hal_module.MCP25625_hal_batch._spiIocTransfer.unpack_from(message, i * 32)[:7]
+                    transfers += [(ctypes.string_at(txAddress, length), csChange)]
+                    ctypes.memmove(rxAddress, bytes(range(length)), length)
+                self.requests += [(fd, transfers)]
+        fakeFcntl = FakeFcntl()
+        spi = FakeSpi()
+        spi.fileno = lambda: 42
+        hal = MCP25625_hal(spi = spi)
+        savedFcntl = hal_module.fcntl
+        hal_module.fcntl = fakeFcntl
+        try:
+            with hal.Batch() as batch:
+                hal.BitModify(0x2C, 0x04, 0x00)
+                hal.LoadTxBuffer(0, bytes([1, 2]))
+                batch.Transfer([0b10100000, 0])
+                hal.RequestToSend(0b001)
+        finally:
+            hal_module.fcntl = savedFcntl
+        assert spi.frames == []
+        assert fakeFcntl.requests == [(42, [(bytes([0x05, 0x2C, 0x04, 0x00]), 1), (bytes([0x40, 1, 2]), 1), 
+                                            (bytes([0xA0, 0]), 1), (bytes([0x81]), 0)])]
+        assert batch.results == [None, None, bytes([0, 1]), None]
+
+        # The API checks TXREQ with READ STATUS, then clears the flag, sets the priority 
+        # (first Send only), loads the buffer and requests the transmission in one ioctl
+        can = MCP25625_api(MCP25625_RegisterGroup())
+        can.hal = hal
+        can.reg.BindToHal(hal)
+        fakeFcntl.requests = []
+        spi.frames = []
+        hal_module.fcntl = fakeFcntl
+        try:
+            can._BeginSendTXB0(Message(0x122801f0, [1, 2]), None)
+            can._BeginSendTXB0(Message(0x122801f0, [1, 2]), None)
+        finally:
+            hal_module.fcntl = savedFcntl
+        assert spi.frames == [bytes([0xA0, 0]), bytes([0xA0, 0])]
+        assert [[t[0][0] for t in transfers] for fd, transfers in fakeFcntl.requests] == \
+            [[0x05, 0x40, 0x05, 0x81], [0x05, 0x40, 0x81]]
+        assert fakeFcntl.requests[0][1][2][0] == bytes([0x05, 0x30, 0b00000011, 0b00000011])
+
+    def MockHW_TestHalBackends(self):
+        print("MockHW_TestHalBackends()")
+        import os
+        from MCP25625_hal_base import MCP25625_hal_base, CreateHal, HalBackends, SelectHalBackend, halBackendVariable
+        from MCP25625_hal_memory import MCP25625_hal_memory
+
+        # Backend selected by name, else by the environment variable, else spidev
+        savedBackend = os.environ.pop(halBackendVariable, None)
+        try:
+            assert HalBackends() == ["memory", "mock", "sim", "spidev"]
+            assert SelectHalBackend() == "spidev"
+            assert SelectHalBackend(default = "memory") == "memory"
+            assert type(CreateHal("memory")) == MCP25625_hal_memory
+            os.environ[halBackendVariable] = "mock"
+            assert type(CreateHal("memory")) == MCP25625_hal_memory
+            assert SelectHalBackend(default = "memory") == "mock"
+            hal = CreateHal()
+            assert type(hal) == MCP25625_hal_mock
+            assert not hal.verbosePrint
+            os.environ[halBackendVariable] = "none"
+            try:
+                CreateHal()
+                assert False
+            except ValueError:
+                pass
+
+            # The write verification policy is applied to the backends verifying writes
+            os.environ.pop(halBackendVariable)
+            hal = CreateHal("sim", verifyPolicy = "sampled", verifyEvery = 7)
+            assert (hal.verifyPolicy, hal.verifyEvery) == (MCP25625_hal.VERIFY_SAMPLED, 7)
+            assert type(CreateHal("memory", verifyPolicy = "always")) == MCP25625_hal_memory
+            try:
+                CreateHal("sim", verifyPolicy = "sometimes")
+                assert False
+            except ValueError:
+                pass
+            os.environ[halBackendVariable] = "mock"
+            hal = CreateHal()
+        finally:
+            os.environ.pop(halBackendVariable, None)
+            if savedBackend != None:
+                os.environ[halBackendVariable] = savedBackend
+
+        # Capabilities
+        assert MCP25625_hal(spi = object()).HasCapabilities(MCP25625_hal_base.CAP_SPI | MCP25625_hal_base.CAP_BATCH)
+        from MCP25625_trace import MCP25625_hal_recorder
+        assert not MCP25625_hal_recorder.capabilities & MCP25625_hal_base.CAP_BATCH
+        assert not hal.HasCapabilities(MCP25625_hal_base.CAP_SPI)
+
+        # A backend missing an instruction cannot be instantiated
+        class IncompleteHal(MCP25625_hal_base):
+            def Reset(self):
+                pass
+        for halClass in (MCP25625_hal_base, IncompleteHal):
+            try:
+                halClass()
+                assert False
+            except TypeError:
+                pass
+
+        # Raw SPI frames are decoded into the instructions
+        hal = MCP25625_hal_memory()
+        hal.xfer([0b11000000])
+        assert hal.xfer([0b00000011, 0x0E, 0, 0]) == [0, 0, 0b10000000, 0b10000111]
+        hal.xfer([0b00000010, 0x36, 1, 2])
+        hal.xfer([0b00000101, 0x36, 0x03, 0x02])
+        assert hal.memory[0x36:0x38] == bytes([2, 2])
+        hal.xfer([0b01000001, 5, 6])
+        assert hal.memory[0x36:0x38] == bytes([5, 6])
+        hal.xfer([0b10000001])
+        assert hal.xfer([0b10100000, 0]) == [0, 0b00000100]
+        hal.memory[0x2C] = 0b00000001
+        hal.memory[0x66:0x68] = bytes([5, 6])
+        assert hal.xfer([0b10110000, 0]) == [0, 0b01000000]
+        assert hal.xfer([0b10010010, 0, 0]) == [0, 5, 6]
+        assert hal.memory[0x2C] == 0
+
+        # Timing statistics
+        can = MCP25625_api(MCP25625_RegisterGroup())
+        can.Initialize(hal)
+        hal.EnableStats()
+        can.Peek()
+        can.Peek()
+        stats = hal.GetStats()
+        assert stats["RxStatus"]["calls"] == 2
+        assert stats["RxStatus"]["seconds"] >= stats["RxStatus"]["maxSeconds"] > 0
+        hal.EnableStats(False)
+        can.Peek()
+        assert hal.GetStats() == {}
+        assert "RxStatus" not in hal.__dict__
+
+    def MockHW_TestSimulator(self):
+        print("MockHW_TestSimulator()")
+        from MCP25625_hal_base import CreateHal
+        from MCP25625_sim import MCP25625_sim, MCP25625_sim_bus, MCP25625_sim_frame, MCP25625_hal_sim
+
+        # Reset values, CANSTAT/CANCTRL mirrors, read-only bits
+        sim = MCP25625_sim()
+        sim.xfer([0b00000010, 0x0F, 0x00])
+        sim.xfer([0b11000000])
+        assert sim.xfer([0b00000011, 0x0E, 0, 0]) == [0, 0, 0b10000000, 0b10000111]
+        assert sim.xfer([0b00000011, 0x7E, 0, 0]) == [0, 0, 0b10000000, 0b10000111]
+        sim.xfer([0b00000010, 0x2D, 0xFF])
+        sim.xfer([0b00000010, 0x1C, 0xFF])
+        sim.xfer([0b00000010, 0x61, 0xFF])
+        assert sim.memory[0x2D] == 0b11000000 and sim.memory[0x1C] == 0 and sim.memory[0x61] == 0
+
+        # REQOP to OPMOD, invalid modes ignored, registers of Configuration mode
+        sim.xfer([0b00000010, 0x00, 0x12])
+        sim.xfer([0b00000101, 0x0F, 0b11100000, 0b01000000])
+        assert sim.xfer([0b00000011, 0x0E, 0])[2] >> 5 == MCP25625_sim.MODE_LOOPBACK
+        sim.xfer([0b00000101, 0x0F, 0b11100000, 0b11100000])
+        assert sim.mode == MCP25625_sim.MODE_LOOPBACK
+        assert sim.xfer([0b00000011, 0x00, 0])[2] == 0
+        sim.xfer([0b00000010, 0x2A, 0x55])
+        assert sim.memory[0x2A] == 0
+        # BIT MODIFY acts as WRITE on the registers not supporting it
+        sim.xfer([0b00000101, 0x36, 0x01, 0xF0])
+        assert sim.memory[0x36] == 0xF0
+
+        # Transmissions in priority order, TXnIF, READ STATUS, ICOD, loopback
+        sim.xfer([0b00000010, 0x2B, 0b00011100])
+        sim.xfer([0b00000010, 0x30, 0b00000001])
+        sim.xfer([0b01000010, 0x24, 0x40, 0, 0, 1, 0xAA])
+        sim.xfer([0b01000000, 0x24, 0x20, 0, 0, 1, 0xBB])
+        sim.xfer([0b00000011, 0x60, 0b01100000])
+        sim.xfer([0b00000010, 0x60, 0b01100100])
+        assert sim.memory[0x60] == 0b01100110
+        sim.transmitImmediately = False
+        sim.xfer([0b10000011])
+        assert sim.xfer([0b10100000, 0, 0]) == [0, 0b00010100, 0b00010100]
+        sim.TransmitPending()
+        assert sim.xfer([0b10100000, 0]) == [0, 0b00101011]
+        assert sim.xfer([0b00000011, 0x0E, 0])[2] == 0b01000110
+        # TXB0 (TXP 01) went first into RXB0, TXB1 rolled over into RXB1
+        assert sim.xfer([0b10110000, 0])[1] == 0b11000000
+        assert sim.xfer([0b10010000] + [0] * 7) == [0, 0x24, 0x20, 0, 0, 1, 0xBB, 0]
+        assert sim.xfer([0b10110000, 0])[1] == 0b10000110
+        assert sim.xfer([0b10010110, 0]) == [0, 0xAA]
+        assert sim.memory[0x2C] & 0b11 == 0
+
+        # Aborted transmissions
+        sim.xfer([0b10000001])
+        sim.xfer([0b00000101, 0x30, 0b00001000, 0])
+        assert sim.memory[0x30] & 0b01001000 == 0b01000000
+
+        # Masks and filters, overflows
+        sim = MCP25625_sim()
+        sim.xfer([0b00000010, 0x00, 0x91, 0x48, 0x01, 0xF0])
+        sim.xfer([0b00000010, 0x08, 0x00, 0x20, 0x12, 0x34])
+        sim.xfer([0b00000010, 0x20, 0xFF, 0xE3, 0xFF, 0xFF, 0xFF, 0xE0, 0xFF, 0xFF])
+        sim.xfer([0b00000101, 0x0F, 0b11100000, 0])
+        assert sim.Receive(MCP25625_sim_frame(0x122801f0, [1]))
+        assert not sim.Receive(MCP25625_sim_frame(0x122801f1, [1]))
+        assert sim.memory[0x2D] == 0 and sim.memory[0x2C] == 0b00000001
+        # The first data bytes of standard frames are filtered by EID15:0
+        assert not sim.Receive(MCP25625_sim_frame(0x001, [0x12, 0x35], extended = False))
+        assert sim.Receive(MCP25625_sim_frame(0x001, [0x12, 0x34], extended = False))
+        assert sim.memory[0x76] == 0x12 and sim.memory[0x70] & 0b111 == 2
+        assert not sim.Receive(MCP25625_sim_frame(0x122801f0, [2]))
+        assert sim.memory[0x2D] == 0b01000000 and sim.memory[0x2C] == 0b00100011
+        assert sim.xfer([0b10110000, 0])[1] == 0b11010000
+        sim.xfer([0b00000101, 0x2D, 0b11000000, 0])
+        sim.xfer([0b00000101, 0x2C, 0b00100001, 0])
+        assert sim.xfer([0b10110000, 0])[1] == 0b10000010
+
+        # Rollover to RXB1 leaves the filter hit of RXB0 unchanged
+        sim = MCP25625_sim()
+        sim.xfer([0b00000010, 0x00, 0x91, 0x48, 0x01, 0xF0, 0x91, 0x48, 0x01, 0xF1])
+        sim.xfer([0b00000010, 0x20, 0xFF, 0xE3, 0xFF, 0xFF])
+        sim.xfer([0b00000010, 0x60, 0b00000100])
+        sim.xfer([0b00000101, 0x0F, 0b11100000, 0])
+        assert sim.Receive(MCP25625_sim_frame(0x122801f1, [1]))
+        assert sim.memory[0x60] & 0b1 == 1
+        assert sim.Receive(MCP25625_sim_frame(0x122801f0, [2]))
+        assert sim.memory[0x60] & 0b1 == 1 and sim.memory[0x70] & 0b111 == 0
+        assert sim.xfer([0b10110000, 0])[1] == 0b11010001
+        sim.xfer([0b00000101, 0x2C, 0b00000001, 0])
+        assert sim.xfer([0b10110000, 0])[1] == 0b10010110
+
+        # Frames transmitted in Normal mode reach the other devices
+        bus = MCP25625_sim_bus()
+        sender = MCP25625_sim(bus)
+        receiver = MCP25625_sim(bus)
+        for device in (sender, receiver):
+            device.xfer([0b00000010, 0x60, 0b01100000])
+            device.xfer([0b00000101, 0x0F, 0b11100000, 0])
+        sender.xfer([0b01000000, 0x91, 0x48, 0x01, 0xF0, 0b01000000])
+        sender.xfer([0b10000001])
+        frame = MCP25625_sim_frame(0x122801f0, extended = True, rtr = True)
+        assert sender.transmitted == bus.frames == [frame]
+        assert receiver.xfer([0b10110000, 0])[1] == 0b01011000
+        assert receiver.memory[0x60] & 0b00001000
+
+        # The API over the sim backend
+        hal = CreateHal("sim")
+        assert type(hal) == MCP25625_hal_sim
+        assert hal.HasCapabilities(MCP25625_hal_sim.CAP_DEVICE_MODEL)
+        can = MCP25625_api(MCP25625_RegisterGroup())
+        can.SetFilterIdF0(0x122801f0)
+        can.Initialize(hal)
+        assert hal.sim.mode == MCP25625_sim.MODE_CONFIGURATION
+        assert hal.sim.memory[0x2A] == 0x87
+        can.SetLoopbackMode()
+        assert hal.sim.mode == MCP25625_sim.MODE_LOOPBACK
+        can.Send(Message(0x122801f0, [1, 2, 3]), 100)
+        msg = can.Recv(100)
+        assert msg.arbitration_id == 0x122801f0 and list(msg.data) == [1, 2, 3]
+        assert not can.Peek()
+        assert hal.sim.transferBytes * 8.0 / hal.spiClockHz == hal.sim.BusSeconds()
+
+    def MockHW_TestManager(self):
+        print("MockHW_TestManager()")
+        import time
+        from MCP25625_manager import MCP25625_manager
+
+        def WaitFor(condition):
+            timeEnd = time.monotonic() + 5
+            while not condition():
+                assert time.monotonic() < timeEnd
+                time.sleep(0.001)
+
+        manager = MCP25625_manager([(0, 0), (0, 1)], 
+                                   lambda bus, cs: MCP25625_hal_mock(verbosePrint = False), 
+                                   loopbackMode = True)
+        manager.Open()
+
+        # Device 0 cannot send (TX buffer still pending), device 1 fails its first receive
+        def FailingSend(msg, timeoutMilliseconds = None):
+            raise IOError("TXB0 still pending")
+        manager[0].api.Send = FailingSend
+        peek = manager[1].api.Peek
+        peekCalls = []
+        def FailingPeek():
+            peekCalls.append(1)
+            if len(peekCalls) == 1:
+                raise IOError("SPI transfer failed")
+            return peek()
+        manager[1].api.Peek = FailingPeek
+        manager.Start()
+        try:
+            manager.Send(0, Message(0x122801f0, [1]))
+            manager.Send(0, Message(0x122801f0, [2]))
+            WaitFor(lambda: manager[0].sendErrors == 2)
+            assert isinstance(manager[0].lastError, IOError)
+            assert manager[0].thread.is_alive() and manager[0].sent == 0
+
+            # Device 1 keeps receiving after the failure
+            WaitFor(lambda: manager[1].recvErrors == 1)
+            manager[1].hal.testData[0x61] = [0b10010000, 0b00101001, 0x34, 0x56, 1, 0x5A]
+            manager[1].hal.memory[0x2C] |= 0b00000001
+            assert list(manager.Recv(1, timeoutSeconds = 5).data) == [0x5A]
+            assert manager[1].thread.is_alive() and manager[1].received == 1
+        finally:
+            manager.Close()
+
     def HwTestStat(self):
         print("HwTestStat()")
         reg = self.reg
@@ -463,6 +1515,28 @@ if __name__ == "__main__":
     test = MCP25625_test(reg, hal_hw, hal_mock)
     
     test.MockHW_Test1()
+    test.MockHW_TestCache()
+    test.MockHW_TestTransaction()
+    test.MockHW_TestBitModify()
+    test.MockHW_TestWriteOnly()
+    test.MockHW_TestArrayDecode()
+    test.MockHW_TestSnapshot()
+    test.MockHW_TestStats()
+    test.MockHW_TestGroups()
+    test.MockHW_TestTraceReplay()
+    test.MockHW_TestSpiTrace()
+    test.MockHW_TestCompileConfig()
+    test.MockHW_TestWarmStart()
+    test.MockHW_TestZeroCopy()
+    test.MockHW_TestSpiClock()
+    test.MockHW_TestRxTxBuffer()
+    test.MockHW_TestStatus()
+    test.MockHW_TestSendBurst()
+    test.MockHW_TestWriteVerify()
+    test.MockHW_TestBatch()
+    test.MockHW_TestHalBackends()
+    test.MockHW_TestSimulator()
+    test.MockHW_TestManager()
     test.HwTestStat()
     test.HwTestTx()
     test.HwTestRx()